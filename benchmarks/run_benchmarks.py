@@ -0,0 +1,200 @@
+"""Benchmarks of physsm's own Python overhead (parameter files, paths, output parsing, stdout forwarding),
+using the trivial stand-in simulation "stand_in.py".
+
+    uv run python benchmarks/run_benchmarks.py [--quick] [--only NAME ...] [--threshold 1.2] [--fail-on-regression]
+
+Every result (time, throughput & peak Python memory) is appended to "benchmarks/results/history.jsonl"
+and compared to the previous result of the same benchmark & size.
+"""
+from __future__ import annotations
+from pathlib import Path
+from typing import Callable
+import argparse
+import contextlib
+import gc
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+from physsm.cpp_builder import CppExperiment, CppExperimentBuilder
+from physsm.experiment_output import ColumnarOutput, ExperimentOutput
+
+BENCH_DIR    = Path(__file__).resolve().parent
+STAND_IN     = BENCH_DIR.joinpath("stand_in.py")
+HISTORY_FILE = BENCH_DIR.joinpath("results", "history.jsonl")
+
+class LineOutput(ExperimentOutput):
+    def __init__(self, out_path):
+        super().__init__(out_path)
+        self.step  = []
+        self.value = []
+
+    def parse_output(self, line_number: int, line: str):
+        step, value = line.split(",")
+        self.step.append(int(step))
+        self.value.append(float(value))
+
+class StandInColumns(ColumnarOutput):
+    columns   = {"step": np.int64, "value": np.float64}
+    delimiter = ","
+
+def make_builder(work_dir: Path, n_points: int, output_rows: int = 0, stdout_lines: int = 0) -> CppExperimentBuilder:
+    executable = work_dir.joinpath(STAND_IN.name) # the executable must be inside the project directory
+    if not executable.exists():
+        shutil.copy2(STAND_IN, executable)
+    builder = CppExperimentBuilder(work_dir, results_dir="results", exp_name=f"exp_{n_points}")
+    builder.add_static_parameter("temperature", np.linspace(0, 5, 100))
+    builder.add_static_parameter("stdout_lines", stdout_lines)
+    builder.add_scaling_parameter("output_rows", {L: output_rows for L in range(1, n_points + 1)})
+    builder.set_executable(executable)
+    return builder
+
+def write_output(path: Path, n_rows: int):
+    chunk = 1_000_000
+    with path.open("w") as file:
+        for start in range(0, n_rows, chunk):
+            file.write("".join(f"{i}, {i*0.5}\n" for i in range(start, min(n_rows, start + chunk))))
+
+# vv each benchmark prepares its data (not timed) and returns the timed function, which returns the number of items processed.
+def bench_set_paths(work_dir: Path, n: int) -> Callable[[], int]:
+    builder = make_builder(work_dir, n)
+    def timed():
+        builder.build()
+        return n
+    return timed
+
+def bench_write_parameter_files(work_dir: Path, n: int) -> Callable[[], int]:
+    builder = make_builder(work_dir, n)
+    builder.add_static_parameter("repeat", 0)
+    experiment = builder.build()
+    def timed():
+        # unchanged files are skipped: a new "repeat" value makes every call rewrite all of them
+        experiment.parameters.static_params["repeat"] += 1
+        counts = experiment.write_parameter_files()
+        if counts["written"] != n:
+            raise RuntimeError(f"write_parameter_files wrote {counts['written']} of {n} files")
+        return n
+    return timed
+
+def bench_grab_files(work_dir: Path, n: int) -> Callable[[], int]:
+    path = work_dir.joinpath(f"out_{n}.txt")
+    write_output(path, n)
+    def timed():
+        LineOutput(path).grab_files()
+        return n
+    return timed
+
+def bench_columnar_grab_files(work_dir: Path, n: int) -> Callable[[], int]:
+    path = work_dir.joinpath(f"out_{n}.txt")
+    write_output(path, n)
+    def timed():
+        StandInColumns(path).grab_files()
+        return n
+    return timed
+
+def bench_runner_stdout(work_dir: Path, n: int) -> Callable[[], int]:
+    experiment: CppExperiment = make_builder(work_dir, 1, stdout_lines=n).build()
+    experiment.set_output_sink("stdout")
+    experiment.write_parameter_files()
+    def timed():
+        record = experiment.run(1)
+        if record is None or record.exit_code != 0:
+            raise RuntimeError(f"stand-in run failed: {record}")
+        return n
+    return timed
+
+BENCHMARKS: dict[str, tuple[Callable[[Path, int], Callable[[], int]], list[int]]] = {
+    "set_paths":             (bench_set_paths,             [10, 1_000, 100_000]),
+    "write_parameter_files": (bench_write_parameter_files, [10, 1_000, 100_000]),
+    "grab_files":            (bench_grab_files,            [1_000, 100_000, 1_000_000, 10_000_000]),
+    "columnar_grab_files":   (bench_columnar_grab_files,   [1_000, 100_000, 1_000_000, 10_000_000]),
+    "runner_stdout":         (bench_runner_stdout,         [1_000, 100_000, 1_000_000]),
+}
+
+def measure(name: str, n: int, repeat: int) -> dict:
+    """Best wall time over repeat runs, then one more run under tracemalloc for the peak Python memory."""
+    make_timed, _ = BENCHMARKS[name]
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        work_dir = Path(tmp)
+        timed    = make_timed(work_dir, n)
+        seconds  = float("inf")
+        for _ in range(repeat):
+            gc.collect()
+            start   = time.perf_counter()
+            items   = timed()
+            seconds = min(seconds, time.perf_counter() - start)
+
+        gc.collect()
+        tracemalloc.start()
+        timed()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {"name": name, "size": n, "seconds": seconds, "throughput": items/seconds, "peak_bytes": peak}
+
+def git_commit() -> str|None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=BENCH_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError) as _:
+        return None
+
+def load_history() -> list[dict]:
+    if not HISTORY_FILE.exists():
+        return []
+    with HISTORY_FILE.open("r") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="physsm overhead benchmarks")
+    parser.add_argument("--quick", action="store_true", help="only the two smallest sizes of each benchmark")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=1.2, help="slowdown ratio reported as regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--no-save", action="store_true", help="do not append the results to the history")
+    args = parser.parse_args()
+
+    previous: dict[tuple, dict] = {(entry["name"], entry["size"]): entry for entry in load_history()}
+    commit      = git_commit()
+    timestamp   = time.time()
+    results     = []
+    regressions = []
+
+    print(f"{'benchmark':<24}{'size':>12}{'time [s]':>12}{'items/s':>14}{'peak [MiB]':>12}{'vs last':>10}")
+    for name in args.only or list(BENCHMARKS):
+        sizes = BENCHMARKS[name][1][:2] if args.quick else BENCHMARKS[name][1]
+        for n in sizes:
+            try:
+                result = measure(name, n, args.repeat if n <= 100_000 else 1)
+            except Exception as e:
+                print(f"{name:<24}{n:>12}  error: {e}")
+                continue
+            result.update({"timestamp": timestamp, "commit": commit})
+            results.append(result)
+
+            ratio  = ""
+            before = previous.get((name, n))
+            if before is not None:
+                change = result["seconds"]/before["seconds"]
+                ratio  = f"{change:.2f}x"
+                if change > args.threshold:
+                    regressions.append((name, n, change))
+            print(f"{name:<24}{n:>12}{result['seconds']:>12.4f}{result['throughput']:>14.0f}{result['peak_bytes']/2**20:>12.1f}{ratio:>10}")
+
+    if not args.no_save and len(results) > 0:
+        HISTORY_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with HISTORY_FILE.open("a") as file:
+            for result in results:
+                file.write(json.dumps(result) + "\n")
+
+    for name, n, change in regressions:
+        print(f"* regression: {name} (size {n}) is {change:.2f}x slower than last time")
+    return 1 if regressions and args.fail_on_regression else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
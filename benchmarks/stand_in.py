@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""Trivial stand-in simulation for the benchmarks: reads a physsm parameter file,
+prints "stdout_lines" lines and writes "output_rows" rows "i, i*0.5" to the output file."""
+import sys
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: stand_in.py parameter.txt", file=sys.stderr)
+        sys.exit(1)
+    parameters = dict()
+    with open(sys.argv[1]) as file:
+        for line in file:
+            key, _, value = line.partition(":")
+            parameters[key.strip()] = value.strip()
+
+    stdout_lines = int(parameters.get("stdout_lines", 0))
+    output_rows  = int(parameters.get("output_rows", 0))
+    sys.stdout.write("".join(f"sweep {i}: energy -1.0 magnetization 0.5\n" for i in range(stdout_lines)))
+    with open(parameters["outputfile"], "w") as file:
+        file.write("".join(f"{i}, {i*0.5}\n" for i in range(output_rows)))
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,16 @@
 #include <string.h>
 #include <stdint.h>
 #include <stdbool.h>
+#include <signal.h>
 
 #define BUFF_LEN 256U
 #define RADIX 10L
 #define VECTOR_CAPACITY 20UL
+#define CHECKPOINT_INTERVAL 10000000UL
+#define EXIT_INTERRUPTED 75 // EX_TEMPFAIL: the run must be resumed from its checkpoint
+
+// vv set by SIGTERM: physsm asks the simulation to write its checkpoint and stop (SIGKILL follows after the grace period)
+static volatile sig_atomic_t terminate_requested = 0;
 
 typedef struct Vec
 {
@@ -22,6 +28,11 @@ bool vector_fill_from_str(Vector* vec, char* buffer, const char* delim);
 void remove_line_break(char* line);
 void trim(char* line);
 bool set_key_value(const char* line, char* key, char* value, const char* delim, size_t len);
+bool has_suffix(const char* str, const char* suffix);
+bool write_binary_output(const char* outputfile_name, const float* data, size_t n);
+void on_sigterm(int signum);
+bool read_checkpoint(const char* checkpoint_name, size_t* trial, double* accumulated);
+bool write_checkpoint(const char* checkpoint_name, size_t trial, double accumulated);
 
 int main(int argc, char* argv[])
 {
@@ -36,6 +47,7 @@ int main(int argc, char* argv[])
     char value[BUFF_LEN];
     const char* delim = ":";
     char outputfile_name[BUFF_LEN];
+    char checkpoint_name[BUFF_LEN] = "";
 
     size_t length             = 0;
     size_t monte_carlo_trials = 0;
@@ -47,7 +59,13 @@ int main(int argc, char* argv[])
         return EXIT_FAILURE;
     }
     
-    FILE* file = fopen(argv[1],"r");
+    // vv "-": the parameters are written to stdin by physsm (set_parameter_passing("stdin"))
+    FILE* file = strcmp(argv[1], "-") == 0 ? stdin : fopen(argv[1],"r");
+    if (file == NULL)
+    {
+        fprintf(stderr, "Could not open parameter file %s\n", argv[1]);
+        return EXIT_FAILURE;
+    }
     char line[BUFF_LEN];
     while (fgets(line, BUFF_LEN, file))
     {
@@ -62,6 +80,10 @@ int main(int argc, char* argv[])
         {
             strcpy(outputfile_name, value);
         }
+        if (strcmp(key, "checkpoint") == 0)
+        {
+            strcpy(checkpoint_name, value);
+        }
         if (strcmp(key, "length") == 0)
         {
             length = strtoul(value, NULL, RADIX);
@@ -82,7 +104,10 @@ int main(int argc, char* argv[])
             }
         }
     }
-    fclose(file);
+    if (file != stdin)
+    {
+        fclose(file);
+    }
 
 
     size_t N_temp = vec.size;
@@ -91,8 +116,48 @@ int main(int argc, char* argv[])
     printf(">> Performing Mock experiment using length=%zu with trials=%zu with %zu temps from %.2f to %.2f. \n",
                 length, monte_carlo_trials, N_temp, start, last);
 
+    // vv mock Monte Carlo loop, resumed from the checkpoint written by an interrupted run (set_checkpointing)
+    signal(SIGTERM, on_sigterm);
+    size_t first_trial = 0;
+    double accumulated = 0.0;
+    if (checkpoint_name[0] != '\0' && read_checkpoint(checkpoint_name, &first_trial, &accumulated))
+    {
+        printf(">> Resuming from checkpoint \"%s\" at trial %zu.\n", checkpoint_name, first_trial);
+    }
+    for (size_t trial = first_trial; trial < monte_carlo_trials; ++trial)
+    {
+        bool periodic = trial > first_trial && trial % CHECKPOINT_INTERVAL == 0;
+        if (checkpoint_name[0] != '\0' && (terminate_requested || periodic))
+        {
+            if (!write_checkpoint(checkpoint_name, trial, accumulated))
+            {
+                fprintf(stderr, "Could not write checkpoint %s\n", checkpoint_name);
+            }
+        }
+        if (terminate_requested)
+        {
+            printf(">> Interrupted at trial %zu.\n", trial);
+            vector_destroy(&vec);
+            return EXIT_INTERRUPTED;
+        }
+        accumulated += 1.0 / (double)(trial + 1);
+    }
+    printf(">> Accumulated %.4f over %zu trials.\n", accumulated, monte_carlo_trials);
+
     printf(">> Saving mock results in \"%s\".\n", outputfile_name);
     
+    if (has_suffix(outputfile_name, ".bin"))
+    {
+        const float results[2] = {(float)length + 0.42f, (float)monte_carlo_trials + 0.42f};
+        if (!write_binary_output(outputfile_name, results, 2))
+        {
+            fprintf(stderr, "Could not write binary output");
+            return EXIT_FAILURE;
+        }
+        vector_destroy(&vec);
+        return EXIT_SUCCESS;
+    }
+
     FILE* outputfile = fopen(outputfile_name, "w");
     fprintf(outputfile, "Hello from C!\n");
     fprintf(outputfile, "result1 => %.2f\n", (float)length + 0.42f);
@@ -224,4 +289,71 @@ bool vector_fill_from_str(Vector* vec, char* buffer, const char* delim)
         num_str = strtok(NULL, delim);
     }       
     return true;
-}
\ No newline at end of file
+}
+
+bool has_suffix(const char* str, const char* suffix)
+{
+    size_t n     = strlen(str);
+    size_t n_suf = strlen(suffix);
+    return n >= n_suf && strcmp(str + n - n_suf, suffix) == 0;
+}
+
+// vv raw binary output for physsm's BinaryOutput: the data goes to "out.bin", and a json header
+// describing name, dtype & shape of every array (stored back to back) goes to "out.json".
+// "<f4" assumes a little-endian machine.
+bool write_binary_output(const char* outputfile_name, const float* data, size_t n)
+{
+    FILE* outputfile = fopen(outputfile_name, "wb");
+    if (outputfile == NULL)
+    {
+        return false;
+    }
+    fwrite(data, sizeof(float), n, outputfile);
+    fclose(outputfile);
+
+    char header_name[BUFF_LEN];
+    size_t stem_len = strlen(outputfile_name) - strlen(".bin");
+    snprintf(header_name, BUFF_LEN, "%.*s.json", (int)stem_len, outputfile_name);
+
+    FILE* header = fopen(header_name, "w");
+    if (header == NULL)
+    {
+        return false;
+    }
+    fprintf(header, "{\"arrays\": [{\"name\": \"results\", \"dtype\": \"<f4\", \"shape\": [%zu]}]}\n", n);
+    fclose(header);
+    return true;
+}
+
+void on_sigterm(int signum)
+{
+    (void)signum;
+    terminate_requested = 1;
+}
+
+bool read_checkpoint(const char* checkpoint_name, size_t* trial, double* accumulated)
+{
+    FILE* checkpoint = fopen(checkpoint_name, "r");
+    if (checkpoint == NULL)
+    {
+        return false;
+    }
+    bool ok = fscanf(checkpoint, "%zu %lf", trial, accumulated) == 2;
+    fclose(checkpoint);
+    return ok;
+}
+
+// vv written to a temporary file then renamed: a run killed while writing leaves the previous checkpoint intact
+bool write_checkpoint(const char* checkpoint_name, size_t trial, double accumulated)
+{
+    char tmp_name[BUFF_LEN + 4];
+    snprintf(tmp_name, sizeof(tmp_name), "%s.tmp", checkpoint_name);
+    FILE* checkpoint = fopen(tmp_name, "w");
+    if (checkpoint == NULL)
+    {
+        return false;
+    }
+    fprintf(checkpoint, "%zu %.17g\n", trial, accumulated);
+    fclose(checkpoint);
+    return rename(tmp_name, checkpoint_name) == 0;
+}
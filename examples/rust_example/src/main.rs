@@ -1,9 +1,44 @@
 use std::env;
 use std::fs;
-use std::io::{Write, Result};
+use std::io::{self, BufRead, Read, Write, Result};
+use std::path::Path;
+use std::sync::atomic::{AtomicBool, Ordering};
 
+/// Exit code of a run interrupted after writing its checkpoint (EX_TEMPFAIL): physsm reruns it later.
+const EXIT_INTERRUPTED: i32       = 75;
+const CHECKPOINT_INTERVAL: usize  = 10_000_000;
+
+/// Set by SIGTERM: physsm asks the simulation to write its checkpoint and stop (SIGKILL follows after the grace period).
+static TERMINATE_REQUESTED: AtomicBool = AtomicBool::new(false);
+
+#[cfg(unix)]
+unsafe extern "C"
+{
+    fn signal(signum: i32, handler: extern "C" fn(i32)) -> usize;
+}
+
+#[cfg(unix)]
+extern "C" fn on_sigterm(_signum: i32)
+{
+    TERMINATE_REQUESTED.store(true, Ordering::SeqCst);
+}
+
+fn install_sigterm_handler()
+{
+    #[cfg(unix)]
+    unsafe
+    {
+        const SIGTERM: i32 = 15;
+        signal(SIGTERM, on_sigterm);
+    }
+}
+
+/// "rust_example.exe parameter.txt" reads a parameter file, "rust_example.exe -" reads the parameters from
+/// $PHYSSM_PARAMETERS or stdin, and "rust_example.exe --worker" runs physsm's persistent worker protocol:
+/// parameter blocks separated by an empty line on stdin, each one answered by "@physsm:done <exit code>".
 fn main() -> Result<()>
 {
+    install_sigterm_handler();
     let args: Vec<String> = env::args().collect();
     if args.len() < 2
     {
@@ -11,13 +46,58 @@ fn main() -> Result<()>
         std::process::exit(1);
     }
 
-    let parameter_file = &args[1];
-    let contents       = fs::read_to_string(parameter_file)
-        .expect("Should have been able to read the file!");
-    
+    match args[1].as_str()
+    {
+        "--worker" => run_worker(),
+        "-" =>
+        {
+            let contents = match env::var("PHYSSM_PARAMETERS")
+            {
+                Ok(contents) => contents,
+                Err(_) =>
+                {
+                    let mut contents = String::new();
+                    io::stdin().read_to_string(&mut contents)?;
+                    contents
+                }
+            };
+            run(&contents)
+        }
+        parameter_file =>
+        {
+            let contents = fs::read_to_string(parameter_file)
+                .expect("Should have been able to read the file!");
+            run(&contents)
+        }
+    }
+}
+
+fn run_worker() -> Result<()>
+{
+    let mut block = String::new();
+    for line in io::stdin().lock().lines()
+    {
+        let line = line?;
+        if !line.trim().is_empty()
+        {
+            block.push_str(&line);
+            block.push('\n');
+            continue;
+        }
+        let exit_code = if run(&block).is_ok() { 0 } else { 1 };
+        println!("@physsm:done {exit_code}");
+        io::stdout().flush()?;
+        block.clear();
+    }
+    Ok(())
+}
+
+fn run(contents: &str) -> Result<()>
+{
     println!("Hello from Rust! Reading parameters: \n{contents}");
 
     let mut output_file_name: Option<String>  = None;
+    let mut checkpoint: Option<String>        = None;
     let mut lx: Option<usize>                 = None;
     let mut ly: Option<usize>                 = None;
     
@@ -33,6 +113,7 @@ fn main() -> Result<()>
         match key
         {
             "outputfile" =>  output_file_name          = Some(value.to_string()),
+            "checkpoint" =>  checkpoint                = Some(value.to_string()),
             "Lx"     =>  lx                            = Some(value.trim().parse().expect("Should be able to parse lx")),
             "Ly"     =>  ly                            = Some(value.trim().parse().expect("Should be able to parse ly")),
             "monte_carlo_trials" => monte_carlo_trials = Some(value.trim().parse().expect("Should be able to parse monte_carlo_trials")),
@@ -56,10 +137,45 @@ fn main() -> Result<()>
     println!(">> Performing Mock experiment using N={lx}x{ly} with trials={monte_carlo_trials} with {n_temp} temps from {:.2} to {:.2}.",
                 start, last);
 
+    // vv mock Monte Carlo loop, resumed from the checkpoint written by an interrupted run (set_checkpointing)
+    let (first_trial, mut accumulated) = match &checkpoint
+    {
+        Some(path) if Path::new(path).exists() =>
+        {
+            let state = read_checkpoint(path)?;
+            println!(">> Resuming from checkpoint \"{path}\" at trial {}.", state.0);
+            state
+        }
+        _ => (0, 0.0),
+    };
+    for trial in first_trial..monte_carlo_trials
+    {
+        let requested = TERMINATE_REQUESTED.load(Ordering::SeqCst);
+        if let Some(path) = &checkpoint
+        {
+            if requested || (trial > first_trial && trial % CHECKPOINT_INTERVAL == 0)
+            {
+                write_checkpoint(path, trial, accumulated)?;
+            }
+        }
+        if requested
+        {
+            println!(">> Interrupted at trial {trial}.");
+            io::stdout().flush()?;
+            std::process::exit(EXIT_INTERRUPTED);
+        }
+        accumulated += 1.0 / (trial + 1) as f64;
+    }
+    println!(">> Accumulated {accumulated:.4} over {monte_carlo_trials} trials.");
+
     let result1 = (lx as f32)                 + 0.42_f32;
     let result2 = (monte_carlo_trials as f32) + 0.42_f32;
 
     println!(">> Writing in {output_file_name}");
+    if output_file_name.ends_with(".bin")
+    {
+        return write_binary_output(&output_file_name, &[result1, result2]);
+    }
     let mut file = std::fs::File::create(output_file_name)?;
 
     writeln!(&mut file, "Hello from Rust! Layout: result1, result2")?;
@@ -68,3 +184,32 @@ fn main() -> Result<()>
     
     Ok(())
 }
+
+/// Raw binary output for physsm's BinaryOutput: the data goes to "out.bin", and a json header
+/// describing name, dtype & shape of every array (stored back to back) goes to "out.json".
+fn write_binary_output(output_file_name: &str, data: &[f32]) -> Result<()>
+{
+    let bytes: Vec<u8> = data.iter().flat_map(|x| x.to_le_bytes()).collect();
+    fs::write(output_file_name, bytes)?;
+
+    let header_name = format!("{}.json", output_file_name.trim_end_matches(".bin"));
+    let header      = format!("{{\"arrays\": [{{\"name\": \"results\", \"dtype\": \"<f4\", \"shape\": [{}]}}]}}", data.len());
+    fs::write(header_name, header)
+}
+
+fn read_checkpoint(path: &str) -> Result<(usize, f64)>
+{
+    let contents = fs::read_to_string(path)?;
+    let mut fields = contents.split_whitespace();
+    let trial       = fields.next().and_then(|x| x.parse().ok()).expect("Should be able to parse the checkpoint trial");
+    let accumulated = fields.next().and_then(|x| x.parse().ok()).expect("Should be able to parse the checkpoint value");
+    Ok((trial, accumulated))
+}
+
+/// Written to a temporary file then renamed: a run killed while writing leaves the previous checkpoint intact.
+fn write_checkpoint(path: &str, trial: usize, accumulated: f64) -> Result<()>
+{
+    let tmp_path = format!("{path}.tmp");
+    fs::write(&tmp_path, format!("{trial} {accumulated:e}\n"))?;
+    fs::rename(tmp_path, path)
+}
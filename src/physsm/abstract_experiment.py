@@ -1,105 +1,413 @@
 from __future__ import annotations
 import numpy as np
-from typing import Any, Generic 
+from typing import Any, Callable, Generic, Iterator
 from abc import abstractmethod, ABC
 from pathlib import Path
-from io import TextIOWrapper
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
+from functools import partial
+from itertools import repeat
+import asyncio
+import hashlib
+import io
+import os
+import threading
+import time
 
 from .experiment_data import BaseExperimentData, OutType
 from .runnner import*
+from .output_sink import OutputSink, StdoutSink, DiscardSink, FileSink, RingBufferSink, CallbackSink
 from .path_logger import IPathLogger
+from .run_cache import RunCache
+from .lazy_results import LazyResults, load_output
+from .result_cache import ResultCache
+from .scale_grid import ScaleGrid
+from .ensemble import Replica, ReplicaStatistics, WelfordAccumulator
+from .adaptive import AdaptiveSweep, curvature_loss
+from .tail import DirectoryWatcher
+from .experiment_store import ExperimentStore, STORE_FILE
+from .metrics import MetricsLog, PowerLaw, fit_power_law
+from .job_queue import JobQueue, JOB_QUEUE_FILE, PENDING, RUNNING, DONE, FAILED, CANCELLED
+from .slurm import SlurmBackend, SlurmCommands
+from .manifest import write_manifest, read_manifest
+from .events import Event, JsonlEventWriter, format_count, format_duration, format_examples
+from .progress import ProgressView
+from .sweep import Sweep, JobStates, queue_states, slurm_states
 
 def array_to_str(array: np.ndarray, rounding: int) -> str:
-    temps_str = []
-    for val in array:
-        temps_str.append(str(round(val, rounding)))
-    return ", ".join(temps_str)
+    rounded = np.round(np.ravel(array), rounding)
+    return ", ".join(rounded.astype(str))
+
+SIDECAR_FORMATS = ["npy", "raw"]
+
+SIDECAR_SUFFIXES = {"npy": ".npy", "raw": ".bin"}
+
+def write_sidecar(array: np.ndarray, path: Path, sidecar_format: str, written: set[Path]|None = None) -> Path:
+    """Saves array next to the parameter file: as ".npy", or as raw little-endian float64 (".bin"). The extension is appended to
+    the name of path, which may contain dots (for ex "parameter_L=4,T=2.25_field"). The path is added to written if the file changed."""
+    if sidecar_format == "npy":
+        path   = path.with_name(f"{path.name}.npy")
+        buffer = io.BytesIO()
+        np.save(buffer, array)
+        changed = write_atomic(path, buffer.getvalue())
+    elif sidecar_format == "raw":
+        path    = path.with_name(f"{path.name}.bin")
+        changed = write_atomic(path, np.ravel(array).astype("<f8").tobytes())
+    else:
+        raise ValueError(f"write_sidecar() error: unknown format \"{sidecar_format}\", use one of {SIDECAR_FORMATS}")
+    if changed and written is not None:
+        written.add(path)
+    return path
+
+CONSOLIDATE_BATCH = 16
+WATCH_IDLE_TIMEOUT = 60.0 # s without new lines before watch() stops, when nothing else ends it
+OUTPUT_MODES    = ["stdout", "discard", "file", "ring"]
 
 class AbstractExperiment(ABC, BaseExperimentData, Generic[OutType]):
     def __init__(self, exp_data: BaseExperimentData):
         super().__init__(exp_data.paths_data)
         self.copy_data(exp_data)
+        self.run_cache    = RunCache(self.paths_data.target_dir, self.paths_data.events)
+        self.result_cache = ResultCache(self.paths_data.target_dir, self.paths_data.events)
+        self.job_queue: JobQueue|None = None
+        self.slurm: SlurmBackend|None = None
+        self.metrics      = MetricsLog(self.paths_data.target_dir)
+        store_path        = self.paths_data.target_dir.joinpath(STORE_FILE)
+        self.store: ExperimentStore|None = ExperimentStore(store_path, events=self.paths_data.events) if store_path.exists() else None
+        self.consolidate_runs    = False
+        self.remove_consolidated = False
+        self.to_consolidate: list = []
+        self.consolidate_lock    = threading.Lock()
+        self.param_format        = (":", 3)
+        self.sidecar_digests: dict[Path, tuple[int, int, str]] = dict()
+        self.output_mode: str|Callable[[Any, str], None] = "stdout"
+        self.ring_size           = 100
+        self.run_logs: dict[Any, RingBufferSink] = dict()
+        self.checkpoint_key: str|None = None
+        self.events              = self.paths_data.events
+        self.parameters.events   = self.events
+        self.progress_interval: float|None = 5.0
+        if self.runner is not None:
+            self.runner.events = self.events
+
+    def set_log_level(self, level: str = "info"):
+        """"debug" prints one line per file & run, "info" (default) the summaries & the progress of the sweeps,
+        "warning" / "error" only the problems. The callbacks get the events of their own level (see add_event_callback)."""
+        self.events.set_level(level)
+
+    def add_event_callback(self, callback: Callable[[Event], None], level: str = "debug") -> Callable[[Event], None]:
+        """Calls callback(event) for every event of at least level (see Event: level, kind, message, data & timestamp)."""
+        return self.events.add_callback(callback, level)
+
+    def log_events_to(self, path: Path, level: str = "debug") -> JsonlEventWriter:
+        """Appends every event of at least level to path as json lines, returns the writer (remove_event_callback(writer) to stop)."""
+        writer = JsonlEventWriter(path)
+        self.events.add_callback(writer, level)
+        return writer
+
+    def remove_event_callback(self, callback: Callable[[Event], None]):
+        self.events.remove_callback(callback)
+        if isinstance(callback, JsonlEventWriter):
+            callback.close()
+
+    def set_progress(self, interval: float|None = 5.0):
+        """Progress of run_all, arun_all, wait & slurm_wait every interval seconds (None: off): completed & running jobs, points per hour and
+        ETA from the runtime scaling of the previous runs (see fit_runtime_scaling). Rewritten in place unless the output of the runs goes to stdout."""
+        if interval is not None and interval <= 0:
+            raise ValueError("set_progress() error: interval must be positive")
+        self.progress_interval = interval
+
+    def save_manifest(self) -> Path|None:
+        """Saves the parameters, file name templates, output class, runner & settings of the experiment in "manifest.json"
+        (arrays in "manifest.npz"), so that load_experiment reopens it without the builder. Called by build(), call it again
+        after changing the settings. Function grid parameters are saved as their values on the current grid."""
+        try:
+            settings = {"param_format": list(self.param_format), "checkpoint_key": self.checkpoint_key, "consolidate_runs": self.consolidate_runs,
+                        "remove_consolidated": self.remove_consolidated, "output_mode": self.output_mode if isinstance(self.output_mode, str) else "stdout",
+                        "ring_size": self.ring_size, "log_level": self.events.get_level(), "progress_interval": self.progress_interval, "slurm": None if self.slurm is None else {"options": self.slurm.options, "commands": vars(self.slurm.commands)}}
+            return write_manifest(self, type(self), settings)
+        except TypeError as e:
+            self.events.warning("manifest", f">> Manifest not saved: {e}")
+            return None
+
+    @classmethod
+    def load_experiment(cls, path: Path, out_type: type|None = None) -> AbstractExperiment:
+        """Reopens the experiment saved in the directory path (see save_manifest), for ex CppExperiment.load_experiment(proj_dir / "results" / "exp"):
+        nothing is rebuilt nor checked on disk, the paths are made from the templates when used. out_type replaces the saved output class
+        (for ex one defined in a notebook)."""
+        try:
+            exp_data, experiment_class, settings = read_manifest(path, out_type)
+        except (OSError, ValueError, ImportError, KeyError) as e:
+            raise ValueError(f"load_experiment() error: {e}")
+        if not issubclass(experiment_class, cls):
+            raise TypeError(f"load_experiment() error: \"{path}\" is a {experiment_class.__name__}, not a {cls.__name__}")
+        experiment = experiment_class(exp_data)
+        experiment.param_format        = tuple(settings["param_format"])
+        experiment.checkpoint_key      = settings["checkpoint_key"]
+        experiment.consolidate_runs    = settings["consolidate_runs"]
+        experiment.remove_consolidated = settings["remove_consolidated"]
+        experiment.output_mode         = settings["output_mode"]
+        experiment.ring_size           = settings["ring_size"]
+        experiment.progress_interval   = settings.get("progress_interval", 5.0)
+        experiment.set_log_level(settings.get("log_level", "info"))
+        if settings["slurm"] is not None:
+            experiment.slurm = SlurmBackend(experiment.paths_data.target_dir, SlurmCommands(**settings["slurm"]["commands"]), settings["slurm"]["options"], experiment.events)
+        if experiment.consolidate_runs:
+            experiment.get_store()
+        experiment.events.info("loaded", f">> Loaded {experiment_class.__name__} \"{experiment.paths_data.target_dir.name}\" ({format_count(len(experiment.paths_data.param_paths))} scale variables)",
+                               path=experiment.paths_data.target_dir)
+        return experiment
             
     def get_scale_variables(self) -> Any:
         if self.parameters.scale_variables is None:
             raise ValueError("scale_variables() Error: No scale variables")
         return self.parameters.scale_variables
 
+    def get_scale_grid(self) -> ScaleGrid:
+        if self.parameters.scale_grid is None:
+            raise ValueError("get_scale_grid() Error: No scale grid")
+        return self.parameters.scale_grid
+
+    def select_scale_variables(self, **selection) -> list[tuple]:
+        """Points of a sub-grid, for ex select_scale_variables(Lx=8, seed=[0, 1]), to be passed to
+        write_parameter_files, run_all or get_results."""
+        return self.get_scale_grid().select(**selection).points()
+
+    def _selected(self, scale_variables: list|None) -> list:
+        if scale_variables is None:
+            return list(self.get_scale_variables())
+        unknown = [L for L in scale_variables if L not in self.paths_data.param_paths]
+        if len(unknown) > 0:
+            raise KeyError(f"unknown scale variables {unknown}")
+        return list(scale_variables)
+
+    def extend_scale_axis(self, axis: str, values: list) -> list[tuple]:
+        """Adds values to an axis of the scale grid, for ex extend_scale_axis("T", [2.25, 2.3]), and sets the paths of the new points,
+        named like the existing ones. Returns the new points, whose parameter files still need to be written."""
+        grid = self.get_scale_grid()
+        try:
+            new_grid = grid.extend(axis, values)
+            for name, grid_param in self.parameters.grid_params.items():
+                grid_param.validate(new_grid, name)
+        except Exception as e:
+            raise ValueError(f"extend_scale_axis() error {e.args}")
+
+        reference    = next(iter(grid))
+        ref_suffix   = "_" + self.parameters.get_scale_suffix(reference)
+        param_path   = self.get_parameter_path(reference)
+        out_path     = self.get_output(reference)
+        param_prefix = param_path.stem.removesuffix(ref_suffix)
+        out_prefix   = out_path.stem.removesuffix(ref_suffix)
+
+        self.parameters.set_scale_grid(new_grid)
+        new_points = [point for point in new_grid if point not in self.paths_data.param_paths]
+        for point in new_points:
+            suffix = self.parameters.get_scale_suffix(point)
+            self.paths_data.set_param_path(point, f"{param_prefix}_{suffix}{param_path.suffix}")
+            self.paths_data.set_out_path(point, f"{out_prefix}_{suffix}{out_path.suffix}")
+        self.events.info("paths", f"* paths set for {format_count(len(new_points))} new points", n_paths=len(new_points))
+        self.save_manifest()
+        return new_points
+
     def get_static_parameter(self, key) -> Any:
         return self.parameters.static_params[key]
  
     def get_scaling_parameter(self, key) -> dict:
         return self.parameters.scaling_params[key]
             
-    def __write_formated(self, L, delim: str=':', rounding=3):     
-        
-        out_key = self.out_key      
-        with self.paths_data.param_paths[L].open("w") as file: # type: ignore
-            for name in self.parameters.scale_variable_names:
-                file.write(f"{name}{delim} {L}\n")
-            self.__write_static(file, delim, rounding)
-            self.__write_scaling(file, L, delim, rounding)
-            file.write(f"{out_key}{delim} {self.paths_data.out_paths[L]}")
-            
-    def __write_scaling(self, file: TextIOWrapper, L, delim: str, rounding: int):
-         for key in self.parameters.scaling_params:
-            param_value = self.get_scaling_parameter(key)[L]
-            
-            if isinstance(param_value, np.ndarray):
-                param_value = array_to_str(param_value, rounding)
-            file.write(f"{key}{delim} {param_value}\n")
-            
-    def __write_static(self, file: TextIOWrapper, delim: str, rounding: int):
+    def __format_value(self, value, rounding: int, sidecar_path: Path, sidecar_size: int|None, sidecar_format: str, written: set[Path]|None = None) -> Any:
+        if not isinstance(value, np.ndarray):
+            return value
+        if sidecar_size is not None and value.size >= sidecar_size:
+            return write_sidecar(value, sidecar_path, sidecar_format, written)
+        return array_to_str(value, rounding)
+
+    def __static_sidecar(self, key: str) -> Path:
+        return self.paths_data.target_dir.joinpath(f"static_{key}")
+
+    def __scaling_sidecar(self, L, key: str) -> Path:
+        param_path = self.paths_data.param_paths[L]
+        return param_path.with_name(f"{param_path.stem}_{key}")
+
+    def __render_static(self, delim: str, rounding: int, sidecar_size: int|None = None, sidecar_format: str = "npy", written: set[Path]|None = None) -> str:
+        lines = []
         for key in self.parameters.static_params:
-            param = self.get_static_parameter(key)
-            if isinstance(param, np.ndarray):
-                param = array_to_str(param, rounding)
-            file.write(f"{key}{delim} {param}\n")
+            param = self.__format_value(self.get_static_parameter(key), rounding, self.__static_sidecar(key), sidecar_size, sidecar_format, written)
+            lines.append(f"{key}{delim} {param}\n")
+        return "".join(lines)
+
+    def __render_scaling(self, L, delim: str, rounding: int, sidecar_size: int|None = None, sidecar_format: str = "npy", written: set[Path]|None = None) -> str:
+        lines = []
+        scale = L.scale if isinstance(L, Replica) else L
+        for key in self.parameters.get_scaling_names():
+            param_value = self.__format_value(self.parameters.get_scaling_value(key, scale), rounding, self.__scaling_sidecar(L, key), sidecar_size, sidecar_format, written)
+            lines.append(f"{key}{delim} {param_value}\n")
+        return "".join(lines)
+
+    def _sidecar_digests(self, L, parameters: str) -> bytes:
+        """Digests of the sidecar files referenced by the parameter file of L (see write_sidecar), whose content is not in the file.
+        A digest is computed again only when the size or mtime of its file changed."""
+        paths  = [self.__static_sidecar(key) for key in self.parameters.static_params]
+        paths += [self.__scaling_sidecar(L, key) for key in self.parameters.get_scaling_names()]
+        digests = []
+        for path in paths:
+            for suffix in SIDECAR_SUFFIXES.values():
+                sidecar = path.with_name(f"{path.name}{suffix}")
+                if str(sidecar) not in parameters or not sidecar.exists():
+                    continue
+                stat  = sidecar.stat()
+                entry = self.sidecar_digests.get(sidecar)
+                if entry is None or entry[:2] != (stat.st_size, stat.st_mtime_ns):
+                    with sidecar.open("rb") as file:
+                        entry = (stat.st_size, stat.st_mtime_ns, hashlib.file_digest(file, "sha256").hexdigest())
+                    self.sidecar_digests[sidecar] = entry
+                digests.append(f"{sidecar.name}:{entry[2]}")
+        return "\n".join(digests).encode()
+
+    def __get_scale_items(self, L) -> list[tuple[str, Any]]:
+        if isinstance(L, Replica):
+            return self.parameters.get_scale_items(L.scale) + [(L.seed_key, L.seed)]
+        return self.parameters.get_scale_items(L)
+
+    def __render_formated(self, L, delim: str=':', rounding=3, static_block: str|None = None, sidecar_size: int|None = None, sidecar_format: str = "npy",
+                          out_path: Path|None = None, written: set[Path]|None = None) -> str:
+        if static_block is None:
+            static_block = self.__render_static(delim, rounding, sidecar_size, sidecar_format, written)
+        
+        out_key  = self.out_key
+        out_path = self.paths_data.out_paths[L] if out_path is None else out_path
+        content  = "".join([f"{name}{delim} {value}\n" for name, value in self.__get_scale_items(L)])
+        content += static_block
+        content += self.__render_scaling(L, delim, rounding, sidecar_size, sidecar_format, written)
+        if self.checkpoint_key is not None:
+            content += f"{self.checkpoint_key}{delim} {out_path.with_suffix('.ckpt')}\n"
+        content += f"{out_key}{delim} {out_path}"
+        return content
+
+    def __write_formated(self, L, delim: str=':', rounding=3, static_block: str|None = None, sidecar_size: int|None = None, sidecar_format: str = "npy") -> bool:
+        return write_atomic(self.paths_data.param_paths[L], self.__render_formated(L, delim, rounding, static_block, sidecar_size, sidecar_format))
  
-    def write_parameter_file(self, L: int, delim: str=':', rounding=3) -> bool:
+    def write_parameter_file(self, L: int, delim: str=':', rounding=3, static_block: str|None = None, sidecar_size: int|None = None, sidecar_format: str = "npy") -> bool:
         try:
-            self.__write_formated(L, delim, rounding)
-            print(f"-- \"{self.log_path(self.paths_data.param_paths[L])}\": ", end="")          
+            self.__write_formated(L, delim, rounding, static_block, sidecar_size, sidecar_format)
+            self.events.debug("param_file", f"-- \"{self.log_path(self.paths_data.param_paths[L])}\": done", key=L, written=True)
             return True
         except Exception as e:
-            print(f"write_parameter_file error: {e}, {e.args}")
+            self.events.error("param_file_error", f"write_parameter_file error: {e}, {e.args}", key=L)
             return False
             
-    def write_parameter_files(self, delim: str=':', rounding=3):        
+    def write_parameter_files(self, delim: str=':', rounding=3, sidecar_size: int|None = None, sidecar_format: str = "npy", scale_variables: list|None = None,
+                              io_workers: int|None = None) -> dict[str, int]:
+        """Arrays with at least sidecar_size elements are written to a sidecar file (see write_sidecar) whose path
+        replaces the values in the parameter file. The static parameters are formatted only once for all files.
+        scale_variables restricts the files written to a subset (for ex: select_scale_variables(Lx=8)).
+
+        All contents are rendered first, then written atomically (see write_atomic), in a thread pool of io_workers threads
+        if given (for network filesystems). Files whose content did not change are left untouched; a file is counted as written
+        if one of its sidecar files changed. Returns the number of files written, unchanged & failed."""
         if self.parameters.scale_variables is None:
             raise ValueError("writing parameter Error: scale_variables not set!")
         
-        print(f">> writing parameter files:")
-        for L in self.parameters.scale_variables:
+        self.events.info("param_files", ">> writing parameter files:")
+        static_written: set[Path] = set()
+        static_block = self.__render_static(delim, rounding, sidecar_size, sidecar_format, static_written)
+        contents: dict[Any, str] = dict()
+        errors: dict[Any, str]   = dict()
+        sidecars_changed         = set()
+        for L in self._selected(scale_variables):
+            try:
+                written_L: set[Path] = set()
+                contents[L] = self.__render_formated(L, delim, rounding, static_block, sidecar_size, sidecar_format, written=written_L)
+                if len(static_written) + len(written_L) > 0:
+                    sidecars_changed.add(L)
+            except Exception as e:
+                errors[L] = f"{e}, {e.args}"
+
+        def write(L) -> bool|None:
             try:
-                if self.write_parameter_file(L, delim, rounding):
-                    print("done")
+                return write_atomic(self.paths_data.param_paths[L], contents[L])
             except Exception as e:
-                print(f"write_parameter_files Error: {e}, {e.args}")
+                errors[L] = f"{e}, {e.args}"
+                return None
+        
+        if io_workers is not None and io_workers > 1:
+            with ThreadPoolExecutor(max_workers=io_workers) as pool:
+                written = dict(zip(contents, pool.map(write, contents)))
+        else:
+            written = {L: write(L) for L in contents}
+
+        counts   = {"written": 0, "unchanged": 0, "failed": len(errors)}
+        per_file = self.events.wants("debug")
+        for L, was_written in written.items():
+            if was_written is None:
+                continue
+            was_written = was_written or L in sidecars_changed
+            counts["written" if was_written else "unchanged"] += 1
+            if per_file:
+                self.events.debug("param_file", f"-- \"{self.log_path(self.paths_data.param_paths[L])}\": {'done' if was_written else 'unchanged'}",
+                                  key=L, written=was_written)
+        for L, error in errors.items():
+            self.events.debug("param_file_error", f"write_parameter_files Error for {L}: {error}", key=L, error=error)
+        total = len(set(contents) | set(errors))
+        self.events.info("summary", f"* written {format_count(counts['written'])}/{format_count(total)} files, {format_count(counts['unchanged'])} unchanged, "
+                                    f"{format_count(counts['failed'])} failed", **counts)
+        if len(errors) > 0:
+            self.events.error("param_file_error", f"* write_parameter_files Error for {format_examples([f'{L}: {error}' for L, error in errors.items()], 1)}",
+                              failed=list(errors))
+        return counts
  
+    def set_parameter_passing(self, mode: str = "stdin", persistent = False, worker_arg: str = WORKER_ARG, delim: str = ':', rounding = 3):
+        """Passes the parameters without parameter files (see IRunner.set_parameter_passing): rendered like write_parameter_files(delim, rounding)
+        and written to the stdin of the executable ("stdin") or to $PHYSSM_PARAMETERS ("env"), the argument being "-".
+        With persistent, each worker thread of run_all keeps one process (started with worker_arg) which reads the parameter blocks
+        of all its runs on stdin. mode="file" restores the parameter files. The job queue (submit_all) always uses parameter files."""
+        if self.runner is None:
+            raise TypeError("set_parameter_passing() error: Runner not set")
+        self.runner.set_parameter_passing(mode, persistent, worker_arg)
+        self.param_format = (delim, rounding)
+        self.events.info("settings", f">> Parameter passing: {mode}{' (persistent workers)' if persistent else ''}", param_mode=mode, persistent=persistent)
+
+    def render_parameters(self, L) -> str|None:
+        """Content of the parameter file of L when the parameters are passed without files, None otherwise."""
+        if self.runner is None or self.runner.param_mode == "file":
+            return None
+        delim, rounding = self.param_format
+        return self.__render_formated(L, delim, rounding)
+
+    def render_parameters_for(self, L, out_path: Path) -> str:
+        """Content of the parameter file of L writing to out_path instead of the output of L (for ex for a training run)."""
+        delim, rounding = self.param_format
+        return self.__render_formated(L, delim, rounding, out_path=out_path)
+
+    def close_workers(self):
+        """Stops the persistent workers (done at the end of run_all & arun_all)."""
+        if self.runner is not None:
+            self.runner.close_workers()
+
     def are_parameter_files_available(self) -> bool:        
-        has_all_files = True
-        missing_files: list[Path] = []
-        print(">> Looking for parameter files:")
+        self.events.info("lookup", ">> Looking for parameter files:")
         if self.parameters.scale_variables is None:
-            print(f"* No scale_variables set")
+            self.events.warning("lookup", f"* No scale_variables set")
             return False
         
+        per_file      = self.events.wants("debug")
+        missing_files: list[Path] = []
         for L in self.parameters.scale_variables:
             param_path = self.paths_data.param_paths[L]
             if param_path.exists():
-                print(f"-- Found parameter file: {self.log_path(param_path)}")
+                if per_file:
+                    self.events.debug("param_file_found", f"-- Found parameter file: {self.log_path(param_path)}", key=L)
             else:
                 missing_files.append(param_path)
-                has_all_files = False
+                if per_file:
+                    self.events.debug("param_file_missing", f"-- not written yet: {self.log_path(param_path)}", key=L)
                 
-        if has_all_files:
-            print("* Parameter files available")
-        else:
-            print("* Not all parameter files created yet:")    
-            for files in missing_files:
-                print(f"-- not written yet: {self.log_path(files)}")
-        return has_all_files
+        total = len(self.parameters.scale_variables)
+        self.events.info("summary", f"* found {format_count(total - len(missing_files))}/{format_count(total)} parameter files",
+                         found=total - len(missing_files), total=total)
+        if len(missing_files) > 0:
+            self.events.info("summary", f"* Not all parameter files created yet: {format_examples([self.log_path(file) for file in missing_files])}",
+                             missing=len(missing_files))
+        return len(missing_files) == 0
      
     def get_parameter_path(self, L):
         return self.paths_data.param_paths[L]
@@ -108,63 +416,788 @@ class AbstractExperiment(ABC, BaseExperimentData, Generic[OutType]):
         return self.paths_data.out_paths[L]
     
     def has_output(self, L):
-        return self.paths_data.out_paths[L].exists()
+        return self.is_stored(L) or self.paths_data.out_paths[L].exists()
+
+    def is_stored(self, L) -> bool:
+        return self.store is not None and self.paths_data.out_paths[L].name in self.store
     
     def are_results_available(self) -> bool:
         if self.parameters.scale_variables is None:
-            print("* No scale variables found, cannot search results.")
+            self.events.warning("lookup", "* No scale variables found, cannot search results.")
             return False 
         
-        all_available = True
-        some_availabe = False
+        per_file      = self.events.wants("debug")
         missing_files = []
-        print(">> Looking for output files:")
+        self.events.info("lookup", ">> Looking for output files:")
         for L in self.parameters.scale_variables:
             file = self.paths_data.out_paths[L]  
             if self.has_output(L):
-                print(f"-- Found output: {self.log_path(file)}")
-                some_availabe = True
+                if per_file:
+                    self.events.debug("output_found", f"-- Found output: {self.log_path(file)}", key=L)
             else:
                 missing_files.append(file)
-                all_available = False
+                if per_file:
+                    self.events.debug("output_missing", f"-- missing output: {self.log_path(file)}", key=L)
                 
-        if not all_available:
-            print(f"* missing output:")
-            for file in missing_files:
-                print(f"-- {self.log_path(file)}")
-        if not some_availabe:
-            print("* No output files created yet.")
-            
-        return some_availabe
+        total = len(self.parameters.scale_variables)
+        found = total - len(missing_files)
+        self.events.info("summary", f"* found {format_count(found)}/{format_count(total)} outputs", found=found, total=total)
+        if found == 0:
+            self.events.info("summary", "* No output files created yet.")
+        elif len(missing_files) > 0:
+            self.events.info("summary", f"* missing output: {format_examples([self.log_path(file) for file in missing_files])}", missing=len(missing_files))
+        return found > 0
+
+    def _load_output(self, L, use_cache = True) -> OutType:
+        if self.out_type is None:
+            raise TypeError("get_results() error: output_type not set!")
+        out_path = self.get_output(L)
+        if self.store is not None and self.store.is_current(out_path.name, self.out_type, out_path):
+            return self.store.get(out_path.name, self.out_type, out_path) # type: ignore
+        if use_cache:
+            cached = self.result_cache.load(self.out_type, out_path)
+            if cached is not None:
+                return cached # type: ignore
+        
+        output = load_output(self.out_type, out_path)
+        if use_cache:
+            self.result_cache.store(output)
+        return output
 
-    def get_results(self) -> dict[int, OutType]: 
+    def get_results(self, parallel = False, max_workers: int|None = None, use_cache = True, scale_variables: list|None = None) -> LazyResults[OutType]: 
+        """Returns a mapping scale variable -> output for every available output.
+        
+        Outputs are parsed on first access and kept. With parallel, all of them are parsed right away in a process pool
+        (the output type must then be picklable, i.e. defined in a module rather than in the notebook on spawn platforms).
+        With use_cache, parsed arrays are stored in "result_cache/" and reloaded as long as the output file is unchanged.
+        """
         if self.parameters.scale_variables is None:
             raise ValueError("get_results() error: scale_variables not set!")
         
         if self.out_type is None:
             raise TypeError("get_results() error: output_type not set!")
          
-        has_results = False
-        results: dict[int, OutType] = dict()
+        available = [L for L in self._selected(scale_variables) if self.has_output(L)]
+        if self.is_verbose_log() and self.events.wants("debug"):
+            for L in available:
+                self.events.debug("output_found", f"Found output: \"{self.log_path(self.get_output(L))}\"", key=L)
         
-        for L in self.parameters.scale_variables:
-            if self.has_output(L):
-                if self.is_verbose_log():
-                    print(f"Found output: \"{self.log_path(self.get_output(L))}")
-                has_results = True
-        if not has_results:
-            return dict()
- 
-        for L in self.parameters.scale_variables:
-            if self.has_output(L):
-                results[L] = self.out_type(self.get_output(L))
-                results[L].grab_files()
+        results = LazyResults(available, partial(self._load_output, use_cache=use_cache))
+        if not parallel:
+            return results
+        
+        to_parse = []
+        for L in available:
+            if self.store is not None and self.store.is_current(self.get_output(L).name, self.out_type, self.get_output(L)):
+                results.set_loaded(L, self._load_output(L, use_cache))
+                continue
+            cached = self.result_cache.load(self.out_type, self.get_output(L)) if use_cache else None
+            if cached is not None:
+                results.set_loaded(L, cached) # type: ignore
+            else:
+                to_parse.append(L)
+        if len(to_parse) == 0:
+            return results
+        
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            outputs = pool.map(load_output, repeat(self.out_type), [self.get_output(L) for L in to_parse])
+            for L, output in zip(to_parse, outputs):
+                results.set_loaded(L, output)
+                if use_cache:
+                    self.result_cache.store(output)
         return results
+
+    def _has_job_queue(self) -> bool:
+        return self.job_queue is not None or self.paths_data.target_dir.joinpath(JOB_QUEUE_FILE).exists()
+
+    def _jobs_finished(self) -> bool:
+        if not self._has_job_queue():
+            return False
+        counts = self.get_job_queue().count()
+        return counts[PENDING] + counts[RUNNING] == 0
+
+    def watch(self, scale_variables: list|None = None, min_interval: float = 0.1, max_interval: float = 2.0, timeout: float|None = None,
+              stop: Callable[[], bool]|None = None, idle_timeout: float|None = None) -> Iterator[dict[Any, OutType]]:
+        """Follows the outputs while the simulations are writing them (see ExperimentOutput.follow), for live plots:
+            for outputs in experiment.watch():
+                plot(outputs)
+        Yields {L: output} (the outputs found so far, updated in place) every time new lines were parsed.
+        Waits with inotify on Linux, by polling with a backoff elsewhere. Stops on timeout, when stop() returns True,
+        with the job queue (submit_all) when no job is pending or running anymore, or when no new line was parsed for
+        idle_timeout seconds. Without timeout, stop nor job queue, idle_timeout defaults to WATCH_IDLE_TIMEOUT.
+        """
+        if self.out_type is None:
+            raise TypeError("watch() error: output_type not set!")
+        if idle_timeout is None and timeout is None and stop is None and not self._has_job_queue():
+            idle_timeout = WATCH_IDLE_TIMEOUT
+        
+        outputs     = {L: self.out_type(self.get_output(L)) for L in self._selected(scale_variables)}
+        watcher     = DirectoryWatcher(self.paths_data.target_dir, min_interval, max_interval)
+        start       = time.perf_counter()
+        last_change = start
+        try:
+            while True:
+                finished = (stop is not None and stop()) or self._jobs_finished()
+                n_lines  = sum([output.follow() for output in outputs.values()])
+                now      = time.perf_counter()
+                if n_lines > 0:
+                    last_change = now
+                    yield {L: output for L, output in outputs.items() if output.has_file()}
+                if finished or (timeout is not None and now - start > timeout) or (idle_timeout is not None and now - last_change > idle_timeout):
+                    return
+                watcher.wait(n_lines > 0)
+        finally:
+            watcher.close()
+
+    def get_replicas(self, L, n: int, seed_key: str = "seed", first_seed: int = 0) -> list[Replica]:
+        """Keys of n replicas of L, with their own parameter & output paths ("parameter_L=8,seed=3.txt")."""
+        replicas = [Replica(L, first_seed + i, seed_key) for i in range(n)]
+        for replica in replicas:
+            if replica in self.paths_data.param_paths:
+                continue
+            param_path = self.get_parameter_path(L)
+            out_path   = self.get_output(L)
+            self.paths_data.set_param_path(replica, f"{param_path.stem},{seed_key}={replica.seed}{param_path.suffix}")
+            self.paths_data.set_out_path(replica, f"{out_path.stem},{seed_key}={replica.seed}{out_path.suffix}")
+        return replicas
+
+    def run_replicas(self, L, n: int, seed_key: str = "seed", first_seed: int = 0, max_workers: int|None = None, cores_per_job: int|None = None,
+                     env_var: dict|None = None, verbose_log = False, use_cache = True, delim: str = ':', rounding = 3) -> ReplicaStatistics:
+        """Runs n independent replicas of L (seed_key is written in each parameter file) through run_all,
+        and returns the mean, variance & standard error of the outputs."""
+        replicas = self.get_replicas(L, n, seed_key, first_seed)
+        self.write_parameter_files(delim, rounding, scale_variables=replicas)
+        self.run_all(max_workers, cores_per_job, env_var, verbose_log, use_cache, scale_variables=replicas)
+        return self.aggregate_replicas(L, n, seed_key, first_seed)
+
+    def aggregate_replicas(self, L, n: int, seed_key: str = "seed", first_seed: int = 0) -> ReplicaStatistics:
+        """Streams the available replica outputs of L one by one into a Welford accumulator."""
+        if self.out_type is None:
+            raise TypeError("aggregate_replicas() error: output_type not set!")
+        
+        accumulator = WelfordAccumulator()
+        missing     = []
+        for replica in self.get_replicas(L, n, seed_key, first_seed):
+            if not self.has_output(replica):
+                missing.append(replica)
+                continue
+            accumulator.add(self._load_output(replica, use_cache=False))
+        if len(missing) > 0:
+            self.events.warning("missing_replicas", f"* {len(missing)} replicas of {L} without output: {[str(replica) for replica in missing]}",
+                                scales=[str(replica) for replica in missing])
+        return accumulator.get_statistics()
+
+    def adaptive_sweep(self, axis: str, observable: str|Callable[[Any], float], budget: int, error: str|Callable[[Any], float]|None = None,
+                       batch: int = 4, min_step: float|None = None, loss: Callable[..., np.ndarray] = curvature_loss, max_workers: int|None = None,
+                       cores_per_job: int|None = None, env_var: dict|None = None, verbose_log = False, use_cache = True) -> AdaptiveSweep:
+        """Runs the coarse grid, then adds at most budget runs along axis where observable changes fastest (see AdaptiveSweep),
+        for ex adaptive_sweep("T", "susceptibility", budget=40). The curves are then given by sweep.get_curves()."""
+        sweep = AdaptiveSweep(self, axis, observable, error, loss, batch, min_step)
+        sweep.run(budget, max_workers, cores_per_job, env_var, verbose_log, use_cache)
+        return sweep
+
+    def get_store(self) -> ExperimentStore:
+        if self.store is None:
+            self.store = ExperimentStore(self.paths_data.target_dir.joinpath(STORE_FILE), events=self.events)
+        return self.store
+
+    def get_parameters_dict(self) -> dict[str, Any]:
+        return {"scale_variable_names": self.parameters.scale_variable_names, "scale_variables": list(map(repr, self.get_scale_variables())),
+                "static": self.parameters.static_params, "scaling": self.parameters.scaling_params,
+                "grid": None if self.parameters.scale_grid is None else self.parameters.scale_grid.axes}
+
+    def consolidate(self, scale_variables: list|None = None, remove_outputs = False, verbose = True) -> int:
+        """Appends the parsed outputs which are not stored yet (or changed since) to the single file "store.npz"
+        (see ExperimentStore), together with their parameter file and the parameters of the experiment.
+        With remove_outputs, the output files (and their result cache) are then deleted: results are read from the store.
+        Returns the number of outputs stored."""
+        if self.out_type is None:
+            raise TypeError("consolidate() error: output_type not set!")
+        store   = self.get_store()
+        to_save = []
+        for L in self._selected(scale_variables):
+            out_path = self.get_output(L)
+            if not out_path.exists() or store.is_current(out_path.name, self.out_type, out_path):
+                continue
+            param_path     = self.get_parameter_path(L)
+            parameter_text = param_path.read_text() if param_path.exists() else None
+            to_save.append((load_output(self.out_type, out_path), parameter_text))
+        
+        n_stored = store.put(to_save, self.get_parameters_dict() if scale_variables is None else None)
+        if remove_outputs:
+            for output, _ in to_save:
+                if output.file.name in store:
+                    self.result_cache.get_cache_path(output.file).unlink(missing_ok=True)
+                    output.file.unlink()
+        if verbose:
+            self.events.info("summary", f">> Stored {n_stored} outputs in \"{self.log_path(store.path)}\" ({len(store)} in total)", stored=n_stored, total=len(store))
+        return n_stored
+
+    def set_consolidate_runs(self, enabled = True, remove_outputs = False):
+        """Consolidates the successful runs of run_all/arun_all into the store while the sweep goes on, in batches of at least
+        CONSOLIDATE_BATCH runs (or a tenth of the store, as the store is copied on every write), and the rest at the end of the sweep."""
+        self.consolidate_runs    = enabled
+        self.remove_consolidated = remove_outputs
+        if enabled:
+            self.get_store()
+
+    def results_cache_stats(self) -> dict[str, int]:
+        return self.result_cache.stats()
+
+    def clear_results_cache(self):
+        self.result_cache.clear()
      
     @abstractmethod
-    def run(self, scale: int|float, env_var:dict|None = None, verbose_log = False) -> None:
+    def run(self, scale: int|float, env_var:dict|None = None, verbose_log = False) -> RunRecord|None:
         ...
 
+    @staticmethod
+    def _job_env(env_var: dict|None, cores_per_job: int|None) -> dict|None:
+        if cores_per_job is None:
+            return env_var
+        job_env = dict(os.environ if env_var is None else env_var)
+        for key in THREAD_ENV_VARS:
+            job_env[key] = str(cores_per_job)
+        return job_env
+
+    @staticmethod
+    def _max_workers(max_workers: int|None, cores_per_job: int|None) -> int:
+        if cores_per_job is not None and cores_per_job < 1:
+            raise ValueError("run_all() error: cores_per_job must be positive")
+        if max_workers is None:
+            return max(1, (os.cpu_count() or 1) // (cores_per_job or 1))
+        return max_workers
+
+    def _prepare_runs(self, verbose_log: bool, batch = False):
+        """Prepares the runner (for ex builds the executable). With batch, the runs skip that check until _finish_runs()."""
+        if self.runner is not None:
+            self.runner.prepare(self.paths_data.proj_dir, verbose_log)
+            self.runner.prepared = batch
+
+    def _finish_runs(self):
+        self.close_workers()
+        if self.runner is not None:
+            self.runner.prepared = False
+
+    def _start_time_budget(self, time_budget: float|None):
+        if self.runner is not None:
+            self.runner.set_time_budget(time_budget)
+
+    def _cache_key(self, L, env_var: dict|None) -> str|None:
+        parameters = self.render_parameters(L) if L in self.paths_data.param_paths else None
+        if parameters is not None:
+            return RunCache.make_key(parameters.encode(), self.runner, env_var)
+        param_path = self.paths_data.param_paths.get(L)
+        if param_path is None or not param_path.exists():
+            return None
+        content = param_path.read_bytes()
+        return RunCache.make_key(content + b"\0" + self._sidecar_digests(L, content.decode(errors="replace")), self.runner, env_var)
+
+    def _schedule(self, scale_variables: list, workers: int, env_var: dict|None, cores_per_job: int|None, use_cache: bool) -> Sweep:
+        """First step of every backend: the jobs to run, largest scale first, the others being up to date in the run cache.
+        The backend then executes the jobs and records them (see _store_run)."""
+        job_env                            = self._job_env(env_var, cores_per_job)
+        jobs: list                         = []
+        keys: dict                         = dict()
+        cached: dict[int|float, RunRecord] = dict()
+        for L in sorted(scale_variables, reverse=True):
+            keys[L] = self._cache_key(L, job_env) if use_cache else None
+            if keys[L] is not None and self.run_cache.is_valid(L, keys[L], self.has_output(L)):
+                cached[L] = RunRecord(L, 0, 0.0, cached=True)
+            else:
+                jobs.append(L)
+        return Sweep(scale_variables, job_env, workers, jobs, keys, cached)
+
+    def _store_run(self, result: RunRecord, key: str|None):
+        self.metrics.append(result)
+        if self.checkpoint_key is not None and result.is_success():
+            self.get_checkpoint_path(result.scale).unlink(missing_ok=True)
+        if self.consolidate_runs and result.is_success() and self.get_output(result.scale).exists():
+            with self.consolidate_lock:
+                self.to_consolidate.append(result.scale)
+            self._flush_consolidation(force=False)
+        if key is not None and result.is_success() and self.has_output(result.scale):
+            self.run_cache.store(result.scale, key)
+
+    def _store_collected(self, collected: dict[Any, tuple[RunRecord, str|None]]):
+        """Records the runs finished by a queue (job queue, Slurm) like the local ones, collected maps L to (record, cache key)."""
+        for record, key in collected.values():
+            self._store_run(record, key)
+        self._flush_consolidation()
+        self.run_cache.flush()
+
+    def _flush_consolidation(self, force = True):
+        with self.consolidate_lock:
+            if len(self.to_consolidate) == 0 or (not force and len(self.to_consolidate) < max(CONSOLIDATE_BATCH, len(self.get_store())//10)):
+                return
+            batch, self.to_consolidate = self.to_consolidate, []
+            try:
+                self.consolidate(batch, self.remove_consolidated, verbose=False)
+            except Exception as e:
+                self.events.error("consolidate_error", f"consolidate() error for {format_examples(batch)}: {e}, {e.args}", scales=batch)
+
+    def _job_started(self, L, progress: ProgressView|None) -> float:
+        if self.checkpoint_key is not None and self.get_checkpoint_path(L).exists():
+            self.events.debug("resume", f"-- {L}: resuming from checkpoint \"{self.get_checkpoint_path(L).name}\"", key=L)
+        if progress is not None:
+            progress.started(L)
+        return time.perf_counter()
+
+    def _job_finished(self, L, record: RunRecord|None, start: float, sweep: Sweep, progress: ProgressView|None) -> RunRecord:
+        """Records a local run (record is None if it raised), see _store_run."""
+        if record is None:
+            record = RunRecord(L, None, time.perf_counter() - start)
+        record.scale = L
+        self._store_run(record, sweep.keys[L])
+        if progress is not None:
+            progress.finished(record)
+        return record
+
+    def _run_job(self, L, sweep: Sweep, verbose_log: bool, progress: ProgressView|None = None) -> RunRecord:
+        start  = self._job_started(L, progress)
+        record = None
+        try:
+            record = self.run(L, sweep.job_env, verbose_log)
+        except Exception as e:
+            self.events.error("run_error", f"run_all() error for {L}: {e}, {e.args}", key=L)
+        return self._job_finished(L, record, start, sweep, progress)
+
+    def _log_result(self, result: RunRecord):
+        if not self.events.wants("debug"):
+            return
+        if result.cached:
+            self.events.debug("run_end", f"-- {result.scale}: up to date (cached)", **result.to_dict())
+        else:
+            cpu_time = result.cpu_time()
+            usage    = "" if cpu_time is None or result.max_rss is None else f" (cpu {cpu_time:.2f}s, max rss {result.max_rss/2**20:.1f} MiB)"
+            self.events.debug("run_end", f"-- {result.scale}: exit code {result.exit_code} in {result.wall_time:.2f}s{usage}", **result.to_dict())
+
+    def _log_results(self, results: dict[Any, RunRecord], elapsed: float):
+        """One line per run at debug level, then "* 9 800/10 000 succeeded, 12 failed, 188 cached in 2h13m" & the failed runs."""
+        for result in results.values():
+            self._log_result(result)
+        failed    = [result for result in results.values() if not result.cached and not result.is_success()]
+        n_cached  = sum(result.cached for result in results.values())
+        n_success = sum(result.is_success() and not result.cached for result in results.values())
+        self.events.info("summary", f"* {format_count(n_success)}/{format_count(len(results))} succeeded, {format_count(len(failed))} failed, "
+                                    f"{format_count(n_cached)} cached in {format_duration(elapsed)}",
+                         succeeded=n_success, failed=len(failed), cached=n_cached, total=len(results), elapsed=elapsed)
+        if len(failed) > 0:
+            self.events.warning("failed", f"* failed: {format_examples([f'{result.scale} (exit code {result.exit_code})' for result in failed], 5)}",
+                                scales=[result.scale for result in failed])
+
+    def _make_progress(self, jobs: list, max_workers: int) -> ProgressView|None:
+        if self.progress_interval is None or len(jobs) == 0:
+            return None
+        try:
+            model = self.fit_runtime_scaling()
+        except ValueError as _:
+            model = None
+        return ProgressView(self.events, jobs, max_workers, model, live=self.output_mode != "stdout")
+
+    def _start_local_sweep(self, scale_variables: list|None, max_workers: int|None, cores_per_job: int|None, env_var: dict|None, verbose_log: bool,
+                           use_cache: bool, time_budget: float|None) -> tuple[Sweep, ProgressView|None]:
+        """Prepares the runner for the batch & schedules the jobs of run_all / arun_all, which then execute them in parallel."""
+        scale_variables = self._selected(scale_variables)
+        max_workers     = self._max_workers(max_workers, cores_per_job)
+        self._prepare_runs(verbose_log, batch=True)
+        self._start_time_budget(time_budget)
+        sweep = self._schedule(scale_variables, max_workers, env_var, cores_per_job, use_cache)
+        self.events.info("run_start", f">> Running {format_count(len(sweep.jobs))} jobs on {max_workers} workers ({format_count(len(sweep.cached))} cached):",
+                         jobs=len(sweep.jobs), workers=max_workers, cached=len(sweep.cached))
+        return sweep, self._make_progress(sweep.jobs, max_workers)
+
+    def _close_local_sweep(self, progress: ProgressView|None):
+        if progress is not None:
+            progress.close()
+        self._finish_runs()
+        self._flush_consolidation()
+        self.run_cache.flush()
+
+    def _sweep_results(self, sweep: Sweep, finished: dict[Any, RunRecord]) -> dict[int|float, RunRecord]:
+        results = sweep.results(finished)
+        self._log_results(results, sweep.elapsed())
+        if self.checkpoint_key is not None:
+            self.checkpoint_status(sweep.scale_variables, verbose=False)
+        return results
+
+    def _sync_progress(self, progress: ProgressView|None, states: JobStates, workers: int) -> ProgressView|None:
+        """Progress of a queue (job queue, Slurm) from the states of its jobs, created at the first poll."""
+        if progress is None:
+            progress = self._make_progress(states.scale_variables(), workers)
+            if progress is None:
+                return None
+            progress.live = True
+        progress.sync(states.pending, states.running, states.finished)
+        progress.update(self.progress_interval)
+        return progress
+
+    def _wait_for_queue(self, poll: Callable[[], JobStates], collect: Callable[[], Any], workers: Callable[[JobStates], int], timeout: float|None,
+                        poll_interval: float, stalled: Callable[[], None]|None = None) -> bool:
+        """Polls the states of a queue (job queue, Slurm) until no job is pending or running, then collects the finished ones.
+        stalled is called at every poll while jobs are left (for ex to restart workers). Returns False on timeout."""
+        start    = time.perf_counter()
+        progress = None
+        while True:
+            states = poll()
+            if self.progress_interval is not None:
+                progress = self._sync_progress(progress, states, workers(states))
+            if states.active == 0:
+                if progress is not None:
+                    progress.close()
+                collect()
+                return True
+            if stalled is not None:
+                stalled()
+            if timeout is not None and time.perf_counter() - start > timeout:
+                if progress is not None:
+                    progress.events.end_live()
+                return False
+            time.sleep(poll_interval)
+
+    def get_run_records(self) -> list[RunRecord]:
+        """Every run recorded in "metrics.jsonl", the scale variables are restored when known."""
+        return self.metrics.load({scale_key(L): L for L in self.paths_data.param_paths})
+
+    def fit_runtime_scaling(self) -> PowerLaw:
+        """Power law wall_time = a * L**b fitted on the recorded runs (for a grid, L is the product of the components)."""
+        return fit_power_law(self.get_run_records())
+
+    def estimate_runtime(self, L) -> float:
+        return self.fit_runtime_scaling()(L)
+
+    def invalidate_cache(self, L = None):
+        """Forgets the cached run of L, or of every scale variable if L is None."""
+        self.run_cache.invalidate(L)
+
+    def cache_stats(self) -> dict[str, int]:
+        return self.run_cache.stats()
+
+    def run_all(self, max_workers: int|None = None, cores_per_job: int|None = None, env_var: dict|None = None, verbose_log = False, use_cache = True, scale_variables: list|None = None,
+                time_budget: float|None = None) -> dict[int|float, RunRecord]:
+        """Runs every scale variable concurrently, largest scale first.
+        
+        At most max_workers simulations run at the same time (default: cpu_count // cores_per_job).
+        If cores_per_job is set, OMP_NUM_THREADS and RAYON_NUM_THREADS are set accordingly for each job.
+        With use_cache, scale variables whose parameter file, executable and environment did not change
+        since their last successful run are skipped.
+        After time_budget seconds (or on KeyboardInterrupt), the running simulations get SIGTERM and the others are not started (see set_checkpointing).
+        """
+        sweep, progress = self._start_local_sweep(scale_variables, max_workers, cores_per_job, env_var, verbose_log, use_cache, time_budget)
+        try:
+            with ThreadPoolExecutor(max_workers=sweep.workers) as pool:
+                futures = {L: pool.submit(self._run_job, L, sweep, verbose_log, progress) for L in sweep.jobs}
+                try:
+                    while len(wait(list(futures.values()), timeout=self.progress_interval).not_done) > 0:
+                        if progress is not None:
+                            progress.update()
+                except KeyboardInterrupt:
+                    self.events.warning("interrupted", ">> Interrupted: terminating the running jobs")
+                    self.interrupt()
+                    raise
+        finally:
+            self._close_local_sweep(progress)
+        return self._sweep_results(sweep, {L: future.result() for L, future in futures.items()})
+
+    def set_checkpointing(self, enabled = True, key: str = "checkpoint", grace_period: float = 30.0):
+        """Adds "<key>: <checkpoint path>" (see get_checkpoint_path) to the parameters, before the output file.
+        
+        The simulation is expected to resume from the checkpoint when it exists, to write it on SIGTERM within grace_period seconds
+        (then it gets SIGKILL) and exit with a non-zero code. The checkpoint is removed after a successful run.
+        SIGTERM is sent on interrupt(), KeyboardInterrupt or expiry of the time_budget of run_all / arun_all.
+        The parameter files must be written again after a change."""
+        if self.runner is None:
+            raise TypeError("set_checkpointing() error: Runner not set")
+        self.checkpoint_key = key if enabled else None
+        self.runner.set_grace_period(grace_period)
+        self.events.info("settings", f">> Checkpointing: {f'{key} (grace period {grace_period}s)' if enabled else 'off'}", checkpoint_key=self.checkpoint_key, grace_period=grace_period)
+
+    def get_checkpoint_path(self, L) -> Path:
+        return self.paths_data.out_paths[L].with_suffix(".ckpt")
+
+    def checkpoint_status(self, scale_variables: list|None = None, verbose = True) -> dict[Any, str]:
+        """"partial" (a checkpoint was left by an interrupted run), "complete" (output without checkpoint) or "fresh" for every scale variable."""
+        status: dict[Any, str] = dict()
+        for L in self._selected(scale_variables):
+            if self.get_checkpoint_path(L).exists():
+                status[L] = "partial"
+            elif self.has_output(L):
+                status[L] = "complete"
+            else:
+                status[L] = "fresh"
+        states = list(status.values())
+        self.events.info("summary", f"* {format_count(states.count('complete'))} complete, {format_count(states.count('partial'))} partial, "
+                                    f"{format_count(states.count('fresh'))} fresh", **{state: states.count(state) for state in ["complete", "partial", "fresh"]})
+        for L, state in status.items():
+            if state == "partial":
+                self.events.emit("info" if verbose else "debug", "partial", f"-- {L}: partial (\"{self.get_checkpoint_path(L).name}\")", key=L)
+        return status
+
+    def interrupt(self) -> int:
+        """Sends SIGTERM to the running simulations (SIGKILL after the grace period) and stops starting new ones until the next run_all,
+        for ex from another thread or a signal handler. Returns the number of terminated simulations."""
+        if self.runner is None:
+            return 0
+        n = self.runner.interrupt()
+        self.events.warning("interrupted", f">> Interrupted {n} runs", n_runs=n)
+        return n
+
+    def get_log_path(self, L) -> Path:
+        return self.paths_data.out_paths[L].with_suffix(".log")
+
+    def set_output_sink(self, mode: str|Callable[[Any, str], None] = "stdout", ring_size: int = 100):
+        """Where the output of the runs goes:
+        "stdout": printed with the language prefix (default), "discard": the null device,
+        "file": the log file of the scale variable (see get_log_path), "ring": the last ring_size lines kept in run_logs[L],
+        a function: called as callback(L, line) for every line.
+        "discard" & "file" give the file descriptor to the executable, the output never goes through Python."""
+        if not callable(mode) and mode not in OUTPUT_MODES:
+            raise ValueError(f"set_output_sink() error: unknown mode \"{mode}\", use one of {OUTPUT_MODES} or a function (L, line)")
+        if ring_size < 1:
+            raise ValueError("set_output_sink() error: ring_size must be positive")
+        self.output_mode = mode
+        self.ring_size   = ring_size
+        self.run_logs    = dict()
+
+    def make_sink(self, L) -> OutputSink:
+        mode   = self.output_mode
+        prefix = self.runner.output_prefix if self.runner is not None else ""
+        if callable(mode):
+            return CallbackSink(partial(mode, L))
+        if mode == "discard":
+            return DiscardSink()
+        if mode == "file":
+            return FileSink(self.get_log_path(L))
+        if mode == "ring":
+            sink = RingBufferSink(self.ring_size)
+            self.run_logs[L] = sink
+            return sink
+        return StdoutSink(prefix)
+
+    async def arun(self, scale: int|float, env_var: dict|None = None, verbose_log = False, log_file: Path|None = None) -> RunRecord|None:
+        if self.runner is None:
+            raise TypeError("arun() error: Runner not set")
+        try:
+            param_path = self.get_parameter_path(scale)
+        except KeyError as _:
+            self.events.error("run_error", f">> arun: cannot find parameter of {scale}", key=scale)
+            return None
+        
+        await asyncio.to_thread(self._prepare_runs, verbose_log)
+        cwd  = self.paths_data.proj_dir
+        args = param_path
+        sink = FileSink(log_file) if log_file is not None else self.make_sink(scale)
+        return await self.runner.arun(cwd, args, verbose_log, env_var, parameters=self.render_parameters(scale), sink=sink)
+
+    async def _arun_job(self, L, semaphore: asyncio.Semaphore, sweep: Sweep, verbose_log: bool, log_to_file: bool, progress: ProgressView|None = None) -> RunRecord:
+        async with semaphore:
+            log_file = self.get_log_path(L) if log_to_file else None
+            start    = self._job_started(L, progress)
+            record   = None
+            try:
+                record = await self.arun(L, sweep.job_env, verbose_log, log_file)
+            except Exception as e:
+                self.events.error("run_error", f"arun_all() error for {L}: {e}, {e.args}", key=L)
+            return self._job_finished(L, record, start, sweep, progress)
+
+    async def arun_all(self, max_workers: int|None = None, cores_per_job: int|None = None, env_var: dict|None = None, verbose_log = False, log_to_file = False, use_cache = True, scale_variables: list|None = None,
+                       time_budget: float|None = None) -> dict[int|float, RunRecord]:
+        """Async counterpart of run_all(). With log_to_file, the output of each job goes to "out_<suffix>.log" instead of stdout.
+        Cancelling the task terminates the running simulations like interrupt()."""
+        sweep, progress = await asyncio.to_thread(self._start_local_sweep, scale_variables, max_workers, cores_per_job, env_var, verbose_log, use_cache, time_budget)
+        semaphore = asyncio.Semaphore(sweep.workers)
+        if progress is not None and log_to_file:
+            progress.live = True
+        ticker = asyncio.create_task(self._tick_progress(progress)) if progress is not None else None
+        try:
+            finished = await asyncio.gather(*[self._arun_job(L, semaphore, sweep, verbose_log, log_to_file, progress) for L in sweep.jobs])
+        finally:
+            if ticker is not None:
+                ticker.cancel()
+            await asyncio.to_thread(self._close_local_sweep, progress)
+        return self._sweep_results(sweep, {record.scale: record for record in finished})
+
+    async def _tick_progress(self, progress: ProgressView):
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            progress.update()
+
+    def get_job_queue(self) -> JobQueue:
+        if self.job_queue is None:
+            self.job_queue = JobQueue(self.paths_data.target_dir.joinpath(JOB_QUEUE_FILE))
+        return self.job_queue
+
+    def _job_keys(self) -> dict[str, Any]:
+        return {scale_key(L): L for L in self.paths_data.param_paths}
+
+    def submit_all(self, max_workers: int|None = None, cores_per_job: int|None = None, env_var: dict|None = None, use_cache = True, scale_variables: list|None = None) -> int:
+        """Enqueues the runs in the persistent job queue ("jobs.sqlite") and starts detached workers,
+        which keep running if the notebook kernel dies. Finished jobs are recorded in the run cache, so that only
+        running or up-to-date points are skipped when submitting again: pending/failed/cancelled points and the jobs
+        of dead workers are resubmitted. Returns the number of jobs enqueued."""
+        if self.runner is None:
+            raise TypeError("submit_all() error: Runner not set")
+        scale_variables = self._selected(scale_variables)
+        max_workers     = self._max_workers(max_workers, cores_per_job)
+        queue           = self.get_job_queue()
+        self._prepare_runs(False)
+        
+        recovered = queue.recover()
+        self._sync_job_cache()
+        sweep     = self._schedule(scale_variables, max_workers, env_var, cores_per_job, use_cache)
+        running   = queue_states(queue.get_jobs(), self._job_keys()).running
+        
+        missing = [L for L in sweep.jobs if L not in running and not self.get_parameter_path(L).exists()]
+        if len(missing) > 0:
+            raise ValueError(f"submit_all() error: no parameter file for {format_examples(missing)}, call write_parameter_files() first")
+
+        to_submit = [{"key": scale_key(L), "command": self.runner.command_args(self.get_parameter_path(L)), "cwd": self.paths_data.proj_dir,
+                      "env": sweep.job_env, "log_path": self.get_log_path(L), "cache_key": sweep.keys[L]} for L in sweep.jobs if L not in running]
+        queue.submit(to_submit)
+        n_workers = queue.start_workers(sweep.workers)
+        self.events.info("submit", f">> Submitted {len(to_submit)} jobs ({len(sweep.cached)} cached, {recovered} recovered), started {n_workers} workers",
+                         jobs=len(to_submit), cached=len(sweep.cached), recovered=recovered, workers=n_workers)
+        return len(to_submit)
+
+    def resume(self, max_workers: int|None = None, retry_failed = True) -> int:
+        """Recovers the jobs of dead workers (and failed jobs) and restarts workers for the pending ones."""
+        queue = self.get_job_queue()
+        queue.recover()
+        if retry_failed:
+            queue.requeue([FAILED])
+        return queue.start_workers(self._max_workers(max_workers, None))
+
+    def _sync_job_cache(self):
+        """Records the jobs finished by the workers since the last call, see _store_collected."""
+        queue    = self.get_job_queue()
+        job_keys = self._job_keys()
+        rows     = queue.get_unsynced()
+        keys     = {job_keys[row["key"]]: row["cache_key"] for row in rows if row["key"] in job_keys}
+        self._store_collected({record.scale: (record, keys[record.scale]) for record in queue_states(rows, job_keys).finished})
+        queue.mark_synced([row["key"] for row in rows])
+
+    def status(self, verbose = False) -> dict[str, int]:
+        """Number of jobs per state (pending, running, done, failed, cancelled)."""
+        queue  = self.get_job_queue()
+        counts = queue.count()
+        self._sync_job_cache()
+        n_alive = queue.alive_workers()
+        self.events.info("status", ">> Jobs: " + ", ".join([f"{n} {state}" for state, n in counts.items()]) + f" [{n_alive} workers alive]", **counts, workers=n_alive)
+        if verbose:
+            for row in queue.get_jobs():
+                self.events.info("job_status", f"-- {row['key']}: {row['status']} (exit code {row['exit_code']}, attempts {row['attempts']})",
+                                 key=row["key"], status=row["status"], exit_code=row["exit_code"], attempts=row["attempts"])
+        return counts
+
+    def wait(self, timeout: float|None = None, poll_interval: float = 1.0) -> bool:
+        """Blocks until no job is pending or running, returns False on timeout.
+        When no worker is alive, the jobs of dead workers are put back into the queue and a worker is started.""" 
+        queue = self.get_job_queue()
+        def stalled():
+            if queue.alive_workers() == 0:
+                queue.recover()
+                queue.start_workers(1)
+        return self._wait_for_queue(lambda: queue_states(queue.get_jobs(), self._job_keys()), self._sync_job_cache,
+                                    lambda states: self._max_workers(None, None), timeout, poll_interval, stalled)
+    
+    def cancel(self, scale_variables: list|None = None) -> int:
+        """Cancels the pending jobs and terminates the running ones (of scale_variables, or all)."""
+        keys = None if scale_variables is None else [scale_key(L) for L in scale_variables]
+        n    = self.get_job_queue().cancel(keys)
+        self.events.info("cancel", f">> Cancelled {n} jobs", cancelled=n)
+        return n
+
+    def set_slurm(self, options: dict[str, Any]|None = None, commands: SlurmCommands|None = None):
+        """Slurm job array backend: options are written as "#SBATCH --<key>=<value>" in every script (for ex {"partition": "cpu", "time": "24:00:00"}),
+        commands replaces sbatch / squeue / sacct / scancel (for ex by a local stand-in)."""
+        self.slurm = SlurmBackend(self.paths_data.target_dir, commands, options, self.events)
+        self.events.info("settings", f">> Slurm backend set ({len(self.slurm.arrays)} arrays submitted before)", arrays=len(self.slurm.arrays))
+
+    def get_slurm(self) -> SlurmBackend:
+        if self.slurm is None:
+            self.slurm = SlurmBackend(self.paths_data.target_dir, events=self.events)
+        return self.slurm
+
+    def submit_slurm(self, max_parallel: int|None = None, cores_per_job: int|None = None, env_var: dict|None = None, use_cache = True,
+                     scale_variables: list|None = None, options: dict[str, Any]|None = None) -> str|None:
+        """Submits the runs as one Slurm job array (task i runs one scale variable, largest scale first), instead of running them locally.
+        
+        Scale variables up to date in the run cache, pending or running are skipped, so that submitting again only resubmits
+        the failed, cancelled & new points. At most max_parallel tasks run at the same time. The output of task i goes to the log file
+        of its scale variable (see get_log_path). Needs the parameter files. Returns the job id, None if there is nothing to submit."""
+        if self.runner is None:
+            raise TypeError("submit_slurm() error: Runner not set")
+        if self.runner.param_mode != "file":
+            raise ValueError("submit_slurm() error: the jobs read parameter files [use: set_parameter_passing(\"file\")]")
+        scale_variables = self._selected(scale_variables)
+        missing         = [L for L in scale_variables if not self.get_parameter_path(L).exists()]
+        if len(missing) > 0:
+            raise ValueError(f"submit_slurm() error: {len(missing)} parameter files missing [use: write_parameter_files]")
+        slurm = self.get_slurm()
+        self._prepare_runs(False)
+        
+        tasks_states = slurm.states() if len(slurm.arrays) > 0 else dict()
+        self._collect_slurm(tasks_states)
+        sweep  = self._schedule(scale_variables, max_parallel or len(scale_variables), env_var, cores_per_job, use_cache)
+        states = slurm_states(tasks_states, self._job_keys())
+        active = [L for L in sweep.jobs if L in states.pending or L in states.running]
+        tasks  = [{"key": scale_key(L), "command": self.runner.command_args(self.get_parameter_path(L)), "log_path": self.get_log_path(L), "cache_key": sweep.keys[L]}
+                  for L in sweep.jobs if L not in active]
+        if len(tasks) == 0:
+            self.events.info("submit", f">> Nothing to submit ({len(sweep.cached)} cached, {len(active)} pending or running)", tasks=0, cached=len(sweep.cached), active=len(active))
+            return None
+        
+        signal_grace = self.runner.grace_period if self.checkpoint_key is not None else None
+        job_id = slurm.submit(self.paths_data.target_dir.name, tasks, self.paths_data.proj_dir, sweep.job_env, max_parallel, cores_per_job, signal_grace, options)
+        self.events.info("submit", f">> Submitted job array {job_id} with {len(tasks)} tasks ({len(sweep.cached)} cached, {len(active)} pending or running)",
+                         job_id=job_id, tasks=len(tasks), cached=len(sweep.cached), active=len(active))
+        return job_id
+
+    def _collect_slurm(self, states: dict[str, dict[str, Any]]) -> dict[Any, RunRecord]:
+        uncollected = {key: info for key, info in states.items() if not info["collected"] and info["state"] in [DONE, FAILED, CANCELLED]}
+        collected   = {record.scale: record for record in slurm_states(uncollected, self._job_keys()).finished}
+        self._store_collected({L: (record, uncollected[scale_key(L)]["cache_key"]) for L, record in collected.items()})
+        if len(collected) > 0:
+            self.get_slurm().mark_collected([scale_key(L) for L in collected])
+        return collected
+
+    def collect_slurm(self) -> dict[Any, RunRecord]:
+        """Records the Slurm tasks finished since the last call (run cache, "metrics.jsonl", consolidation), returns their run records.
+        Their outputs are then available through get_results()."""
+        collected = self._collect_slurm(self.get_slurm().states())
+        for L in sorted(collected, key=repr):
+            self._log_result(collected[L])
+        failed = [L for L, record in collected.items() if not record.is_success()]
+        self.events.info("summary", f"* collected {format_count(len(collected))} Slurm tasks, {format_count(len(failed))} failed", collected=len(collected), failed=len(failed))
+        if len(failed) > 0:
+            self.events.warning("failed", f"* failed: {format_examples(failed, 5)}", scales=failed)
+        return collected
+
+    def slurm_status(self, verbose = False) -> dict[str, int]:
+        """Number of Slurm tasks per state (pending, running, done, failed, cancelled, unknown), from squeue & sacct."""
+        slurm  = self.get_slurm()
+        states = slurm.states()
+        counts = slurm.count(states)
+        self._collect_slurm(states)
+        self.events.info("status", ">> Slurm: " + ", ".join([f"{n} {state}" for state, n in counts.items()]), **counts)
+        if verbose:
+            for key, info in states.items():
+                self.events.info("job_status", f"-- {key}: {info['state']} (job {info['job_id']}, exit code {info['exit_code']})",
+                                 key=key, status=info["state"], job_id=info["job_id"], exit_code=info["exit_code"])
+        return counts
+
+    def slurm_wait(self, timeout: float|None = None, poll_interval: float = 30.0) -> bool:
+        """Blocks until no Slurm task is pending or running, then collects the finished ones. Returns False on timeout."""
+        slurm = self.get_slurm()
+        return self._wait_for_queue(lambda: slurm_states(slurm.states(), self._job_keys()), self.collect_slurm,
+                                    lambda states: states.active, timeout, poll_interval)
+
+    def slurm_cancel(self, scale_variables: list|None = None) -> int:
+        """scancel the pending & running Slurm tasks (of scale_variables, or all)."""
+        keys = None if scale_variables is None else [scale_key(L) for L in scale_variables]
+        n    = self.get_slurm().cancel(keys)
+        self.events.info("cancel", f">> Cancelled {n} Slurm tasks", cancelled=n)
+        return n
+
 if __name__ == "__main__":
     pass
- 
\ No newline at end of file
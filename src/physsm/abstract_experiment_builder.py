@@ -1,10 +1,11 @@
 from __future__ import annotations
 import numpy as np
-from typing import Any, Generic, TypeVar,Type
+from typing import Any, Callable, Generic, TypeVar,Type
 from abc import abstractmethod
 from .experiment_output import ExperimentOutput
 from .runnner import*
 from .experiment_data import BaseExperimentData, PathData, Parameters
+from .scale_grid import ScaleGrid
 from .path_logger import IPathLogger, PathLogger
 from pathlib import Path
 
@@ -33,10 +34,10 @@ class OutputClassData(FileData, Generic[OutType]):
         
 class AbstractExperimentBuilder(Generic[OutType]):
     def __init__(self, proj_dir: Path, results_dir: str, exp_name: str, logger: IPathLogger):
-        self.parameters                      = Parameters()
+        self.paths_data                      = PathData(logger)
+        self.parameters                      = Parameters(self.paths_data.events)
         self.param_file_data                 = FileData(file_name="parameter", extension="txt")
         self.out_data                        = OutputClassData(file_name="out",extension="txt",out_key="outputfile",out_type=ExperimentOutput)
-        self.paths_data                      = PathData(logger)
         self.paths_data.set_proj_dir(proj_dir)
         self.paths_data.set_target_dir(results_dir, exp_name)
         
@@ -44,26 +45,16 @@ class AbstractExperimentBuilder(Generic[OutType]):
         return self.paths_data.log_path(path)
     
     def __set_paths(self):
-        print(">> Setting file paths:")
         if self.parameters.scale_variables is None:
             raise ValueError("set_files() Error: No scale variables")
-        suffix = dict()
-
         out_name   = self.out_data.file_name
         out_ext    = self.out_data.extension 
         param_name = self.param_file_data.file_name
         param_ext  = self.param_file_data.extension
 
-        for L in self.parameters.scale_variables:
-            suffix[L] = ",".join([f"{scale_name}={L}" for scale_name in self.parameters.scale_variable_names])
-
-        for L in self.parameters.scale_variables:
-            param_path_name = f"{param_name}_{suffix[L]}.{param_ext}"
-            self.paths_data.set_param_path(L, param_path_name)
-            
-        for L in self.parameters.scale_variables:          
-            out_path_name = f"{out_name}_{suffix[L]}.{out_ext}"
-            self.paths_data.set_out_path(L, out_path_name)
+        self.paths_data.set_path_templates(param_name, param_ext, out_name, out_ext, self.parameters.get_scale_suffix, self.parameters.scale_variables)
+        self.paths_data.events.info("paths", f">> Setting file paths: \"{param_name}_<scale>.{param_ext}\" & \"{out_name}_<scale>.{out_ext}\" for {len(self.paths_data.param_paths)} scale variables",
+                                    n_paths=len(self.paths_data.param_paths))
 
     def _make_base_experiment(self) -> BaseExperimentData:
         self.__set_paths()
@@ -74,6 +65,10 @@ class AbstractExperimentBuilder(Generic[OutType]):
         base_exp.paths_data = self.paths_data 
         return base_exp
 
+    def set_log_level(self, level: str = "info"):
+        """"debug" prints one line per file & run, "info" (default) the summaries, "warning" / "error" only the problems (see EventLog)."""
+        self.paths_data.events.set_level(level)
+
     def set_parameter_file_data(self, filename: str="parameter", extension = "txt"):
         self.param_file_data.set_extension(extension)
         self.param_file_data.set_output_name(filename)
@@ -89,6 +84,16 @@ class AbstractExperimentBuilder(Generic[OutType]):
     def set_scale_variable_names(self, names: list[str]):
         self.parameters.scale_variable_names = names
 
+    def set_scale_grid(self, axes: dict[str, Any]):
+        """Sweeps over the cartesian product of the axes, for ex {"Lx": [4, 8], "Ly": [4, 8], "seed": range(4)}:
+        the scale variables are then tuples (Lx, Ly, seed) and the names are taken from the axes."""
+        self.parameters.set_scale_grid(ScaleGrid(axes))
+
+    def add_grid_parameter(self, name: str, values: dict|Callable[..., Any], axes: list[str]):
+        """Parameter depending on some grid axes, for ex add_grid_parameter("steps", {4: 1000, 8: 4000}, axes=["Lx"])
+        or add_grid_parameter("steps", lambda Lx, Ly: 100*Lx*Ly, axes=["Lx", "Ly"])."""
+        self.parameters.add_grid_parameter(name, values, axes)
+
     def set_output_type(self, out_type: Type[OutType]):
         self.out_data.set_out_type(out_type)
 
@@ -0,0 +1,146 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Any, Callable
+import numpy as np
+
+from .experiment_output import ExperimentOutput
+
+if TYPE_CHECKING:
+    from .abstract_experiment import AbstractExperiment
+
+Curve = tuple[list, np.ndarray, np.ndarray|None]
+
+def _rescale(values: np.ndarray, span: float) -> np.ndarray:
+    return values/span if span > 0 else np.zeros_like(values)
+
+def curvature_loss(x: np.ndarray, y: np.ndarray, err: np.ndarray|None = None) -> np.ndarray:
+    """Loss of every interval [x_i, x_i+1] of a curve, in coordinates rescaled to [0, 1]: the length of the segment,
+    plus the linear interpolation error dx^2 |y''| / 8 (with y'' estimated at both ends), plus the mean standard error at both ends."""
+    x_n  = _rescale(x - x[0], x[-1] - x[0])
+    y_n  = _rescale(y, float(np.ptp(y)))
+    dx   = np.diff(x_n)
+    dy   = np.diff(y_n)
+    loss = np.hypot(dx, dy)
+    if len(x) > 2:
+        slopes          = dy/dx
+        second          = np.zeros(len(x))
+        second[1:-1]    = np.abs(np.diff(slopes))/((dx[:-1] + dx[1:])/2)
+        loss           += dx**2*np.maximum(second[:-1], second[1:])/8
+    if err is not None:
+        err_n = _rescale(np.abs(err), float(np.ptp(y)))
+        loss += (err_n[:-1] + err_n[1:])/2
+    return loss
+
+class AdaptiveSweep:
+    """Refines one axis of the scale grid (for ex the temperature) where an observable changes fastest.
+
+    observable (and error) are the name of a scalar attribute of the output, or a function output -> float.
+    For a grid with other axes (for ex Lx), every combination of them gives one curve along the axis, the loss of
+    an interval being the largest over the curves: new axis values are thus run for every combination.
+    """
+    def __init__(self, experiment: AbstractExperiment, axis: str, observable: str|Callable[[Any], float], error: str|Callable[[Any], float]|None = None,
+                 loss: Callable[..., np.ndarray] = curvature_loss, batch: int = 4, min_step: float|None = None, digits: int = 6):
+        grid = experiment.get_scale_grid()
+        if axis not in grid.index:
+            raise KeyError(f"AdaptiveSweep error: no axis \"{axis}\"")
+        if batch < 1:
+            raise ValueError("AdaptiveSweep error: batch must be positive")
+        self.experiment = experiment
+        self.axis       = axis
+        self.observable = observable
+        self.error      = error
+        self.loss       = loss
+        self.batch      = batch
+        self.min_step   = min_step
+        self.digits     = digits
+        self.history: list[list] = []
+
+    @staticmethod
+    def _evaluate(output: ExperimentOutput, observable: str|Callable[[Any], float]) -> float:
+        if callable(observable):
+            return float(observable(output))
+        value = np.asarray(getattr(output, observable), dtype=np.float64)
+        if value.size != 1:
+            raise ValueError(f"AdaptiveSweep error: \"{observable}\" has {value.size} values, use a function output -> float")
+        return float(value.ravel()[0])
+
+    def get_curves(self, use_cache = True) -> dict[Any, Curve]:
+        """(axis values, observable, error) along the axis for every combination of the other axes (None for a single axis).
+        Points without output are left out."""
+        grid    = self.experiment.get_scale_grid()
+        others  = [name for name in grid.get_names() if name != self.axis]
+        results = self.experiment.get_results(use_cache=use_cache)
+
+        by_curve: dict[Any, list[tuple]] = dict()
+        for point in results:
+            key = grid.project(point, others) if len(others) > 0 else None
+            by_curve.setdefault(key, []).append(point)
+
+        curves: dict[Any, Curve] = dict()
+        for key, points in by_curve.items():
+            points.sort(key=lambda point: grid.project(point, [self.axis]))
+            x   = [grid.project(point, [self.axis]) for point in points]
+            y   = np.array([self._evaluate(results[point], self.observable) for point in points])
+            err = None if self.error is None else np.array([self._evaluate(results[point], self.error) for point in points])
+            curves[key] = (x, y, err)
+        return curves
+
+    def _midpoint(self, a, b) -> Any:
+        if self.min_step is not None and b - a < 2*self.min_step:
+            return None
+        if isinstance(a, (int, np.integer)) and isinstance(b, (int, np.integer)):
+            mid = (a + b)//2
+        else:
+            mid = round((a + b)/2, self.digits)
+        return mid if a < mid < b else None
+
+    def propose(self, n: int, use_cache = True) -> list:
+        """At most n new axis values, in the middle of the intervals with the largest loss."""
+        losses: dict[tuple, float] = dict()
+        for x, y, err in self.get_curves(use_cache).values():
+            if len(x) < 2:
+                continue
+            for a, b, loss in zip(x[:-1], x[1:], self.loss(np.asarray(x, dtype=np.float64), y, err)):
+                losses[(a, b)] = max(losses.get((a, b), 0.0), float(loss))
+
+        axis_values = set(self.experiment.get_scale_grid().axes[self.axis])
+        values      = []
+        for (a, b), _ in sorted(losses.items(), key=lambda item: item[1], reverse=True):
+            mid = self._midpoint(a, b)
+            if mid is None or mid in axis_values or mid in values:
+                continue
+            values.append(mid)
+            if len(values) == n:
+                break
+        return sorted(values)
+
+    def run(self, budget: int, max_workers: int|None = None, cores_per_job: int|None = None, env_var: dict|None = None,
+            verbose_log = False, use_cache = True, delim: str = ':', rounding = 3) -> dict[Any, Curve]:
+        """Runs the current grid (points up to date are skipped by the run cache), then adds new axis values batch by batch,
+        writing & running only the new points, until budget new runs were made or no interval can be split anymore.
+        Returns the final curves."""
+        experiment = self.experiment
+        experiment.write_parameter_files(delim, rounding)
+        experiment.run_all(max_workers, cores_per_job, env_var, verbose_log, use_cache)
+
+        spent = 0
+        while True:
+            grid     = experiment.get_scale_grid()
+            n_curves = len(grid)//len(grid.axes[self.axis])
+            n_values = min(self.batch, (budget - spent)//n_curves)
+            if n_values <= 0:
+                break
+            values = self.propose(n_values, use_cache)
+            if len(values) == 0:
+                experiment.events.info("summary", f"* No interval of \"{self.axis}\" left to refine", axis=self.axis)
+                break
+            new_points = experiment.extend_scale_axis(self.axis, values)
+            experiment.events.info("refine", f">> Refining \"{self.axis}\" with {values} ({len(new_points)} runs, {spent + len(new_points)}/{budget}):",
+                                   axis=self.axis, values=values, runs=len(new_points), spent=spent + len(new_points), budget=budget)
+            experiment.write_parameter_files(delim, rounding, scale_variables=new_points)
+            experiment.run_all(max_workers, cores_per_job, env_var, verbose_log, use_cache, scale_variables=new_points)
+            spent += len(new_points)
+            self.history.append(values)
+        return self.get_curves(use_cache)
+
+if __name__ == "__main__":
+    pass
@@ -1,37 +1,311 @@
 from .experiment_data import BaseExperimentData
 from .abstract_experiment import AbstractExperiment
 from .abstract_experiment_builder import AbstractExperimentBuilder
-from .runnner import IRunner
+from .output_sink import OutputSink
+from .runnner import IRunner, RunRecord, file_fingerprint
+from .metrics import scale_size
 from .path_logger import PathLogger
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import override
+from typing import Any, Callable, override
+import hashlib
+import json
+import os
+import shutil
 import subprocess
+import threading
+import time
+
+BUILD_PROFILES = {
+    "debug":    ["-O0", "-g"],
+    "release":  ["-O3", "-march=native", "-flto"],
+    "portable": ["-O3", "-flto"],
+}
+CXX_SUFFIXES   = [".cpp", ".cc", ".cxx", ".c++"]
+BUILD_MANIFEST = "build.json"
+PGO_DIR        = "pgo"
 
 class BinaryRunner(IRunner):
+    output_prefix = "C/C++: "
+
     def __init__(self, binary_path: Path):
+        super().__init__()
         self.binary = binary_path
 
     @override
-    def run(self, cwd: Path, args: Path, verbose_log: bool = False, my_env: None | dict = None):
-        command = f"{self.binary} {args}"
-        if verbose_log:
-            print(f"Command: \"{command}\"")   
-        else:
-            print(f"Command: Executing \"{self.binary.name}\" with \"{args.name}\"")   
+    def command_args(self, args: Path|str) -> list[str]:
+        return [str(self.binary), str(args)]
+
+    @override
+    def fingerprint(self) -> str:
+        return file_fingerprint(self.binary)
+
+    @override
+    def config(self) -> dict[str, Any]:
+        return {"binary_path": str(self.binary)}
+
+    @override
+    @classmethod
+    def from_config(cls, config: dict[str, Any]) -> IRunner:
+        return cls(Path(config["binary_path"]))
+
+    @override
+    def run(self, cwd: Path, args: Path, verbose_log: bool = False, my_env: None | dict = None, parameters: str|None = None, sink: OutputSink|None = None) -> RunRecord:
+        command = self.command_args(self.parameter_arg(args, parameters))
+        self.log_command(command, args, verbose_log)
+        return self._execute(command, cwd, my_env, parameters, sink)
+        
+
+def hash_files(paths: list[Path], extra: str = "") -> str:
+    digest = hashlib.sha256(extra.encode())
+    for path in paths:
+        digest.update(b"\0" + str(path).encode() + b"\0")
+        digest.update(path.read_bytes() if path.exists() else b"<missing>")
+    return digest.hexdigest()
+
+def read_dependencies(dep_path: Path) -> list[Path]:
+    """Files listed in a make dependency file written by -MMD ("obj.o: main.c vector.h ...")."""
+    if not dep_path.exists():
+        return []
+    text    = dep_path.read_text().replace("\\\n", " ")
+    _, _, deps = text.partition(":")
+    return [Path(dep) for dep in deps.split()]
+
+class SourceRunner(BinaryRunner):
+    """BinaryRunner compiling its C/C++ sources into build_dir before the runs.
+
+    Every source is compiled to its own object file, compiled again only when the source, the headers it includes
+    (read from the dependency files of the compiler) or the flags changed; the binary is linked again only when an object changed.
+    With pgo, an instrumented binary is built and run once on a training input (see trainer), then the binary is rebuilt
+    with the collected profile. The objects of every stage are kept (see stage_object_path), so that the instrumented build only
+    recompiles the changed sources and the final build the sources whose profile changed.
+    The state of the last build is kept in "build.json" so that a new session does not rebuild.
+    """
+    def __init__(self, sources: list[Path], build_dir: Path, name: str = "main", compiler: str|None = None, profile: str = "release",
+                 flags: list[str]|None = None, link_flags: list[str]|None = None, pgo = False, jobs: int|None = None):
+        super().__init__(build_dir.joinpath(name))
+        if profile not in BUILD_PROFILES:
+            raise ValueError(f"SourceRunner error: unknown profile \"{profile}\", use one of {list(BUILD_PROFILES)}")
+        is_cxx          = any(source.suffix.lower() in CXX_SUFFIXES for source in sources)
+        self.sources    = sources
+        self.build_dir  = build_dir
+        self.name       = name
+        self.compiler   = compiler if compiler is not None else ("c++" if is_cxx else "cc")
+        self.profile    = profile
+        self.flags      = [] if flags is None else flags
+        self.link_flags = [] if link_flags is None else link_flags
+        self.pgo        = pgo
+        self.jobs       = jobs
+        self.trainer: Callable[[Path], Path|None]|None = None
+        self.build_lock = threading.Lock()
+        self.build_time: float|None = None
+        self.clang: bool|None       = None
+        self.manifest: dict[str, Any] = self.load_manifest()
+
+    @override
+    def config(self) -> dict[str, Any]:
+        return {"sources": [str(source) for source in self.sources], "build_dir": str(self.build_dir), "name": self.name, "compiler": self.compiler,
+                "profile": self.profile, "flags": self.flags, "link_flags": self.link_flags, "pgo": self.pgo, "jobs": self.jobs}
+
+    @override
+    @classmethod
+    def from_config(cls, config: dict[str, Any]) -> IRunner:
+        return cls([Path(source) for source in config["sources"]], Path(config["build_dir"]), config["name"], config["compiler"], config["profile"],
+                   config["flags"], config["link_flags"], config["pgo"], config["jobs"])
+
+    def load_manifest(self) -> dict[str, Any]:
+        path = self.build_dir.joinpath(BUILD_MANIFEST)
+        try:
+            return json.loads(path.read_text()) if path.exists() else dict()
+        except (json.JSONDecodeError, OSError) as _:
+            return dict()
+
+    def save_manifest(self):
+        path     = self.build_dir.joinpath(BUILD_MANIFEST)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        tmp_path.write_text(json.dumps(self.manifest, indent=1))
+        os.replace(tmp_path, path)
 
-        with subprocess.Popen(command, stdout=subprocess.PIPE, bufsize=1, text=True, stderr=subprocess.STDOUT, cwd=cwd, env=my_env) as stream:
-            if stream.stdout is not None:
-                for lines in stream.stdout:
-                    print("C/C++: ", lines, end='')
-        print("")
+    def is_clang(self) -> bool:
+        if self.clang is None:
+            try:
+                version = subprocess.run([self.compiler, "--version"], capture_output=True, text=True).stdout
+            except OSError as _:
+                version = ""
+            self.clang = "clang" in version
+        return self.clang
+
+    def object_path(self, source: Path) -> Path:
+        """Same object path at every stage: gcc finds the profile of an object by its path."""
+        suffix = hashlib.sha256(str(source.resolve()).encode()).hexdigest()[:8]
+        return self.build_dir.joinpath("obj", f"{source.stem}_{suffix}.o")
+
+    def stage_object_path(self, source: Path, stage: str) -> Path:
+        """Copy of the last object compiled at stage, put back at object_path when the next build of the stage needs it unchanged."""
+        obj = self.object_path(source)
+        return obj.parent.joinpath(stage, obj.name)
+
+    def profile_files(self, source: Path) -> list[Path]:
+        """Profile read when compiling source at the "use" stage: its .gcda files (gcc), or the merged profile (clang)."""
+        profile_dir = self.build_dir.joinpath(PGO_DIR)
+        if self.is_clang():
+            return [profile_dir.joinpath("default.profdata")]
+        return sorted(profile_dir.rglob(f"*{self.object_path(source).stem}.gcda"))
+
+    def stage_flags(self, stage: str) -> list[str]:
+        """Compiler flags of a build stage: "plain", "generate" (instrumented) or "use" (with the profile)."""
+        flags       = BUILD_PROFILES[self.profile] + self.flags
+        profile_dir = self.build_dir.joinpath(PGO_DIR)
+        if stage == "generate":
+            return flags + [f"-fprofile-generate={profile_dir}"]
+        if stage == "use" and self.is_clang():
+            return flags + [f"-fprofile-use={profile_dir.joinpath('default.profdata')}"]
+        if stage == "use":
+            return flags + [f"-fprofile-use={profile_dir}", "-fprofile-correction", "-Wno-missing-profile"]
+        return flags
+
+    def _object_key(self, source: Path, flags: list[str], stage: str) -> str:
+        deps    = [Path(dep) for dep in self.manifest.get("objects", dict()).get(stage, dict()).get(str(source), dict()).get("deps", [])]
+        profile = self.profile_files(source) if stage == "use" else []
+        return hash_files([source] + deps + profile, " ".join([self.compiler] + flags))
+
+    def _compile(self, source: Path, flags: list[str], stage: str) -> tuple[Path, bool]:
+        """Object of source at stage: left in place if it is the current one, copied back from the stage copy if that one
+        is up to date, compiled otherwise. Returns the object & whether it was compiled."""
+        obj     = self.object_path(source)
+        copy    = self.stage_object_path(source, stage)
+        entries = self.manifest["objects"].setdefault(stage, dict())
+        key     = self._object_key(source, flags, stage)
+        if entries.get(str(source), dict()).get("key") == key and copy.exists():
+            current = self.manifest["current"].get(str(source))
+            if not obj.exists() or current != [stage, key]:
+                shutil.copy2(copy, obj)
+                self.manifest["current"][str(source)] = [stage, key]
+            return obj, False
         
+        dep_path  = obj.with_suffix(".d")
+        command   = [self.compiler, *flags, "-c", str(source), "-o", str(obj), "-MMD", "-MF", str(dep_path)]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        self._log_compiler_output(completed)
+        if completed.returncode != 0:
+            raise RuntimeError(f"compile error: \"{source.name}\" exit code {completed.returncode}")
+        deps = [str(dep) for dep in read_dependencies(dep_path) if dep.resolve() != source.resolve()]
+        entries[str(source)] = {"deps": deps}
+        key = self._object_key(source, flags, stage) # with the new dependencies
+        entries[str(source)]["key"] = key
+        copy.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(obj, copy)
+        self.manifest["current"][str(source)] = [stage, key]
+        return obj, True
+
+    def _log_compiler_output(self, completed: subprocess.CompletedProcess):
+        """Diagnostics of the compiler: warnings, or errors if it failed."""
+        level = "warning" if completed.returncode == 0 else "error"
+        for line in (completed.stdout + completed.stderr).splitlines():
+            self.events.emit(level, "build_output", f"{self.output_prefix} {line}")
+
+    def _build_stage(self, stage: str, output: Path, verbose_log: bool) -> int:
+        """Compiles the sources with the flags of stage (in parallel) & links output, returns the number of compiled sources."""
+        flags = self.stage_flags(stage)
+        self.build_dir.joinpath("obj").mkdir(parents=True, exist_ok=True)
+        if any("key" in entry for entry in self.manifest.get("objects", dict()).values()): # objects of older versions, not by stage
+            self.manifest["objects"] = dict()
+        self.manifest.setdefault("objects", dict())
+        self.manifest.setdefault("current", dict())
+        self.events.emit("info" if verbose_log else "debug", "build_command", f"Command: \"{' '.join([self.compiler, *flags])}\" [{stage}]", stage=stage)
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            compiled = list(pool.map(lambda source: self._compile(source, flags, stage), self.sources))
+        
+        objects  = [obj for obj, _ in compiled]
+        n_built  = sum(built for _, built in compiled)
+        link_key = hash_files(objects, " ".join([self.compiler, *flags, *self.link_flags, str(output)]))
+        if n_built > 0 or not output.exists() or self.manifest.get("links", dict()).get(str(output)) != link_key:
+            command   = [self.compiler, *flags, *[str(obj) for obj in objects], "-o", str(output), *self.link_flags]
+            completed = subprocess.run(command, capture_output=True, text=True)
+            self._log_compiler_output(completed)
+            if completed.returncode != 0:
+                raise RuntimeError(f"link error: exit code {completed.returncode}")
+            self.manifest.setdefault("links", dict())[str(output)] = link_key
+        self.save_manifest()
+        return n_built
+
+    def _train(self, cwd: Path, verbose_log: bool) -> bool:
+        """Builds the instrumented binary & runs it on the training input, False if there is no training input or the run failed."""
+        profile_dir = self.build_dir.joinpath(PGO_DIR)
+        training    = self.trainer(profile_dir) if self.trainer is not None else None
+        if training is None:
+            self.events.warning("pgo", ">> PGO: no training input, building without profile")
+            return False
+        for pattern in ["*.gcda", "*.profraw", "*.profdata"]: # gcc nests the .gcda files by object path
+            for stale in profile_dir.rglob(pattern):
+                stale.unlink()
+        
+        instrumented = self.binary.with_name(f"{self.name}-instrumented")
+        self._build_stage("generate", instrumented, verbose_log)
+        start     = time.perf_counter()
+        completed = subprocess.run([str(instrumented), str(training)], cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        train_time = time.perf_counter() - start
+        self.events.emit("info" if completed.returncode == 0 else "warning", "pgo", f">> PGO: training run on \"{training.name}\" in {train_time:.2f}s (exit code {completed.returncode})",
+                         training=str(training), elapsed=train_time, exit_code=completed.returncode)
+        if completed.returncode != 0:
+            return False
+        if self.is_clang():
+            profdata = shutil.which("llvm-profdata")
+            if profdata is None:
+                self.events.warning("pgo", ">> PGO: llvm-profdata not found, building without profile")
+                return False
+            raw = [str(path) for path in profile_dir.glob("*.profraw")]
+            subprocess.run([profdata, "merge", f"-output={profile_dir.joinpath('default.profdata')}", *raw], check=True)
+        return True
+
+    @override
+    def fingerprint(self) -> str:
+        """Sources, included headers, compiler & flags: a rebuild with the same inputs (or a new profile) keeps the cached runs."""
+        objects = self.manifest.get("objects", dict()).values()
+        deps    = sorted({Path(dep) for stage in objects for source in self.sources for dep in stage.get(str(source), dict()).get("deps", [])})
+        return hash_files(self.sources + deps, " ".join([self.compiler, self.profile, *self.flags, *self.link_flags, str(self.pgo)]))
+
+    def needs_build(self) -> bool:
+        return not self.binary.exists() or self.manifest.get("binary_key") != self.fingerprint()
+
+    def build(self, cwd: Path, verbose_log: bool = False) -> Path:
+        self.events.info("build_start", f">> Building \"{self.name}\" [{self.compiler} {' '.join(BUILD_PROFILES[self.profile] + self.flags)}{', PGO' if self.pgo else ''}]", name=self.name)
+        start = time.perf_counter()
+        if self.pgo and self._train(cwd, verbose_log):
+            n_built = self._build_stage("use", self.binary, verbose_log)
+        else:
+            n_built = self._build_stage("plain", self.binary, verbose_log)
+        self.build_time = time.perf_counter() - start
+        self.manifest["binary_key"] = self.fingerprint()
+        self.save_manifest()
+        self.events.info("build_end", f">> Built \"{self.binary.name}\" in {self.build_time:.2f}s ({n_built}/{len(self.sources)} sources compiled)",
+                         binary=str(self.binary), elapsed=self.build_time, compiled=n_built, sources=len(self.sources))
+        return self.binary
+
+    def ensure_built(self, cwd: Path, verbose_log: bool = False) -> Path:
+        with self.build_lock:
+            if self.needs_build():
+                self.build(cwd, verbose_log)
+            return self.binary
+
+    @override
+    def prepare(self, cwd: Path, verbose_log: bool = False) -> None:
+        self.ensure_built(cwd, verbose_log)
+
+    @override
+    def run(self, cwd: Path, args: Path, verbose_log: bool = False, my_env: None | dict = None, parameters: str|None = None, sink: OutputSink|None = None) -> RunRecord:
+        if not self.prepared:
+            self.ensure_built(cwd, verbose_log)
+        return super().run(cwd, args, verbose_log, my_env, parameters, sink)
 
 class CppExperiment(AbstractExperiment):
     def __init__(self, exp_data: BaseExperimentData):
         super().__init__(exp_data)
+        if isinstance(self.runner, SourceRunner):
+            self.runner.trainer = self.write_training_parameters
 
     @override
-    def run(self, scale: int | float, env_var: dict | None = None, verbose_log=False) -> None:
+    def run(self, scale: int | float, env_var: dict | None = None, verbose_log=False) -> RunRecord|None:
         if self.runner is None:
             raise TypeError("run_executable() error: Runner not set [use: set_executable]")
         
@@ -40,12 +314,24 @@ class CppExperiment(AbstractExperiment):
         try:
             param_path = self.get_parameter_path(scale)
         except KeyError as _:
-            print(">> run_cargo: cannot find parameter")            
-            return
+            self.events.error("run_error", f">> run_executable: cannot find parameter of {scale}", key=scale)
+            return None
 
         cwd  = self.paths_data.proj_dir
         args = param_path
-        self.runner.run(cwd, args, verbose_log, env_var)        
+        return self.runner.run(cwd, args, verbose_log, env_var, self.render_parameters(scale), self.make_sink(scale))        
+
+    def write_training_parameters(self, directory: Path) -> Path|None:
+        """PGO training input: the parameter file of the smallest scale variable (see scale_size, replicas are not considered),
+        with its output (& checkpoint) in directory."""
+        if not self.parameters.scale_variables:
+            return None
+        L        = min(self.parameters.scale_variables, key=scale_size)
+        out_path = directory.joinpath(f"training_out{self.paths_data.out_paths[L].suffix}")
+        path     = directory.joinpath("training_parameters.txt")
+        directory.mkdir(parents=True, exist_ok=True)
+        path.write_text(self.render_parameters_for(L, out_path))
+        return path
 
 class CppExperimentBuilder(AbstractExperimentBuilder):
     def __init__(self, proj_dir: Path, results_dir: str, exp_name: str, verbose_log: bool = False):
@@ -56,7 +342,20 @@ class CppExperimentBuilder(AbstractExperimentBuilder):
         if not binary_path.exists():
             raise FileNotFoundError(f"set_executable(): Cannot find {binary_path}")
         self.runner = BinaryRunner(binary_path)
-        print(f">> Binary path set to \"{self.log_path(binary_path)}\" [Current mode: Binary mode]")
+        self.paths_data.events.info("settings", f">> Binary path set to \"{self.log_path(binary_path)}\" [Current mode: Binary mode]", path=binary_path)
+
+    def set_sources(self, sources: list[Path], name: str = "main", build_dir: Path|None = None, compiler: str|None = None, profile: str = "release",
+                    flags: list[str]|None = None, link_flags: list[str]|None = None, pgo = False, jobs: int|None = None):
+        """Builds the executable from sources into build_dir (default: "<proj_dir>/build"), see SourceRunner.
+        profile: "release" (-O3 -march=native -flto, default), "portable" (-O3 -flto) or "debug" (-O0 -g), flags are appended.
+        pgo: profile-guided optimization, trained on the smallest scale variable."""
+        for source in sources:
+            if not source.exists():
+                raise FileNotFoundError(f"set_sources(): Cannot find {source}")
+        build_dir   = self.paths_data.proj_dir.joinpath("build") if build_dir is None else build_dir
+        self.runner = SourceRunner(sources, build_dir, name, compiler, profile, flags, link_flags, pgo, jobs)
+        self.paths_data.events.info("settings", f">> Sources set to {', '.join([f'\"{self.log_path(source)}\"' for source in sources])} [Current mode: Source mode, {profile}{', PGO' if pgo else ''}]",
+                                    sources=sources, profile=profile, pgo=pgo)
     
     @override
     def build(self, load_only = False) -> CppExperiment:
@@ -64,7 +363,11 @@ class CppExperimentBuilder(AbstractExperimentBuilder):
         experiment.runner = self.runner
         if experiment.runner is None and not load_only:
             raise TypeError("Binary path not set!")
-        return CppExperiment(experiment)
+        cpp_experiment = CppExperiment(experiment)
+        if isinstance(self.runner, SourceRunner) and not load_only:
+            self.runner.ensure_built(self.paths_data.proj_dir, self.paths_data.path_logger.is_verbose())
+        cpp_experiment.save_manifest()
+        return cpp_experiment
     
 if __name__ == "__main__":
     pass
\ No newline at end of file
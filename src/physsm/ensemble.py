@@ -0,0 +1,71 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any
+import numpy as np
+
+from .experiment_output import ExperimentOutput
+
+@dataclass(frozen=True, order=True)
+class Replica:
+    """Key of one independent run of the scale variable "scale", with seed_key set to "seed"."""
+    scale: Any
+    seed: int
+    seed_key: str = "seed"
+
+    def __str__(self) -> str:
+        return f"{self.scale}[{self.seed_key}={self.seed}]"
+
+class WelfordAccumulator:
+    """Streaming mean & variance of every numeric array attribute of the outputs added,
+    so that the replicas never need to be held in memory at the same time."""
+    def __init__(self):
+        self.count = 0
+        self.means: dict[str, np.ndarray] = dict()
+        self.m2: dict[str, np.ndarray]    = dict()
+
+    @staticmethod
+    def get_observables(output: ExperimentOutput) -> dict[str, np.ndarray]:
+        observables = dict()
+        for name, value in output.get_data().items():
+            value = np.asarray(value)
+            if np.issubdtype(value.dtype, np.number):
+                observables[name] = value.astype(np.float64)
+        return observables
+
+    def add(self, output: ExperimentOutput):
+        observables = self.get_observables(output)
+        self.count += 1
+        for name, x in observables.items():
+            if self.count == 1:
+                self.means[name] = x.copy()
+                self.m2[name]    = np.zeros_like(x)
+                continue
+            if name not in self.means or self.means[name].shape != x.shape:
+                raise ValueError(f"WelfordAccumulator error: \"{name}\" differs between replicas")
+            delta            = x - self.means[name]
+            self.means[name] += delta/self.count
+            self.m2[name]    += delta*(x - self.means[name])
+
+    def get_statistics(self) -> ReplicaStatistics:
+        if self.count == 0:
+            raise ValueError("WelfordAccumulator error: no replica added")
+        variance: dict[str, np.ndarray]  = dict()
+        std_error: dict[str, np.ndarray] = dict()
+        for name, m2 in self.m2.items():
+            variance[name]  = m2/(self.count - 1) if self.count > 1 else np.full_like(m2, np.nan)
+            std_error[name] = np.sqrt(variance[name]/self.count)
+        return ReplicaStatistics(self.count, dict(self.means), variance, std_error)
+
+class ReplicaStatistics:
+    """Mean, sample variance & standard error of every observable over the replicas, for ex stats.mean["energy"]."""
+    def __init__(self, count: int, mean: dict[str, np.ndarray], variance: dict[str, np.ndarray], std_error: dict[str, np.ndarray]):
+        self.count     = count
+        self.mean      = mean
+        self.variance  = variance
+        self.std_error = std_error
+
+    def __repr__(self) -> str:
+        return f"ReplicaStatistics(count={self.count}, observables={list(self.mean.keys())})"
+
+if __name__ == "__main__":
+    pass
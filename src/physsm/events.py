@@ -0,0 +1,159 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import IO, Any, Callable
+import json
+import sys
+import threading
+import time
+import numpy as np
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+
+def level_value(level: str) -> int:
+    if level not in LEVELS:
+        raise ValueError(f"unknown log level \"{level}\", use one of {list(LEVELS)}")
+    return LEVELS[level]
+
+def format_count(n: int) -> str:
+    """10000 -> "10 000"."""
+    return f"{n:,}".replace(",", " ")
+
+def format_duration(seconds: float|None) -> str:
+    if seconds is None:
+        return "?"
+    seconds = max(0, round(seconds))
+    hours, rest    = divmod(seconds, 3600)
+    minutes, secs  = divmod(rest, 60)
+    if hours > 0:
+        return f"{hours}h{minutes:02d}m"
+    if minutes > 0:
+        return f"{minutes}m{secs:02d}s"
+    return f"{secs}s"
+
+def format_examples(items: list, n: int = 3) -> str:
+    """First n items, for ex "8, 16, 32 (+12 more)"."""
+    shown = ", ".join([str(item) for item in items[:n]])
+    return shown + (f" (+{format_count(len(items) - n)} more)" if len(items) > n else "")
+
+def _json_default(value) -> Any:
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+class Event:
+    """One message: level, kind (for ex "param_file", "run_end", "progress", "summary"), the printed text & its data."""
+    def __init__(self, level: str, kind: str, message: str, data: dict[str, Any], timestamp: float|None = None):
+        self.level     = level
+        self.kind      = kind
+        self.message   = message
+        self.data      = data
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"time": self.timestamp, "level": self.level, "kind": self.kind, "message": self.message, "data": self.data}
+
+    def __repr__(self) -> str:
+        return f"Event({self.level}, {self.kind}, \"{self.message}\")"
+
+class EventLog:
+    """Prints the events of at least level ("info" by default: summaries, not one line per file or run) and passes the events
+    to the callbacks registered with their own level, for ex a JsonlEventWriter exporting every event to a file.
+
+    A live line (the progress of a sweep) is rewritten in place with "\\r" and cleared before the next printed message.
+    """
+    def __init__(self, level: str = "info"):
+        self.level      = level_value(level)
+        self.callbacks: list[tuple[int, Callable[[Event], None]]] = []
+        self.lock       = threading.RLock()
+        self.live_width = 0
+
+    def set_level(self, level: str):
+        self.level = level_value(level)
+
+    def get_level(self) -> str:
+        return next(name for name, value in LEVELS.items() if value == self.level)
+
+    def add_callback(self, callback: Callable[[Event], None], level: str = "debug") -> Callable[[Event], None]:
+        with self.lock:
+            self.callbacks.append((level_value(level), callback))
+        return callback
+
+    def remove_callback(self, callback: Callable[[Event], None]):
+        with self.lock:
+            self.callbacks = [(value, cb) for value, cb in self.callbacks if cb is not callback]
+
+    def wants(self, level: str) -> bool:
+        """True if an event of level would be printed or passed to a callback, to skip formatting the others."""
+        value = LEVELS[level]
+        return value >= self.level or any(value >= cb_value for cb_value, _ in self.callbacks)
+
+    def emit(self, level: str, kind: str, message: str, live = False, **data):
+        value   = LEVELS[level]
+        printed = value >= self.level
+        with self.lock:
+            targets = [callback for cb_value, callback in self.callbacks if value >= cb_value]
+            if not printed and len(targets) == 0:
+                return
+            if printed:
+                self._write(message, live)
+            event = Event(level, kind, message, data)
+            for callback in targets:
+                try:
+                    callback(event)
+                except Exception as e:
+                    self._write(f"event callback error: {e}, {e.args}", False)
+
+    def debug(self, kind: str, message: str, **data):
+        self.emit("debug", kind, message, **data)
+
+    def info(self, kind: str, message: str, **data):
+        self.emit("info", kind, message, **data)
+
+    def warning(self, kind: str, message: str, **data):
+        self.emit("warning", kind, message, **data)
+
+    def error(self, kind: str, message: str, **data):
+        self.emit("error", kind, message, **data)
+
+    def _write(self, message: str, live: bool):
+        if live:
+            sys.stdout.write("\r" + message.ljust(self.live_width))
+            sys.stdout.flush()
+            self.live_width = len(message)
+            return
+        if self.live_width > 0:
+            sys.stdout.write("\r" + " "*self.live_width + "\r")
+            self.live_width = 0
+        print(message)
+
+    def end_live(self):
+        """Keeps the live line on the console."""
+        with self.lock:
+            if self.live_width > 0:
+                sys.stdout.write("\n")
+                sys.stdout.flush()
+                self.live_width = 0
+
+class JsonlEventWriter:
+    """Callback appending every event as a json line to path (see EventLog.add_callback)."""
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file: IO[str]|None = None
+
+    def __call__(self, event: Event):
+        with self.lock:
+            if self.file is None:
+                self.file = self.path.open("a", buffering=1)
+            self.file.write(json.dumps(event.to_dict(), default=_json_default) + "\n")
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+if __name__ == "__main__":
+    pass
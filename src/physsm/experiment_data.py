@@ -1,29 +1,86 @@
 from __future__ import annotations
 import numpy as np
-from typing import Any, TypeVar
+from typing import Any, Callable, Iterable, Iterator, TypeVar
+from collections.abc import MutableMapping
 from .experiment_output import ExperimentOutput
 from .runnner import*
 from pathlib import Path
 from .path_logger import PathLogger, IPathLogger
+from .events import EventLog
+from .scale_grid import ScaleGrid, GridParameter
+
+class PathTemplate(MutableMapping):
+    """Paths "<target_dir>/<prefix>_<suffix>.<extension>" of the scale variables, made from the scale suffix of the key
+    when accessed instead of being stored. Paths set to another name (for ex the replicas) are kept in custom.
+    """
+    def __init__(self, target_dir: Path, prefix: str, extension: str, suffix: Callable[[Any], str], keys: Iterable = ()):
+        self.target_dir = target_dir
+        self.prefix     = prefix
+        self.extension  = extension
+        self.suffix     = suffix
+        self.known: dict[Any, None] = dict.fromkeys(keys)
+        self.custom: dict[Any, Path] = dict()
+
+    def file_name(self, key) -> str:
+        return f"{self.prefix}_{self.suffix(key)}.{self.extension}"
+
+    def __getitem__(self, key) -> Path:
+        if key in self.custom:
+            return self.custom[key]
+        if key not in self.known:
+            raise KeyError(key)
+        return self.target_dir.joinpath(self.file_name(key))
+
+    def __setitem__(self, key, path: Path):
+        self.known[key] = None
+        if path.parent == self.target_dir and path.name == self.file_name(key):
+            self.custom.pop(key, None)
+        else:
+            self.custom[key] = path
+
+    def __delitem__(self, key):
+        del self.known[key]
+        self.custom.pop(key, None)
+
+    def __contains__(self, key) -> bool:
+        return key in self.known
+
+    def __iter__(self) -> Iterator:
+        return iter(self.known)
+
+    def __len__(self) -> int:
+        return len(self.known)
+
+    def __repr__(self) -> str:
+        return f"PathTemplate(\"{self.prefix}_{{suffix}}.{self.extension}\", {len(self.known)} paths, {len(self.custom)} custom)"
 
 class PathData:
     def __init__(self, logger: IPathLogger) -> None:
         self.proj_dir: Path                        = Path()
-        self.out_paths:   dict[int|float, Path]    = dict()
-        self.param_paths: dict[int|float, Path]    = dict()
+        self.out_paths:   MutableMapping[Any, Path]   = dict()
+        self.param_paths: MutableMapping[Any, Path]   = dict()
         self.target_dir: Path                      = Path()
         self.path_logger: IPathLogger              = logger
+        self.events                                = EventLog()
         
     def log_path(self, path: Path) -> Path:
         return self.path_logger.log_path(path)
 
     def set_param_path(self, key, path_name: str):       
         self.param_paths[key] =  self.target_dir.joinpath(path_name)
-        print(f"-- setting paramfile \"{self.log_path(self.param_paths[key])}\"")
+        if self.events.wants("debug"):
+            self.events.debug("param_path", f"-- setting paramfile \"{self.log_path(self.param_paths[key])}\"", key=key, path=self.param_paths[key])
         
     def set_out_path(self, key, out_path_name: str):       
         self.out_paths[key] = self.target_dir.joinpath(out_path_name)
-        print(f"-- setting outfile \"{self.log_path(self.out_paths[key])}\"")
+        if self.events.wants("debug"):
+            self.events.debug("out_path", f"-- setting outfile \"{self.log_path(self.out_paths[key])}\"", key=key, path=self.out_paths[key])
+
+    def set_path_templates(self, param_name: str, param_ext: str, out_name: str, out_ext: str, suffix: Callable[[Any], str], keys: Iterable):
+        """Parameter & output paths of keys made on access from the templates "<name>_<suffix>.<ext>"."""
+        keys             = list(keys)
+        self.param_paths = PathTemplate(self.target_dir, param_name, param_ext, suffix, keys)
+        self.out_paths   = PathTemplate(self.target_dir, out_name, out_ext, suffix, keys)
 
     def set_logger(self, logger: IPathLogger):
         self.path_logger = logger
@@ -39,25 +96,28 @@ class PathData:
             raise NotADirectoryError(f">> Project Directory \"{self.log_path(self.proj_dir)}\" Not Found.")
         else:
             if not self.path_logger.is_verbose():
-                print(f">> Project Directory \"{self.proj_dir.name}\" Found.")
+                self.events.info("proj_dir", f">> Project Directory \"{self.proj_dir.name}\" Found.", path=self.proj_dir)
             else:
-                print(f">> Project Directory \"{self.proj_dir}\" Found.")
+                self.events.info("proj_dir", f">> Project Directory \"{self.proj_dir}\" Found.", path=self.proj_dir)
                 
         if target_dir.exists():
-            print(f">> Directory \"{self.log_path(target_dir)}\" Found.")
+            self.events.info("target_dir", f">> Directory \"{self.log_path(target_dir)}\" Found.", path=target_dir)
         else:
             target_dir.mkdir(parents=True)
-            print(f">> Directory \"{self.log_path(target_dir)}\" created.")
+            self.events.info("target_dir", f">> Directory \"{self.log_path(target_dir)}\" created.", path=target_dir)
 
         self.target_dir = target_dir
       
 
 class Parameters:
-    def __init__(self) -> None:
+    def __init__(self, events: EventLog|None = None) -> None:
+        self.events                                = EventLog() if events is None else events
         self.scale_variables: list|np.ndarray|None = None
         self.scale_variable_names: list[str]       = ["L"]  
         self.static_params:  dict[str, Any]        = dict()
         self.scaling_params: dict[str, dict]       = dict()
+        self.scale_grid: ScaleGrid|None            = None
+        self.grid_params: dict[str, GridParameter] = dict()
         
     @staticmethod
     def get_scale_variables_from_dict(scaling_param: dict[int|float, Any]):
@@ -91,29 +151,64 @@ class Parameters:
         except Exception as e:
             raise ValueError(f"add_scaling_parameter() error {e.args}")
         
-        print(f">> Succesfully added \"{name}\"")
+        self.events.debug("parameter", f">> Succesfully added \"{name}\"", key=name)
         self.scaling_params.update({name : new_scaling_param})
         
         if self.scale_variables is None:
             self.scale_variables = Parameters.get_scale_variables_from_dict(new_scaling_param)
     
+    def set_scale_grid(self, grid: ScaleGrid):
+        self.scale_grid           = grid
+        self.scale_variable_names = grid.get_names()
+        self.scale_variables      = grid.points()
+        
+    def add_grid_parameter(self, name: str, values: dict|Callable[..., Any], axes: list[str]):
+        if self.scale_grid is None:
+            raise ValueError("add_grid_parameter() error: scale grid not set [use: set_scale_grid]")
+        grid_param = GridParameter(axes, values)
+        try:
+            grid_param.validate(self.scale_grid, name)
+        except Exception as e:
+            raise ValueError(f"add_grid_parameter() error {e.args}")
+        
+        self.events.debug("parameter", f">> Succesfully added \"{name}\"", key=name)
+        self.grid_params.update({name : grid_param})
+
+    def get_scale_items(self, L) -> list[tuple[str, Any]]:
+        """(name, value) of every scale variable name: the components of L on a grid, L itself otherwise."""
+        if isinstance(L, tuple):
+            return list(zip(self.scale_variable_names, L))
+        return [(name, L) for name in self.scale_variable_names]
+
+    def get_scale_suffix(self, L) -> str:
+        return ",".join([f"{name}={value}" for name, value in self.get_scale_items(L)])
+
+    def get_scaling_names(self) -> list[str]:
+        return list(self.scaling_params.keys()) + list(self.grid_params.keys())
+
+    def get_scaling_value(self, key: str, L) -> Any:
+        if key in self.grid_params:
+            assert self.scale_grid is not None
+            return self.grid_params[key].value(self.scale_grid, L)
+        return self.scaling_params[key][L]
+
     def add_static_parameter(self, key: str, value):
-        print(f">> Succesfully added \"{key}\"")
+        self.events.debug("parameter", f">> Succesfully added \"{key}\"", key=key)
         self.static_params.update({key : value})
     
     def set_static_parameter(self, key, value):
         try:
             self.static_params[key] = value
-            print(f">> \"{key}\" set")
+            self.events.debug("parameter", f">> \"{key}\" set", key=key)
         except KeyError as _:
-            print(f">> Key \"{key}\" not found")
+            self.events.warning("parameter", f">> Key \"{key}\" not found", key=key)
     
     def set_scaling_parameter(self, key, value):
         try:
             self.scaling_params[key] = value
-            print(f">> \"{key}\" set")
+            self.events.debug("parameter", f">> \"{key}\" set", key=key)
         except KeyError as _:
-            print(f">> Key \"{key}\" not found")
+            self.events.warning("parameter", f">> Key \"{key}\" not found", key=key)
             
 OutType =  TypeVar("OutType", bound= ExperimentOutput,) 
 
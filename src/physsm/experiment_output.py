@@ -1,8 +1,11 @@
 from __future__ import annotations
 from abc import abstractmethod
 import numpy as np
+import json
 from pathlib import Path
 
+from .tail import TailState, read_new_lines
+
 class ExperimentOutput:
     def __init__(self, out_path):
         self.file: Path = out_path
@@ -20,8 +23,12 @@ class ExperimentOutput:
         if isinstance(my_lists, list):            
             setattr(self, name, np.asarray(my_lists))
 
+    def get_data(self) -> dict:
+        """Parsed attributes: everything but the file path and private attributes (for ex the state of follow)."""
+        return {name: value for name, value in vars(self).items() if name != "file" and not name.startswith("_")}
+
     def all_lists_to_array(self):
-        for name in vars(self).keys():
+        for name in self.get_data().keys():
             self.__to_nd_array(name)
 
     def grab_files(self) -> None:
@@ -32,4 +39,150 @@ class ExperimentOutput:
             for (n, line) in enumerate(file):
                 self.parse_output(n, line)
         self.all_lists_to_array()
- 
\ No newline at end of file
+
+    def _restart_follow(self):
+        self.__init__(self.file) # type: ignore
+        self._tail = TailState()
+
+    def _parse_new_lines(self, lines: list[str], first_line: int):
+        for n, line in enumerate(lines, start=first_line):
+            self.parse_output(n, line)
+
+    def follow(self) -> int:
+        """Parses only the lines appended since the last call, while the simulation is still writing the output,
+        and appends them to the arrays. Returns the number of new lines.
+        If the file was rewritten (it shrank), the output is reset and parsed again from the start."""
+        if not hasattr(self, "_tail"):
+            self._tail = TailState()
+        if not self.has_file():
+            return 0
+        lines = read_new_lines(self.file, self._tail)
+        if lines is None:
+            self._restart_follow()
+            lines = read_new_lines(self.file, self._tail) or []
+        if len(lines) == 0:
+            return 0
+
+        state = self._tail
+        if state.names is None:
+            state.names = [name for name, value in self.get_data().items() if isinstance(value, list)]
+        previous = {name: getattr(self, name) for name in state.names}
+        for name in state.names:
+            setattr(self, name, [])
+        self._parse_new_lines(lines, state.line_number)
+        for name, old in previous.items():
+            new = np.asarray(getattr(self, name))
+            if isinstance(old, list):
+                setattr(self, name, new)
+            else:
+                setattr(self, name, np.concatenate([old, new.astype(old.dtype, copy=False)]) if new.size > 0 else old)
+        state.line_number += len(lines)
+        return len(lines)
+ 
+class ColumnarOutput(ExperimentOutput):
+    """Output made of delimited columns, loaded in bulk with np.loadtxt instead of line by line.
+    
+    Subclasses declare the layout as class attributes, for ex:
+        class MyOutput(ColumnarOutput):
+            columns      = {"energy": np.float64, "magnetization": np.float64}
+            delimiter    = ","
+            header_lines = 1
+    After grab_files(), every column is available as a typed np.ndarray attribute.
+    """
+    columns: dict[str, type|str|np.dtype] = dict()
+    delimiter: str|None                   = ","
+    header_lines: int                     = 0
+    comments: str|None                    = "#"
+
+    def __init__(self, out_path):
+        super().__init__(out_path)
+    
+    def parse_output(self, line_number: int, line: str):
+        raise NotImplementedError("ColumnarOutput is loaded in bulk, declare \"columns\" instead")
+
+    def get_dtype(self) -> np.dtype:
+        if len(self.columns) == 0:
+            raise ValueError("ColumnarOutput error: no columns declared")
+        return np.dtype([(name, dtype) for name, dtype in self.columns.items()])
+
+    def grab_files(self) -> None:
+        if not self.has_file():
+            raise ValueError("Error: outputfile not found")
+        
+        data = np.loadtxt(self.file, dtype=self.get_dtype(), delimiter=self.delimiter, skiprows=self.header_lines, comments=self.comments, ndmin=1)
+        for name in self.columns:
+            setattr(self, name, np.ascontiguousarray(data[name]))
+
+    def _restart_follow(self):
+        super()._restart_follow()
+        for name in self.columns:
+            setattr(self, name, [])
+
+    def _parse_new_lines(self, lines: list[str], first_line: int):
+        lines = lines[max(0, self.header_lines - first_line):]
+        if len(lines) == 0: # typed empty columns, so that the next rows are appended with the declared dtypes
+            data = np.empty(0, dtype=self.get_dtype())
+        else:
+            data = np.loadtxt(lines, dtype=self.get_dtype(), delimiter=self.delimiter, comments=self.comments, ndmin=1)
+        for name in self.columns:
+            setattr(self, name, data[name])
+
+    def follow(self) -> int:
+        if not hasattr(self, "_tail"):
+            self._restart_follow()
+        return super().follow()
+
+def header_path(out_path: Path) -> Path:
+    return out_path.with_suffix(".json")
+
+def write_binary_header(out_path: Path, arrays: list[tuple[str, str|np.dtype, tuple]]):
+    """Writes the json header describing a raw binary output: the arrays are stored back to back, in C order."""
+    header = {"arrays": [{"name": name, "dtype": np.dtype(dtype).str, "shape": list(shape)} for name, dtype, shape in arrays]}
+    header_path(out_path).write_text(json.dumps(header))
+
+class BinaryOutput(ExperimentOutput):
+    """Binary output, memory-mapped instead of parsed.
+    
+    * ".npy" files are loaded with np.load(mmap_mode) into the attribute named npy_name.
+    * raw files (for ex ".bin") need a json header next to them ("out_L=8.json" for "out_L=8.bin"):
+        {"arrays": [{"name": "energy", "dtype": "<f8", "shape": [1000]},
+                    {"name": "spins",  "dtype": "|i1", "shape": [1000, 8, 8]}]}
+      The arrays are stored back to back in C order, starting at byte 0 (or at an explicit "offset").
+      Every array becomes an np.memmap attribute with its name.
+    """
+    npy_name: str  = "data"
+    mmap_mode: str = "r"
+
+    def __init__(self, out_path):
+        super().__init__(out_path)
+
+    def parse_output(self, line_number: int, line: str):
+        raise NotImplementedError("BinaryOutput is memory-mapped, not parsed")
+
+    def follow(self) -> int:
+        raise NotImplementedError("BinaryOutput cannot be followed, use grab_files once the run is finished")
+
+    def read_header(self) -> list[dict]:
+        header = header_path(self.file)
+        if not header.exists():
+            raise ValueError(f"Error: binary header \"{header.name}\" not found")
+        return json.loads(header.read_text())["arrays"]
+
+    def grab_files(self) -> None:
+        if not self.has_file():
+            raise ValueError("Error: outputfile not found")
+        
+        if self.file.suffix == ".npy":
+            setattr(self, self.npy_name, np.load(self.file, mmap_mode=self.mmap_mode))
+            return
+        
+        offset = 0
+        for array in self.read_header():
+            dtype  = np.dtype(array["dtype"])
+            shape  = tuple(array["shape"])
+            offset = array.get("offset", offset)
+            if np.prod(shape) == 0:
+                setattr(self, array["name"], np.empty(shape, dtype=dtype))
+            else:
+                setattr(self, array["name"], np.memmap(self.file, dtype=dtype, mode=self.mmap_mode, offset=offset, shape=shape))
+            offset += dtype.itemsize*int(np.prod(shape))
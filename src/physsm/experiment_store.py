@@ -0,0 +1,315 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import warnings
+import zipfile
+import numpy as np
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+from .experiment_output import ExperimentOutput
+from .events import EventLog
+from .result_cache import output_arrays, restore_output, out_type_identity
+
+STORE_FILE      = "store.npz"
+META_MEMBER     = "__meta__.json"
+PARAM_MEMBER    = "parameters.txt"
+PARAMETERS_FILE = "parameters.json"
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """Exclusive lock between processes on path (created if missing), held until the end of the with block."""
+    with open(path, "a+b") as file:
+        if sys.platform == "win32":
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if sys.platform == "win32":
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+def fsync_write(path: Path, data: bytes):
+    with open(path, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+
+def to_json(value) -> Any:
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {str(k): to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json(v) for v in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return repr(value)
+
+class ExperimentStore:
+    """All outputs of an experiment consolidated in a single compressed zip file ("store.npz"), instead of one file per scale variable.
+
+    Every output is stored under its file name, for ex "out_L=8.txt/energy.npy", next to its metadata and the content of
+    its parameter file. Members are compressed independently, so any output is read without reading the others.
+    New outputs are appended in place: the central directory they overwrite is saved to a journal first, and restored if the
+    append did not complete (crash, exception), so that the store stays valid. Writes are serialized between processes by a
+    lock file ("store.lock"). An output stored again shadows the previous one until compact() rewrites the file.
+    The file is read on first use.
+    """
+    def __init__(self, path: Path, compresslevel: int = 6, events: EventLog|None = None):
+        self.path          = path
+        self.compresslevel = compresslevel
+        self.events        = EventLog() if events is None else events
+        self.lock          = threading.RLock()
+        self._index: dict[str, dict[str, zipfile.ZipInfo]]|None = None
+        self._n_stale      = 0
+        self.reader: zipfile.ZipFile|None = None
+        self.lock_path     = path.with_name(f"{path.stem}.lock")
+        self.journal_path  = path.with_name(f".{path.name}.journal")
+
+    @property
+    def index(self) -> dict[str, dict[str, zipfile.ZipInfo]]:
+        with self.lock:
+            if self._index is None:
+                self.load_index()
+            return self._index # type: ignore
+
+    @property
+    def n_stale(self) -> int:
+        self.index
+        return self._n_stale
+
+    def load_index(self):
+        """Raises ValueError if the file is not a valid zip archive."""
+        with self.lock, file_lock(self.lock_path):
+            self._rescan()
+
+    def _scan(self):
+        with self.lock:
+            self.close()
+            index: dict[str, dict[str, zipfile.ZipInfo]] = dict()
+            n_stale   = 0
+            top_level = set()
+            if self.path.exists():
+                try:
+                    with zipfile.ZipFile(self.path, "r") as archive:
+                        infos = archive.infolist()
+                except zipfile.BadZipFile as e:
+                    raise ValueError(f"ExperimentStore error: \"{self.path}\" is corrupt ({e}), restore or delete it") from e
+                for info in infos:
+                    key, _, member = info.filename.partition("/")
+                    if member == "":
+                        n_stale += info.filename in top_level
+                        top_level.add(info.filename)
+                        continue
+                    entry = index.setdefault(key, dict())
+                    if member in entry:
+                        n_stale += 1
+                    entry[member] = info
+            self._index   = index
+            self._n_stale = n_stale
+
+    def keys(self) -> list[str]:
+        return list(self.index.keys())
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __repr__(self) -> str:
+        return f"ExperimentStore(\"{self.path.name}\", {len(self.index)} outputs)"
+
+    def _rollback(self):
+        """Restores the central directory saved by an append which did not complete (see _append)."""
+        journal = self.journal_path.read_bytes()
+        start   = int.from_bytes(journal[:8], "little")
+        with open(self.path, "r+b") as file:
+            file.seek(start)
+            file.write(journal[8:])
+            file.truncate()
+            file.flush()
+            os.fsync(file.fileno())
+        self.journal_path.unlink()
+        self.events.warning("store", f">> store: rolled back an interrupted write of \"{self.path.name}\"", path=str(self.path))
+
+    def _rescan(self):
+        """load_index with the lock file held: a journal left then is the one of a writer which died."""
+        if self.journal_path.exists():
+            self._rollback()
+        self._scan()
+
+    def _temporary(self) -> Path:
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.", suffix=".tmp")
+        os.close(fd)
+        return Path(tmp_path)
+
+    def _append(self, write: Callable[[zipfile.ZipFile], None]):
+        """Calls write on the store opened for appending. The new members overwrite the central directory, which is saved to the
+        journal before (with its offset) and removed once the new one is on disk. A new store is written to a temporary file."""
+        with self.lock, file_lock(self.lock_path):
+            self._rescan() # written by other processes since; a corrupt store is not overwritten
+            self.close()
+            if not self.path.exists():
+                tmp_path = self._temporary()
+                try:
+                    with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED, compresslevel=self.compresslevel) as archive:
+                        write(archive)
+                    os.replace(tmp_path, self.path)
+                except BaseException as _:
+                    tmp_path.unlink(missing_ok=True)
+                    raise
+            else:
+                with zipfile.ZipFile(self.path, "r") as archive:
+                    start = archive.start_dir
+                with open(self.path, "rb") as file:
+                    file.seek(start)
+                    tail = file.read()
+                tmp_path = self._temporary()
+                fsync_write(tmp_path, start.to_bytes(8, "little") + tail)
+                os.replace(tmp_path, self.journal_path)
+                try:
+                    with warnings.catch_warnings(), zipfile.ZipFile(self.path, "a", zipfile.ZIP_DEFLATED, compresslevel=self.compresslevel) as archive:
+                        warnings.simplefilter("ignore", UserWarning) # "Duplicate name": the newest member shadows the old one
+                        write(archive)
+                    with open(self.path, "rb+") as file:
+                        os.fsync(file.fileno())
+                except BaseException as _:
+                    self._rollback()
+                    raise
+                self.journal_path.unlink()
+            self._scan()
+
+    def close(self):
+        with self.lock:
+            if self.reader is not None:
+                self.reader.close()
+                self.reader = None
+
+    def _read(self, info: zipfile.ZipInfo) -> bytes:
+        with self.lock:
+            if self.reader is None:
+                self.reader = zipfile.ZipFile(self.path, "r")
+            return self.reader.read(info)
+
+    def get_meta(self, key: str) -> dict[str, Any]:
+        return json.loads(self._read(self.index[key][META_MEMBER]))
+
+    def is_current(self, key: str, out_type: type, out_path: Path) -> bool:
+        """True if the stored output was parsed by the same output class from the current version of out_path."""
+        if key not in self.index:
+            return False
+        meta = self.get_meta(key)
+        if meta["out_type"] != out_type_identity(out_type):
+            return False
+        if not out_path.exists():
+            return True
+        stat = out_path.stat()
+        return meta["size"] == stat.st_size and meta["mtime_ns"] == stat.st_mtime_ns
+
+    def put(self, outputs: list[tuple[ExperimentOutput, str|None]], parameters: dict[str, Any]|None = None) -> int:
+        """Appends outputs (with the content of their parameter file, if any) in one pass, and the parameters of the experiment if given
+        (see put_parameters). Outputs which cannot be stored (memory-mapped or non-numeric attributes) are skipped. Returns the number of outputs stored."""
+        entries = []
+        for output, parameter_text in outputs:
+            data = output_arrays(output)
+            if data is None:
+                self.events.warning("store", f">> store: cannot store \"{output.file.name}\" (memory-mapped or non-numeric attributes)", file=output.file.name)
+                continue
+            arrays, scalars = data
+            stat = output.file.stat()
+            meta = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "out_type": out_type_identity(type(output)), "scalars": scalars}
+            entries.append((output.file.name, arrays, meta, parameter_text))
+        if len(entries) == 0 and parameters is None:
+            return 0
+
+        def write(archive: zipfile.ZipFile):
+            for key, arrays, meta, parameter_text in entries:
+                for name, array in arrays.items():
+                    with archive.open(f"{key}/{name}.npy", "w", force_zip64=True) as member:
+                        np.lib.format.write_array(member, array, allow_pickle=False)
+                archive.writestr(f"{key}/{META_MEMBER}", json.dumps(meta))
+                if parameter_text is not None:
+                    archive.writestr(f"{key}/{PARAM_MEMBER}", parameter_text)
+            if parameters is not None:
+                archive.writestr(PARAMETERS_FILE, json.dumps(to_json(parameters)))
+        self._append(write)
+        return len(entries)
+
+    def get(self, key: str, out_type: type[ExperimentOutput], out_path: Path) -> ExperimentOutput:
+        if key not in self.index:
+            raise KeyError(f"ExperimentStore error: no output \"{key}\"")
+        meta   = self.get_meta(key)
+        arrays = dict()
+        for member, info in self.index[key].items():
+            if member.endswith(".npy"):
+                arrays[member.removesuffix(".npy")] = np.lib.format.read_array(io.BytesIO(self._read(info)), allow_pickle=False)
+        return restore_output(out_type, out_path, arrays, meta["scalars"])
+
+    def get_parameter_text(self, key: str) -> str|None:
+        info = self.index.get(key, dict()).get(PARAM_MEMBER)
+        return None if info is None else self._read(info).decode()
+
+    def put_parameters(self, parameters: dict[str, Any]):
+        """Stores the parameters of the whole experiment as "parameters.json" (arrays as lists)."""
+        self._append(lambda archive: archive.writestr(PARAMETERS_FILE, json.dumps(to_json(parameters))))
+
+    def get_parameters(self) -> dict[str, Any]|None:
+        with self.lock:
+            if len(self.index) == 0 and not self.path.exists():
+                return None
+            with file_lock(self.lock_path), zipfile.ZipFile(self.path, "r") as archive:
+                infos = [info for info in archive.infolist() if info.filename == PARAMETERS_FILE]
+                return json.loads(archive.read(infos[-1])) if len(infos) > 0 else None
+
+    def compact(self) -> int:
+        """Rewrites the store without the shadowed members, returns their number."""
+        with self.lock:
+            if self.n_stale == 0 or not self.path.exists():
+                return 0
+        with self.lock, file_lock(self.lock_path):
+            self._rescan()
+            self.close()
+            n_stale   = self.n_stale
+            tmp_path  = self._temporary()
+            try:
+                self._copy_latest(tmp_path)
+                os.replace(tmp_path, self.path)
+            except BaseException as _:
+                tmp_path.unlink(missing_ok=True)
+                raise
+            self._scan()
+            return n_stale
+
+    def _copy_latest(self, tmp_path: Path):
+        with zipfile.ZipFile(self.path, "r") as source, zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED, compresslevel=self.compresslevel) as target:
+            latest = {info.filename: info for info in source.infolist()}
+            for name, info in latest.items():
+                with source.open(info) as src, target.open(info, "w", force_zip64=True) as dst:
+                    while chunk := src.read(1 << 20):
+                        dst.write(chunk)
+
+    def stats(self) -> dict[str, int]:
+        size = self.path.stat().st_size if self.path.exists() else 0
+        return {"outputs": len(self.index), "stale_members": self.n_stale, "bytes": size}
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,282 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+import json
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import time
+
+JOB_QUEUE_FILE = "jobs.sqlite"
+
+PENDING   = "pending"
+RUNNING   = "running"
+DONE      = "done"
+FAILED    = "failed"
+CANCELLED = "cancelled"
+JOB_STATES = [PENDING, RUNNING, DONE, FAILED, CANCELLED]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    key          TEXT PRIMARY KEY,
+    priority     INTEGER NOT NULL,
+    command      TEXT NOT NULL,
+    cwd          TEXT NOT NULL,
+    env          TEXT,
+    log_path     TEXT NOT NULL,
+    cache_key    TEXT,
+    synced       INTEGER NOT NULL DEFAULT 0,
+    status       TEXT NOT NULL,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    worker_pid   INTEGER,
+    worker_start TEXT,
+    pid          INTEGER,
+    pid_start    TEXT,
+    exit_code    INTEGER,
+    submitted    REAL,
+    started      REAL,
+    finished     REAL
+);
+CREATE TABLE IF NOT EXISTS workers (
+    pid       INTEGER PRIMARY KEY,
+    started   REAL,
+    pid_start TEXT
+);
+"""
+ADDED_COLUMNS = {"jobs": ["worker_start TEXT", "pid_start TEXT"], "workers": ["pid_start TEXT"]}
+
+def is_alive(pid: int|None) -> bool:
+    if pid is None:
+        return False
+    if os.name == "nt":
+        result = subprocess.run(["tasklist", "/FI", f"PID eq {pid}", "/NH"], capture_output=True, text=True)
+        return str(pid) in result.stdout
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError as _:
+        return False
+    except PermissionError as _:
+        return True
+    return True
+
+def process_start(pid: int|None) -> str|None:
+    """Start time of a process (in clock ticks since boot on Linux, from ps elsewhere), to tell it from a later process
+    which reuses its pid. None if unknown."""
+    if pid is None or os.name == "nt":
+        return None
+    try:
+        stat = Path(f"/proc/{pid}/stat").read_text()
+        return stat.rpartition(")")[2].split()[19] # field 22: starttime
+    except (OSError, IndexError) as _:
+        pass
+    try:
+        result = subprocess.run(["ps", "-o", "lstart=", "-p", str(pid)], capture_output=True, text=True)
+    except OSError as _:
+        return None
+    return result.stdout.strip() or None
+
+def is_same_process(pid: int|None, start: str|None) -> bool:
+    """True if pid is alive and was started at start (only the pid is checked if start is None)."""
+    if not is_alive(pid):
+        return False
+    return start is None or process_start(pid) in [start, None]
+
+def terminate(pid: int|None, start: str|None) -> bool:
+    """Sends SIGTERM to pid if it is still the process started at start. Returns False if it is gone."""
+    if not is_same_process(pid, start):
+        return False
+    try:
+        os.kill(pid, signal.SIGTERM) # type: ignore
+    except ProcessLookupError as _:
+        return False
+    return True
+
+class JobQueue:
+    """Persistent job table (SQLite, in the experiment directory) processed by detached worker processes,
+    so that running jobs survive the notebook kernel and can be resumed after a crash."""
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self.workers: list[subprocess.Popen] = []
+        with self.connect() as connection:
+            connection.executescript(SCHEMA)
+            for table, columns in ADDED_COLUMNS.items(): # databases of older versions
+                existing = {row["name"] for row in connection.execute(f"PRAGMA table_info({table})")}
+                for column in columns:
+                    if column.split()[0] not in existing:
+                        connection.execute(f"ALTER TABLE {table} ADD COLUMN {column}")
+
+    @contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            yield connection
+        finally:
+            connection.close()
+
+    def submit(self, jobs: list[dict[str, Any]]):
+        """Enqueues jobs (key, command, cwd, env, log_path, cache_key), in priority order.
+        A job already done is replaced only if it is given again."""
+        now = time.time()
+        with self.connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            for priority, job in enumerate(jobs):
+                connection.execute("""
+                    INSERT INTO jobs (key, priority, command, cwd, env, log_path, cache_key, status, submitted)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET priority=excluded.priority, command=excluded.command, cwd=excluded.cwd,
+                        env=excluded.env, log_path=excluded.log_path, cache_key=excluded.cache_key, status=excluded.status,
+                        submitted=excluded.submitted, synced=0, exit_code=NULL, pid=NULL, pid_start=NULL, worker_pid=NULL, worker_start=NULL,
+                        started=NULL, finished=NULL
+                    WHERE jobs.status != 'running'
+                    """, (job["key"], priority, json.dumps(job["command"]), str(job["cwd"]), json.dumps(job["env"]),
+                          str(job["log_path"]), job["cache_key"], PENDING, now))
+            connection.execute("COMMIT")
+
+    def recover(self) -> int:
+        """Puts the jobs of dead workers back to pending, returns their number. The simulation of a dead worker may still run
+        (it is not in the worker's process group): it is terminated, and its job is put back to pending once it has exited,
+        so that two processes never write the same output."""
+        with self.connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            rows = connection.execute("SELECT * FROM jobs WHERE status = ?", (RUNNING,)).fetchall()
+            lost = [row for row in rows if not is_same_process(row["worker_pid"], row["worker_start"])]
+            orphans = [row for row in lost if is_same_process(row["pid"], row["pid_start"])]
+            for row in lost:
+                if row not in orphans:
+                    connection.execute("UPDATE jobs SET status = ?, pid = NULL, pid_start = NULL, worker_pid = NULL, worker_start = NULL WHERE key = ?",
+                                       (PENDING, row["key"]))
+            for row in connection.execute("SELECT pid, pid_start FROM workers").fetchall():
+                if not is_same_process(row["pid"], row["pid_start"]):
+                    connection.execute("DELETE FROM workers WHERE pid = ?", (row["pid"],))
+            connection.execute("COMMIT")
+        for row in orphans:
+            terminate(row["pid"], row["pid_start"])
+        return len(lost) - len(orphans)
+
+    def requeue(self, states: list[str]) -> int:
+        with self.connect() as connection:
+            placeholders = ",".join("?"*len(states))
+            cursor = connection.execute(f"UPDATE jobs SET status = ?, exit_code = NULL WHERE status IN ({placeholders})", (PENDING, *states))
+            return cursor.rowcount
+
+    def claim_next(self, worker_pid: int, worker_start: str|None = None) -> sqlite3.Row|None:
+        with self.connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            job = connection.execute("SELECT * FROM jobs WHERE status = ? ORDER BY priority LIMIT 1", (PENDING,)).fetchone()
+            if job is not None:
+                connection.execute("UPDATE jobs SET status = ?, worker_pid = ?, worker_start = ?, started = ?, attempts = attempts + 1 WHERE key = ?",
+                                   (RUNNING, worker_pid, worker_start, time.time(), job["key"]))
+            connection.execute("COMMIT")
+        return job
+
+    def set_pid(self, key: str, pid: int, pid_start: str|None = None) -> bool:
+        """Returns False if the job was cancelled since it was claimed: the process must then be terminated."""
+        with self.connect() as connection:
+            cursor = connection.execute("UPDATE jobs SET pid = ?, pid_start = ? WHERE key = ? AND status = ?", (pid, pid_start, key, RUNNING))
+            return cursor.rowcount > 0
+
+    def finish(self, key: str, exit_code: int):
+        status = DONE if exit_code == 0 else FAILED
+        with self.connect() as connection:
+            connection.execute("UPDATE jobs SET status = CASE WHEN status = ? THEN ? ELSE status END, exit_code = ?, finished = ? WHERE key = ?",
+                               (RUNNING, status, exit_code, time.time(), key))
+
+    def cancel(self, keys: list[str]|None = None) -> int:
+        """Cancels pending jobs and terminates running ones (all jobs if keys is None). A job claimed by a worker which did not
+        start its process yet is terminated by the worker (see set_pid)."""
+        with self.connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            rows = connection.execute("SELECT key, status, pid, pid_start FROM jobs WHERE status IN (?, ?)", (PENDING, RUNNING)).fetchall()
+            rows = [row for row in rows if keys is None or row["key"] in keys]
+            for row in rows:
+                connection.execute("UPDATE jobs SET status = ? WHERE key = ?", (CANCELLED, row["key"]))
+            connection.execute("COMMIT")
+        for row in rows:
+            if row["status"] == RUNNING:
+                terminate(row["pid"], row["pid_start"])
+        return len(rows)
+
+    def get_unsynced(self) -> list[sqlite3.Row]:
+        """Finished jobs not yet recorded in the experiment's run cache."""
+        with self.connect() as connection:
+            return connection.execute("SELECT * FROM jobs WHERE status = ? AND synced = 0", (DONE,)).fetchall()
+
+    def mark_synced(self, keys: list[str]):
+        with self.connect() as connection:
+            connection.executemany("UPDATE jobs SET synced = 1 WHERE key = ?", [(key,) for key in keys])
+
+    def get_jobs(self) -> list[sqlite3.Row]:
+        with self.connect() as connection:
+            return connection.execute("SELECT * FROM jobs ORDER BY priority").fetchall()
+
+    def count(self) -> dict[str, int]:
+        counts = {state: 0 for state in JOB_STATES}
+        with self.connect() as connection:
+            for row in connection.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"):
+                counts[row["status"]] = row["n"]
+        return counts
+
+    def alive_workers(self) -> int:
+        """Workers registered in the database, plus the ones just started by this process which may not be registered yet."""
+        self.workers = [worker for worker in self.workers if worker.poll() is None]
+        with self.connect() as connection:
+            rows = connection.execute("SELECT pid, pid_start FROM workers").fetchall()
+        alive = {row["pid"] for row in rows if is_same_process(row["pid"], row["pid_start"])}
+        return len(alive | {worker.pid for worker in self.workers})
+
+    def start_workers(self, max_workers: int) -> int:
+        """Starts detached workers until max_workers are alive (at most one per pending job)."""
+        pending = self.count()[PENDING]
+        n_new   = min(max_workers - self.alive_workers(), pending)
+
+        env    = os.environ.copy()
+        src    = str(Path(__file__).resolve().parent.parent)
+        env["PYTHONPATH"] = os.pathsep.join([src, env["PYTHONPATH"]]) if env.get("PYTHONPATH") else src
+        kwargs: dict[str, Any] = dict()
+        if os.name == "nt":
+            kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            kwargs["start_new_session"] = True
+
+        for _ in range(max(0, n_new)):
+            worker = subprocess.Popen([sys.executable, "-m", "physsm.job_queue", str(self.db_path)], stdin=subprocess.DEVNULL,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env, close_fds=True, **kwargs)
+            self.workers.append(worker)
+        return max(0, n_new)
+
+    def register_worker(self, pid: int, pid_start: str|None = None):
+        with self.connect() as connection:
+            connection.execute("INSERT OR REPLACE INTO workers (pid, started, pid_start) VALUES (?, ?, ?)", (pid, time.time(), pid_start))
+
+    def unregister_worker(self, pid: int):
+        with self.connect() as connection:
+            connection.execute("DELETE FROM workers WHERE pid = ?", (pid,))
+
+def run_worker(db_path: Path):
+    """Worker loop: claims the pending job with the highest priority until none is left."""
+    queue = JobQueue(db_path)
+    pid   = os.getpid()
+    start = process_start(pid)
+    queue.register_worker(pid, start)
+    try:
+        while (job := queue.claim_next(pid, start)) is not None:
+            env = json.loads(job["env"]) if job["env"] is not None else None
+            try:
+                with open(job["log_path"], "wb") as log_file:
+                    process = subprocess.Popen(json.loads(job["command"]), cwd=job["cwd"], env=env, stdout=log_file, stderr=subprocess.STDOUT)
+                    if not queue.set_pid(job["key"], process.pid, process_start(process.pid)):
+                        process.terminate()
+                    exit_code = process.wait()
+            except OSError as _:
+                exit_code = -1
+            queue.finish(job["key"], exit_code)
+    finally:
+        queue.unregister_worker(pid)
+
+if __name__ == "__main__":
+    run_worker(Path(sys.argv[1]))
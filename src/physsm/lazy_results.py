@@ -0,0 +1,55 @@
+from __future__ import annotations
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Callable, Generic, Iterator, TypeVar
+
+from .experiment_output import ExperimentOutput
+
+OutType = TypeVar("OutType", bound = ExperimentOutput)
+
+def load_output(out_type: type[OutType], out_path: Path) -> OutType:
+    output = out_type(out_path)
+    output.grab_files()
+    return output
+
+class LazyResults(Mapping, Generic[OutType]):
+    """Read-only mapping scale variable -> output, which parses an output on first access and keeps it."""
+    def __init__(self, scale_variables: list, loader: Callable[[Any], OutType]):
+        self.scale_variables        = list(scale_variables)
+        self.scale_set              = set(self.scale_variables)
+        self.loader                 = loader
+        self.loaded: dict[Any, OutType] = dict()
+
+    def __getitem__(self, L) -> OutType:
+        if L not in self.loaded:
+            if L not in self.scale_set:
+                raise KeyError(L)
+            self.loaded[L] = self.loader(L)
+        return self.loaded[L]
+
+    def __iter__(self) -> Iterator:
+        return iter(self.scale_variables)
+
+    def __len__(self) -> int:
+        return len(self.scale_variables)
+
+    def __contains__(self, L) -> bool:
+        return L in self.scale_set
+
+    def __repr__(self) -> str:
+        return f"LazyResults(scale_variables={self.scale_variables}, loaded={list(self.loaded.keys())})"
+
+    def is_loaded(self, L) -> bool:
+        return L in self.loaded
+
+    def set_loaded(self, L, output: OutType):
+        self.loaded[L] = output
+
+    def unload(self, L = None):
+        if L is None:
+            self.loaded.clear()
+        else:
+            self.loaded.pop(L, None)
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,223 @@
+from __future__ import annotations
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Any
+import importlib
+import io
+import json
+import sys
+import numpy as np
+
+from .experiment_data import BaseExperimentData, PathData, Parameters, PathTemplate
+from .path_logger import PathLogger
+from .scale_grid import ScaleGrid, GridParameter
+
+MANIFEST_FILE    = "manifest.json"
+MANIFEST_ARRAYS  = "manifest.npz"
+MANIFEST_VERSION = 1
+
+def import_path(obj: type) -> str:
+    """"module:qualname" of a class, for ex "physsm.cpp_builder:CppExperiment"."""
+    return f"{obj.__module__}:{obj.__qualname__}"
+
+def resolve_import_path(path: str) -> Any:
+    module_name, _, qualname = path.partition(":")
+    if "<locals>" in qualname:
+        raise ImportError(f"\"{path}\" is defined inside a function")
+    module = sys.modules.get(module_name)
+    if module is None:
+        module = importlib.import_module(module_name)
+    obj = module
+    for name in qualname.split("."):
+        obj = getattr(obj, name)
+    return obj
+
+class ManifestEncoder:
+    """Json values of the parameters: arrays are collected apart (saved as .npy members of "manifest.npz") and replaced by
+    {"__array__": key}, tuples, dicts with non-string keys & paths are tagged so that they come back with their type."""
+    def __init__(self):
+        self.arrays: dict[str, np.ndarray] = dict()
+
+    def encode(self, value, name: str) -> Any:
+        if isinstance(value, np.ndarray):
+            key = f"a{len(self.arrays)}"
+            self.arrays[key] = value
+            return {"__array__": key}
+        if isinstance(value, np.generic):
+            return value.item()
+        if isinstance(value, (bool, int, float, str)) or value is None:
+            return value
+        if isinstance(value, tuple):
+            return {"__tuple__": [self.encode(v, name) for v in value]}
+        if isinstance(value, list):
+            return [self.encode(v, name) for v in value]
+        if isinstance(value, dict):
+            return {"__dict__": [[self.encode(k, name), self.encode(v, name)] for k, v in value.items()]}
+        if isinstance(value, Path):
+            return {"__path__": str(value)}
+        raise TypeError(f"cannot save \"{name}\" ({type(value).__name__})")
+
+def decode(value, arrays) -> Any:
+    if isinstance(value, list):
+        return [decode(v, arrays) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if "__array__" in value:
+        return arrays[value["__array__"]]
+    if "__tuple__" in value:
+        return tuple(decode(v, arrays) for v in value["__tuple__"])
+    if "__dict__" in value:
+        return {decode(k, arrays): decode(v, arrays) for k, v in value["__dict__"]}
+    if "__path__" in value:
+        return Path(value["__path__"])
+    return value
+
+def grid_parameter_values(grid_param: GridParameter, grid: ScaleGrid) -> dict:
+    """Values of a grid parameter on the current grid: a function is evaluated on its sub-grid."""
+    if not callable(grid_param.values):
+        return grid_param.values
+    sub_grid = ScaleGrid({axis: grid.axes[axis] for axis in grid_param.axes})
+    values   = dict()
+    for point in sub_grid:
+        key = point[0] if len(grid_param.axes) == 1 else point
+        values[key] = grid_param.value(sub_grid, point)
+    return values
+
+def encode_paths(paths: MutableMapping, target_dir: Path, encoder: ManifestEncoder) -> dict[str, Any]:
+    """Template & paths set to another name. Keys which cannot be saved (replicas) are skipped: get_replicas sets them again."""
+    if isinstance(paths, PathTemplate):
+        template = {"prefix": paths.prefix, "extension": paths.extension}
+        custom   = paths.custom
+    else:
+        template = {"prefix": None, "extension": None}
+        custom   = paths
+    entries = []
+    for key, path in custom.items():
+        try:
+            entries.append([encoder.encode(key, "path key"), str(path.relative_to(target_dir)) if path.is_relative_to(target_dir) else str(path)])
+        except TypeError as _:
+            continue
+    return {**template, "custom": entries}
+
+def decode_paths(data: dict[str, Any], target_dir: Path, parameters: Parameters, keys: list, arrays) -> MutableMapping:
+    paths: MutableMapping = dict()
+    if data["prefix"] is not None:
+        paths = PathTemplate(target_dir, data["prefix"], data["extension"], parameters.get_scale_suffix, keys)
+    for key, name in data["custom"]:
+        key = decode(key, arrays)
+        if isinstance(paths, PathTemplate):
+            paths.known[key]  = None
+            paths.custom[key] = target_dir.joinpath(name)
+        else:
+            paths[key] = target_dir.joinpath(name)
+    return paths
+
+def write_manifest(exp_data: BaseExperimentData, experiment_class: type, settings: dict[str, Any]) -> Path:
+    """Writes "manifest.json" (& "manifest.npz" for the arrays) in the experiment directory, returns the path of the manifest.
+    Raises TypeError if a parameter, the output class or the runner cannot be saved."""
+    paths_data = exp_data.paths_data
+    parameters = exp_data.parameters
+    target_dir = paths_data.target_dir
+    encoder    = ManifestEncoder()
+
+    grid = parameters.scale_grid
+    manifest: dict[str, Any] = {
+        "version":          MANIFEST_VERSION,
+        "experiment_class": import_path(experiment_class),
+        "proj_dir":         str(paths_data.proj_dir),
+        "verbose_log":      exp_data.is_verbose_log(),
+        "out_key":          exp_data.out_key,
+        "out_type":         None if exp_data.out_type is None else import_path(exp_data.out_type),
+        "parameters": {
+            "scale_variable_names": parameters.scale_variable_names,
+            "scale_grid":           None if grid is None else encoder.encode(grid.axes, "scale grid"),
+            "scale_variables":      encoder.encode(None if parameters.scale_variables is None or grid is not None else list(parameters.scale_variables), "scale variables"),
+            "static_params":        {key: encoder.encode(value, key) for key, value in parameters.static_params.items()},
+            "scaling_params":       {key: encoder.encode(value, key) for key, value in parameters.scaling_params.items()},
+            "grid_params":          {key: {"axes": grid_param.axes, "values": encoder.encode(grid_parameter_values(grid_param, grid), key)}
+                                     for key, grid_param in parameters.grid_params.items()} if grid is not None else dict(),
+        },
+        "paths": {
+            "param": encode_paths(paths_data.param_paths, target_dir, encoder),
+            "out":   encode_paths(paths_data.out_paths, target_dir, encoder),
+        },
+        "runner":   None,
+        "settings": settings,
+    }
+    if exp_data.runner is not None:
+        try:
+            config = exp_data.runner.config()
+        except NotImplementedError as _:
+            raise TypeError(f"cannot save the runner {type(exp_data.runner).__name__} (no config)")
+        manifest["runner"] = {"class": import_path(type(exp_data.runner)), "config": config, "settings": exp_data.runner.settings()}
+
+    arrays_path = target_dir.joinpath(MANIFEST_ARRAYS)
+    if len(encoder.arrays) > 0:
+        buffer = io.BytesIO()
+        np.savez(buffer, **encoder.arrays)
+        write_file(arrays_path, buffer.getvalue())
+    else:
+        arrays_path.unlink(missing_ok=True)
+    manifest_path = target_dir.joinpath(MANIFEST_FILE)
+    write_file(manifest_path, json.dumps(manifest, separators=(",", ":")).encode())
+    return manifest_path
+
+def write_file(path: Path, data: bytes):
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_bytes(data)
+    tmp_path.replace(path)
+
+def read_manifest(path: Path, out_type: type|None = None) -> tuple[BaseExperimentData, type, dict[str, Any]]:
+    """Experiment data, experiment class & settings saved in the manifest of the experiment directory path (or the manifest file itself).
+    The paths are made from the templates when accessed, nothing is printed nor checked on disk but the manifest."""
+    manifest_path = path if path.is_file() else path.joinpath(MANIFEST_FILE)
+    if not manifest_path.exists():
+        raise FileNotFoundError(f"no manifest \"{manifest_path}\"")
+    manifest = json.loads(manifest_path.read_text())
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"unknown manifest version {manifest.get('version')}")
+    target_dir  = manifest_path.parent
+    arrays_path = target_dir.joinpath(MANIFEST_ARRAYS)
+    arrays      = np.load(arrays_path, allow_pickle=False) if arrays_path.exists() else dict()
+    try:
+        saved      = manifest["parameters"]
+        parameters = Parameters()
+        parameters.scale_variable_names = saved["scale_variable_names"]
+        if saved["scale_grid"] is not None:
+            parameters.scale_grid      = ScaleGrid(decode(saved["scale_grid"], arrays))
+            parameters.scale_variables = parameters.scale_grid.points()
+        else:
+            parameters.scale_variables = decode(saved["scale_variables"], arrays)
+        parameters.static_params  = {key: decode(value, arrays) for key, value in saved["static_params"].items()}
+        parameters.scaling_params = {key: decode(value, arrays) for key, value in saved["scaling_params"].items()}
+        parameters.grid_params    = {key: GridParameter(value["axes"], decode(value["values"], arrays)) for key, value in saved["grid_params"].items()}
+
+        proj_dir   = Path(manifest["proj_dir"])
+        paths_data = PathData(PathLogger(proj_dir, manifest["verbose_log"]))
+        paths_data.set_proj_dir(proj_dir)
+        paths_data.target_dir  = target_dir
+        keys                   = list(parameters.scale_variables or [])
+        paths_data.param_paths = decode_paths(manifest["paths"]["param"], target_dir, parameters, keys, arrays)
+        paths_data.out_paths   = decode_paths(manifest["paths"]["out"], target_dir, parameters, keys, arrays)
+    finally:
+        if not isinstance(arrays, dict):
+            arrays.close()
+
+    exp_data            = BaseExperimentData(paths_data)
+    exp_data.parameters = parameters
+    exp_data.out_key    = manifest["out_key"]
+    if out_type is not None:
+        exp_data.out_type = out_type
+    elif manifest["out_type"] is not None:
+        try:
+            exp_data.out_type = resolve_import_path(manifest["out_type"])
+        except (ImportError, AttributeError) as e:
+            raise ImportError(f"cannot import the output class \"{manifest['out_type']}\" ({e}), pass it as out_type")
+    if manifest["runner"] is not None:
+        runner = resolve_import_path(manifest["runner"]["class"]).from_config(manifest["runner"]["config"])
+        runner.apply_settings(manifest["runner"]["settings"])
+        exp_data.runner = runner
+    return exp_data, resolve_import_path(manifest["experiment_class"]), manifest["settings"]
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,107 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any
+import ast
+import json
+import threading
+import numpy as np
+
+from .runnner import RunRecord, scale_key
+from .ensemble import Replica
+
+METRICS_FILE = "metrics.jsonl"
+
+NUMPY_SCALARS = {"np.float64": float, "np.float32": float, "np.int64": int, "np.int32": int}
+
+def _literal(node: ast.expr) -> Any:
+    if isinstance(node, ast.Tuple):
+        return tuple(_literal(element) for element in node.elts)
+    if isinstance(node, ast.Call) and len(node.args) == 1 and not node.keywords and ast.unparse(node.func) in NUMPY_SCALARS:
+        return NUMPY_SCALARS[ast.unparse(node.func)](_literal(node.args[0]))
+    if isinstance(node, ast.Call) and ast.unparse(node.func) == "Replica" and not node.args:
+        return Replica(**{keyword.arg: _literal(keyword.value) for keyword in node.keywords if keyword.arg is not None})
+    return ast.literal_eval(node)
+
+def parse_scale(text: str) -> Any:
+    """Scale variable back from its key (see scale_key): numbers, tuples (grid points), numpy scalars & replicas. Raises ValueError otherwise."""
+    try:
+        return _literal(ast.parse(text, mode="eval").body)
+    except (SyntaxError, TypeError, ValueError) as e:
+        raise ValueError(f"parse_scale() error: cannot parse \"{text}\"") from e
+
+def scale_size(L) -> float:
+    """Size used for runtime scaling: L itself, the product of the components of a grid point, or the scale of a replica."""
+    if hasattr(L, "scale") and hasattr(L, "seed"):
+        return scale_size(L.scale)
+    if isinstance(L, (tuple, list)):
+        return float(np.prod([float(x) for x in L]))
+    return float(L)
+
+class PowerLaw:
+    """Fit of wall_time = prefactor * size**exponent. Sizes which are not positive (for ex a grid point with an axis at 0.0)
+    are left out of the fit, and predicted as 0."""
+    def __init__(self, prefactor: float, exponent: float, n_points: int):
+        self.prefactor = prefactor
+        self.exponent  = exponent
+        self.n_points  = n_points
+
+    def __call__(self, L) -> float:
+        size = scale_size(L)
+        return self.prefactor*size**self.exponent if size > 0 else 0.0
+
+    def __repr__(self) -> str:
+        return f"PowerLaw(t = {self.prefactor:.3g} * L^{self.exponent:.3f}, from {self.n_points} runs)"
+
+def fit_power_law(records: list[RunRecord]) -> PowerLaw:
+    """Least squares fit of log(wall_time) against log(size), over the successful, non cached runs (runs whose scale is not numeric are skipped)."""
+    points = []
+    for record in records:
+        if not record.is_success() or record.cached or record.wall_time <= 0:
+            continue
+        try:
+            size = scale_size(record.scale)
+        except (TypeError, ValueError) as _:
+            continue
+        if size > 0:
+            points.append((size, record.wall_time))
+    if len({size for size, _ in points}) < 2:
+        raise ValueError("fit_power_law() error: need successful runs for at least two different scales")
+    sizes, times        = np.log(np.asarray(points)).T
+    exponent, intercept = np.polyfit(sizes, times, 1)
+    return PowerLaw(float(np.exp(intercept)), float(exponent), len(points))
+
+class MetricsLog:
+    """Append-only json lines file with one RunRecord per line, in the experiment directory."""
+    def __init__(self, target_dir: Path):
+        self.path = target_dir.joinpath(METRICS_FILE)
+        self.lock = threading.Lock()
+
+    def append(self, record: RunRecord):
+        data = record.to_dict()
+        data["scale"] = scale_key(record.scale)
+        with self.lock, self.path.open("a") as file:
+            file.write(json.dumps(data) + "\n")
+
+    def load(self, scales: dict[str, Any]|None = None) -> list[RunRecord]:
+        """Reads the records back; scales maps scale_key(L) to L, the other scales are parsed back (see parse_scale) or keep their repr."""
+        if not self.path.exists():
+            return []
+        records = []
+        with self.path.open("r") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                text = data["scale"]
+                if scales is not None and text in scales:
+                    data["scale"] = scales[text]
+                else:
+                    try:
+                        data["scale"] = parse_scale(text)
+                    except ValueError as _:
+                        pass
+                records.append(RunRecord.from_dict(data))
+        return records
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,109 @@
+from __future__ import annotations
+from collections import deque
+from pathlib import Path
+from typing import IO, Callable
+import subprocess
+import sys
+
+class OutputSink:
+    """Destination of the output of a run (stdout & stderr merged).
+
+    A sink with a file descriptor (see fileno) receives the output of the child directly, without Python in the loop.
+    Otherwise the runner reads the output in chunks and passes the decoded text to write().
+    """
+    def open(self):
+        pass
+
+    def fileno(self) -> int|None:
+        return None
+
+    def write(self, text: str):
+        pass
+
+    def close(self):
+        pass
+
+    def output_bytes(self) -> int|None:
+        """Size of the output for the sinks written directly by the child, None if unknown."""
+        return None
+
+class LineSink(OutputSink):
+    """Sink receiving complete lines (without "\\n"), a trailing partial line being kept until the next write or close."""
+    def __init__(self):
+        self.pending = ""
+
+    def write(self, text: str):
+        complete, sep, self.pending = (self.pending + text).rpartition("\n")
+        if sep:
+            self.write_lines([line.removesuffix("\r") for line in complete.split("\n")])
+
+    def close(self):
+        if self.pending:
+            self.write_lines([self.pending.removesuffix("\r")])
+            self.pending = ""
+
+    def write_lines(self, lines: list[str]):
+        raise NotImplementedError()
+
+class StdoutSink(LineSink):
+    """Forwards the lines to sys.stdout with the language prefix, one write per chunk (the default)."""
+    def __init__(self, prefix: str = ""):
+        super().__init__()
+        self.prefix = prefix
+
+    def write_lines(self, lines: list[str]):
+        sys.stdout.write("".join([f"{self.prefix} {line}\n" for line in lines]))
+
+class DiscardSink(OutputSink):
+    """Sends the output to the null device."""
+    def fileno(self) -> int|None:
+        return subprocess.DEVNULL
+
+class FileSink(OutputSink):
+    """Writes the output to a file, directly from the child."""
+    def __init__(self, path: Path):
+        self.path = path
+        self.file: IO[bytes]|None = None
+
+    def open(self):
+        self.file = self.path.open("wb")
+
+    def fileno(self) -> int|None:
+        return None if self.file is None else self.file.fileno()
+
+    def write(self, text: str):
+        if self.file is not None:
+            self.file.write(text.encode())
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def output_bytes(self) -> int|None:
+        return self.path.stat().st_size if self.path.exists() else None
+
+class RingBufferSink(LineSink):
+    """Keeps only the last max_lines lines, for ex to inspect the end of the output of a failed run."""
+    def __init__(self, max_lines: int = 100):
+        super().__init__()
+        self.lines: deque[str] = deque(maxlen=max_lines)
+
+    def write_lines(self, lines: list[str]):
+        self.lines.extend(lines)
+
+    def __str__(self) -> str:
+        return "\n".join(self.lines)
+
+class CallbackSink(LineSink):
+    """Calls callback(line) for every line."""
+    def __init__(self, callback: Callable[[str], None]):
+        super().__init__()
+        self.callback = callback
+
+    def write_lines(self, lines: list[str]):
+        for line in lines:
+            self.callback(line)
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,119 @@
+from __future__ import annotations
+from typing import Any
+import threading
+import time
+
+from .events import EventLog, format_count, format_duration
+from .metrics import PowerLaw, fit_power_law
+from .runnner import RunRecord
+
+BAR_WIDTH = 20
+
+class ProgressView:
+    """Progress of a sweep: completed & running jobs, points per hour and ETA, emitted as "progress" events every interval seconds.
+
+    The ETA sums the runtime predicted by model (the runtime scaling fitted on the previous runs, see fit_runtime_scaling) for the pending jobs
+    and what is left of the running ones, divided by the number of workers. The predictions are rescaled by the ratio measured/predicted
+    of the jobs completed in the sweep. Without model, a power law is fitted on the completed jobs as soon as they cover two scales,
+    the mean runtime is used until then.
+    """
+    def __init__(self, events: EventLog, scale_variables: list, workers: int, model: PowerLaw|None = None, live = True):
+        self.events   = events
+        self.total    = len(scale_variables)
+        self.workers  = max(1, workers)
+        self.model    = model
+        self.live     = live
+        self.pending: dict[Any, None]    = dict.fromkeys(scale_variables)
+        self.running: dict[Any, float]   = dict()
+        self.records: list[RunRecord]    = []
+        self.n_failed = 0
+        self.start    = time.monotonic()
+        self.lock     = threading.Lock()
+        self.fitted: PowerLaw|None = None
+        self.n_fitted = 0
+        self.n_initial: int|None = None
+        self.last_update: float|None = None
+
+    def started(self, L):
+        with self.lock:
+            self.pending.pop(L, None)
+            self.running[L] = time.monotonic()
+
+    def finished(self, record: RunRecord):
+        with self.lock:
+            self.pending.pop(record.scale, None)
+            self.running.pop(record.scale, None)
+            self.records.append(record)
+            self.n_failed += not record.is_success()
+
+    def sync(self, pending: list, running: dict[Any, float|None], finished: list[RunRecord]):
+        """State read from a queue (job queue, Slurm): running maps the running jobs to their elapsed time (None if unknown).
+        The jobs finished before the first call do not count in the points per hour."""
+        with self.lock:
+            now           = time.monotonic()
+            self.pending  = dict.fromkeys(pending)
+            self.running  = {L: self.running.get(L, now) if elapsed is None else now - elapsed for L, elapsed in running.items()}
+            if self.n_initial is None:
+                self.n_initial = len(finished)
+            self.records  = list(finished)
+            self.n_failed = sum(not record.is_success() for record in finished)
+
+    def current_model(self, measured: list[RunRecord]) -> PowerLaw|None:
+        if self.model is not None:
+            return self.model
+        if len(measured) != self.n_fitted:
+            self.n_fitted = len(measured)
+            try:
+                self.fitted = fit_power_law(measured)
+            except ValueError as _:
+                self.fitted = None
+        return self.fitted
+
+    def eta(self) -> float|None:
+        now      = time.monotonic()
+        measured = [record for record in self.records if record.is_success() and not record.cached and record.wall_time > 0]
+        model    = self.current_model(measured)
+        if model is not None:
+            predicted = sum(model(record.scale) for record in measured)
+            factor    = sum(record.wall_time for record in measured)/predicted if predicted > 0 else 1.0
+            estimate  = lambda L: factor*model(L)
+        elif len(measured) > 0:
+            mean      = sum(record.wall_time for record in measured)/len(measured)
+            estimate  = lambda L: mean
+        else:
+            return None
+        remaining = sum(estimate(L) for L in self.pending) + sum(max(estimate(L) - (now - start), 0.0) for L, start in self.running.items())
+        return remaining/max(1, min(self.workers, len(self.pending) + len(self.running)))
+
+    def points_per_hour(self) -> float:
+        elapsed = time.monotonic() - self.start
+        return 3600*(len(self.records) - (self.n_initial or 0))/elapsed if elapsed > 0 else 0.0
+
+    def render(self) -> tuple[str, dict[str, Any]]:
+        with self.lock:
+            done  = len(self.records)
+            eta   = self.eta()
+            rate  = self.points_per_hour()
+            data  = {"done": done, "failed": self.n_failed, "running": len(self.running), "pending": len(self.pending), "total": self.total,
+                     "points_per_hour": rate, "eta": eta, "elapsed": time.monotonic() - self.start}
+        filled = round(BAR_WIDTH*done/self.total) if self.total > 0 else BAR_WIDTH
+        failed = f" ({format_count(self.n_failed)} failed)" if self.n_failed > 0 else ""
+        text   = (f"[{'#'*filled}{'.'*(BAR_WIDTH - filled)}] {format_count(done)}/{format_count(self.total)} done{failed}, "
+                  f"{format_count(data['running'])} running, {rate:.1f} points/h, ETA {format_duration(eta)}")
+        return text, data
+
+    def update(self, interval: float|None = None):
+        """Emits the progress, unless it was emitted less than interval seconds ago."""
+        now = time.monotonic()
+        if interval is not None and self.last_update is not None and now - self.last_update < interval:
+            return
+        self.last_update = now
+        text, data = self.render()
+        self.events.emit("info", "progress", text, live=self.live, **data)
+
+    def close(self):
+        self.update()
+        self.events.end_live()
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,119 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any
+import hashlib
+import json
+import numpy as np
+
+from .experiment_output import ExperimentOutput
+from .events import EventLog
+
+RESULT_CACHE_DIR = "result_cache"
+META_KEY         = "__physsm_meta__"
+
+def out_type_identity(out_type: type) -> str:
+    """Name of the output class plus a hash of its methods & class attributes,
+    so that editing parse_output in a notebook invalidates the cache."""
+    digest = hashlib.sha256()
+    for cls in out_type.__mro__:
+        if cls is object:
+            continue
+        digest.update(cls.__qualname__.encode())
+        for name, value in sorted(vars(cls).items()):
+            code = getattr(value, "__code__", None)
+            if code is not None:
+                digest.update(name.encode())
+                digest.update(code.co_code)
+                digest.update(repr(code.co_consts).encode())
+            elif not name.startswith("__"):
+                digest.update(f"{name}={value!r}".encode())
+    return f"{out_type.__module__}.{out_type.__qualname__}:{digest.hexdigest()[:16]}"
+
+def output_arrays(output: ExperimentOutput) -> tuple[dict[str, np.ndarray], list[str]]|None:
+    """Parsed attributes of output as arrays, plus the names of the ones which were scalars.
+    None if an attribute is memory-mapped or not numeric."""
+    arrays: dict[str, np.ndarray] = dict()
+    scalars: list[str]            = []
+    for name, value in output.get_data().items():
+        if isinstance(value, np.memmap):
+            return None
+        if not isinstance(value, np.ndarray):
+            scalars.append(name)
+        value = np.asarray(value)
+        if value.dtype == object:
+            return None
+        arrays[name] = value
+    return arrays, scalars
+
+def restore_output(out_type: type[ExperimentOutput], out_path: Path, arrays: dict[str, np.ndarray], scalars: list[str]) -> ExperimentOutput:
+    output = out_type(out_path)
+    for name, value in arrays.items():
+        setattr(output, name, value.item() if name in scalars else value)
+    return output
+
+class ResultCache:
+    """Stores the parsed arrays of each output as ".npz" in "<target_dir>/result_cache",
+    valid as long as the output file size, mtime & the output class are unchanged."""
+    def __init__(self, target_dir: Path, events: EventLog|None = None):
+        self.cache_dir = target_dir.joinpath(RESULT_CACHE_DIR)
+        self.events    = EventLog() if events is None else events
+        self.hits      = 0
+        self.misses    = 0
+
+    def get_cache_path(self, out_path: Path) -> Path:
+        return self.cache_dir.joinpath(f"{out_path.name}.npz")
+
+    @staticmethod
+    def make_meta(out_type: type, out_path: Path) -> dict[str, Any]:
+        stat = out_path.stat()
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "out_type": out_type_identity(out_type)}
+
+    def load(self, out_type: type[ExperimentOutput], out_path: Path) -> ExperimentOutput|None:
+        cache_path = self.get_cache_path(out_path)
+        if not cache_path.exists() or not out_path.exists():
+            self.misses += 1
+            return None
+
+        try:
+            with np.load(cache_path) as data:
+                meta = json.loads(str(data[META_KEY]))
+                if {k: meta.get(k) for k in ("size", "mtime_ns", "out_type")} != self.make_meta(out_type, out_path):
+                    self.misses += 1
+                    return None
+                arrays = {name: data[name] for name in data.files if name != META_KEY}
+                output = restore_output(out_type, out_path, arrays, meta["scalars"])
+        except Exception as e:
+            self.events.warning("result_cache", f">> result cache: cannot read \"{cache_path.name}\" ({e})", file=cache_path.name)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return output
+
+    def store(self, output: ExperimentOutput) -> bool:
+        """Returns False when the output cannot be cached (memory-mapped or non-numeric attributes)."""
+        data = output_arrays(output)
+        if data is None:
+            return False
+        arrays, scalars = data
+
+        meta = self.make_meta(type(output), output.file)
+        meta["scalars"] = scalars
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        np.savez(self.get_cache_path(output.file), **arrays, **{META_KEY: np.asarray(json.dumps(meta))})
+        return True
+
+    def clear(self):
+        if not self.cache_dir.exists():
+            return
+        for cache_file in self.cache_dir.glob("*.npz"):
+            cache_file.unlink()
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def reset_stats(self):
+        self.hits   = 0
+        self.misses = 0
+
+if __name__ == "__main__":
+    pass
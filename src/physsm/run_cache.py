@@ -0,0 +1,104 @@
+from __future__ import annotations
+from pathlib import Path
+import hashlib
+import json
+import os
+import threading
+import time
+
+from .runnner import IRunner, THREAD_ENV_VARS, scale_key, write_atomic
+from .events import EventLog
+
+RUN_CACHE_FILE    = "run_cache.json"
+SAVE_INTERVAL     = 5.0
+
+def env_fingerprint(env_var: dict|None) -> str:
+    """Hashes the environment the child receives (env_var, or the current environment when None): the thread counts
+    (THREAD_ENV_VARS) are always hashed, the other variables only when env_var sets them to a value which differs from the
+    current environment, so that unrelated session variables do not invalidate the cache."""
+    effective = os.environ if env_var is None else env_var
+    hashed    = {k: v for k, v in effective.items() if os.environ.get(k) != v} if env_var is not None else dict()
+    hashed.update({k: effective.get(k) for k in THREAD_ENV_VARS})
+    return json.dumps(sorted(hashed.items()))
+
+class RunCache:
+    """Cache key of the last successful run of every scale variable (see scale_key), in "run_cache.json".
+
+    The file is written atomically, at most every SAVE_INTERVAL seconds while runs complete and by flush() at the end of a sweep:
+    after a crash, only the runs of the last seconds are run again."""
+    def __init__(self, target_dir: Path, events: EventLog|None = None):
+        self.manifest_path = target_dir.joinpath(RUN_CACHE_FILE)
+        self.events        = EventLog() if events is None else events
+        self.entries: dict[str, str] = dict()
+        self.hits   = 0
+        self.misses = 0
+        self.lock   = threading.Lock()
+        self.dirty  = False
+        self.last_save = time.monotonic()
+        self.load()
+
+    def load(self):
+        if self.manifest_path.exists():
+            try:
+                self.entries = json.loads(self.manifest_path.read_text())
+            except json.JSONDecodeError as _:
+                self.events.warning("run_cache", f">> Corrupted run cache \"{self.manifest_path.name}\", starting from scratch")
+                self.entries = dict()
+
+    def save(self):
+        with self.lock:
+            write_atomic(self.manifest_path, json.dumps(self.entries, indent=1))
+            self.dirty     = False
+            self.last_save = time.monotonic()
+
+    def flush(self):
+        """Saves the entries stored since the last save."""
+        if self.dirty:
+            self.save()
+
+    @staticmethod
+    def make_key(parameters: bytes, runner: IRunner|None, env_var: dict|None) -> str:
+        digest = hashlib.sha256()
+        digest.update(parameters)
+        digest.update(b"\0")
+        digest.update((runner.fingerprint() if runner is not None else "").encode())
+        digest.update(b"\0")
+        digest.update(env_fingerprint(env_var).encode())
+        return digest.hexdigest()
+
+    def is_valid(self, L, key: str, has_output: bool) -> bool:
+        entry = self.entries.get(scale_key(L), self.entries.get(str(L))) # str(L): run caches written before scale_key
+        valid = has_output and entry == key
+        with self.lock:
+            if valid:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return valid
+
+    def store(self, L, key: str):
+        with self.lock:
+            self.entries[scale_key(L)] = key
+            self.dirty = True
+            due        = time.monotonic() - self.last_save >= SAVE_INTERVAL
+        if due:
+            self.save()
+
+    def invalidate(self, L = None):
+        with self.lock:
+            if L is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(scale_key(L), None)
+                self.entries.pop(str(L), None)
+        self.save()
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries)}
+
+    def reset_stats(self):
+        self.hits   = 0
+        self.misses = 0
+
+if __name__ == "__main__":
+    pass
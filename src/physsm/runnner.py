@@ -1,13 +1,514 @@
 from __future__ import annotations
-from typing import override
+from typing import Any, override
 from abc import ABC
+import asyncio
+import codecs
+import os
+import json
+import signal
 import subprocess
+import sys
+import tempfile
+import threading
+import time
 from pathlib import Path
 
+from .output_sink import OutputSink, StdoutSink, FileSink
+from .events import EventLog
+
+if sys.platform != "win32":
+    import resource
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+RSS_UNIT           = 1 if sys.platform == "darwin" else 1024 # ru_maxrss is in bytes on macOS, in kilobytes on Linux
+
+PARAM_MODES        = ["file", "stdin", "env"]
+PARAMETERS_ENV_VAR = "PHYSSM_PARAMETERS"
+THREAD_ENV_VARS    = ["OMP_NUM_THREADS", "RAYON_NUM_THREADS"]
+STDIN_ARG          = "-"
+WORKER_ARG         = "--worker"
+WORKER_DONE        = "@physsm:done"
+SIGKILL            = getattr(signal, "SIGKILL", signal.SIGTERM)
+
+class RssSampler:
+    """Samples the peak resident memory of a running child from a thread, on Linux: VmHWM in /proc/<pid>/status, read at once,
+    then every 1 ms and less and less often (up to every 0.1 s). Unlike ru_maxrss, VmHWM restarts at exec, so that it only
+    counts the simulation, but the memory it allocates after the last sample is missed."""
+    MAX_INTERVAL = 0.1
+
+    def __init__(self, pid: int):
+        self.path    = Path(f"/proc/{pid}/status")
+        self.peak    = None
+        self.stopped = threading.Event()
+        self.thread  = threading.Thread(target=self._sample, daemon=True)
+        self.thread.start()
+
+    def _sample(self):
+        interval = 0.001
+        while True:
+            try:
+                for line in self.path.read_text().splitlines():
+                    if line.startswith("VmHWM:"):
+                        self.peak = max(self.peak or 0, int(line.split()[1])*1024)
+            except FileNotFoundError as _: # the process was reaped
+                return
+            except (OSError, ValueError) as _: # a zombie has no VmHWM line
+                pass
+            if self.stopped.wait(interval):
+                return
+            interval = min(2*interval, self.MAX_INTERVAL)
+
+    def stop(self) -> int|None:
+        """Stops sampling, returns the peak memory in bytes (None if it could not be read)."""
+        self.stopped.set()
+        self.thread.join()
+        return self.peak
+
+    @staticmethod
+    def start(pid: int) -> RssSampler|None:
+        return RssSampler(pid) if sys.platform == "linux" else None
+
+def wait_with_usage(process: subprocess.Popen, sampler: RssSampler|None = None) -> dict[str, Any]:
+    """Waits for process using os.wait4 to get its CPU time & peak memory (not available on Windows).
+
+    The child is forked from this Python process, and on Linux its ru_maxrss keeps the memory of the fork: it is the maximum of
+    the peak memory of the simulation and of the Python process when the child was started. When it exceeds the peak memory of
+    this process, it is the peak of the simulation, otherwise max_rss is the peak measured by sampler (None without one)."""
+    sampled = None
+    try:
+        if not hasattr(os, "wait4"):
+            process.wait()
+            return dict()
+        try:
+            _, status, usage = os.wait4(process.pid, 0)
+        except ChildProcessError as _:
+            process.wait()
+            return dict()
+    finally:
+        if sampler is not None:
+            sampled = sampler.stop()
+    process.returncode = os.waitstatus_to_exitcode(status)
+    max_rss            = usage.ru_maxrss*RSS_UNIT if usage.ru_maxrss > resource.getrusage(resource.RUSAGE_SELF).ru_maxrss else sampled
+    return {"user_time": usage.ru_utime, "sys_time": usage.ru_stime, "max_rss": max_rss}
+
+def terminate_gracefully(pid: int, finished: threading.Event, grace_period: float) -> bool:
+    """Sends SIGTERM to pid, then SIGKILL if it did not finish within grace_period (finished is set once the process was reaped).
+    Returns False if the process had already finished."""
+    if finished.is_set():
+        return False
+    try:
+        os.kill(pid, signal.SIGTERM)
+    except ProcessLookupError as _:
+        return False
+    if not finished.wait(grace_period):
+        try:
+            os.kill(pid, SIGKILL)
+        except ProcessLookupError as _:
+            pass
+    return True
+
+def file_fingerprint(path: Path) -> str:
+    stat = path.stat()
+    return f"{path}:{stat.st_mtime_ns}:{stat.st_size}"
+
+def scale_key(L) -> str:
+    """Text key of a scale variable (a number, a grid point or a replica) in the run cache, "metrics.jsonl", the job queue & Slurm."""
+    return repr(L)
+
+def write_atomic(path: Path, content: str|bytes) -> bool:
+    """Writes content to a temporary file next to path, then renames it over path, so that a crash never leaves a half-written file.
+    Files whose content is unchanged are not rewritten (their mtime stays the same). Returns True if the file was written."""
+    data = content.encode() if isinstance(content, str) else content
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except FileNotFoundError as _:
+        pass
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+    except BaseException as _:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+    return True
+
+def _write_and_close(pipe, data: str|bytes):
+    try:
+        pipe.write(data)
+        pipe.close()
+    except (BrokenPipeError, OSError) as _:
+        pass
+
+async def _awrite_and_close(stream: asyncio.StreamWriter, data: bytes):
+    """Writes stdin while the output is read, so that a child answering before reading all of its input does not block."""
+    try:
+        stream.write(data)
+        await stream.drain()
+        stream.close()
+    except (BrokenPipeError, ConnectionResetError) as _:
+        pass
+
+class PersistentWorker:
+    """Long-lived child process reading parameter blocks on stdin, each one followed by an empty line, and answering each block
+    with its output followed by the line "@physsm:done <exit code>". The process exits when stdin is closed."""
+    def __init__(self, command: list[str], cwd: Path, my_env: None | dict = None):
+        self.key     = WorkerPool.make_key(command, cwd, my_env)
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1, cwd=cwd, env=my_env)
+
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def submit(self, parameters: str, sink: OutputSink) -> RunRecord:
+        start        = time.perf_counter()
+        output_bytes = 0
+        assert self.process.stdin is not None and self.process.stdout is not None
+        try:
+            self.process.stdin.write(parameters.rstrip("\n") + "\n\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as _:
+            return RunRecord(None, self.process.poll() or -1, time.perf_counter() - start)
+        
+        sink.open()
+        try:
+            for line in self.process.stdout:
+                if line.startswith(WORKER_DONE):
+                    status = line[len(WORKER_DONE):].strip()
+                    return RunRecord(None, int(status) if status else 0, time.perf_counter() - start, output_bytes=output_bytes)
+                output_bytes += len(line.encode())
+                sink.write(line)
+        finally:
+            sink.close()
+        exit_code = self.process.wait() # died during the job
+        return RunRecord(None, exit_code if exit_code != 0 else -1, time.perf_counter() - start, output_bytes=output_bytes)
+
+    def close(self, timeout: float = 10.0):
+        if self.process.stdin is not None:
+            _write_and_close(self.process.stdin, "")
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired as _:
+            self.process.kill()
+            self.process.wait()
+        if self.process.stdout is not None:
+            self.process.stdout.close()
+
+class WorkerPool:
+    """Idle persistent workers, reused by the next job with the same command, working directory & environment."""
+    def __init__(self):
+        self.idle: list[PersistentWorker] = []
+        self.lock    = threading.Lock()
+        self.started = 0
+
+    @staticmethod
+    def make_key(command: list[str], cwd: Path, my_env: None | dict) -> str:
+        return json.dumps([command, str(cwd), None if my_env is None else sorted(my_env.items())])
+
+    def acquire(self, command: list[str], cwd: Path, my_env: None | dict = None) -> PersistentWorker:
+        key = self.make_key(command, cwd, my_env)
+        with self.lock:
+            self.idle = [worker for worker in self.idle if worker.is_alive()]
+            for i, worker in enumerate(self.idle):
+                if worker.key == key:
+                    return self.idle.pop(i)
+            self.started += 1
+        return PersistentWorker(command, cwd, my_env)
+
+    def release(self, worker: PersistentWorker):
+        if worker.is_alive():
+            with self.lock:
+                self.idle.append(worker)
+
+    def close(self):
+        with self.lock:
+            workers   = self.idle
+            self.idle = []
+        for worker in workers:
+            worker.close()
+
 class IRunner(ABC):
-    def run(self, cwd: Path, args: Path, verbose_log: bool = False, my_env: None | dict = None):
+    output_prefix: str = ""
+    param_mode: str    = "file"
+    persistent: bool   = False
+    worker_arg: str    = WORKER_ARG
+    workers: WorkerPool|None = None
+    grace_period: float      = 30.0
+    deadline: float|None     = None
+    interrupted: bool        = False
+    running: dict[int, threading.Event]|None = None
+    prepared: bool           = False # prepare() was called for the current batch of runs
+
+    def __init__(self):
+        self.running_lock = threading.Lock()
+        self.events       = EventLog() # replaced by the event log of the experiment
+
+    def run(self, cwd: Path, args: Path, verbose_log: bool = False, my_env: None | dict = None, parameters: str|None = None, sink: OutputSink|None = None) -> RunRecord:
         raise NotImplementedError()
 
+    def set_parameter_passing(self, mode: str = "stdin", persistent: bool = False, worker_arg: str = WORKER_ARG):
+        """"file": the path of the parameter file is passed as argument (default).
+        "stdin" / "env": the rendered parameters are written to stdin / put in $PHYSSM_PARAMETERS, and "-" is passed instead of the path.
+        persistent: one long-lived process per worker thread, started with worker_arg, reads the parameter blocks of many runs on stdin
+        (see PersistentWorker)."""
+        if mode not in PARAM_MODES:
+            raise ValueError(f"set_parameter_passing() error: unknown mode \"{mode}\", use one of {PARAM_MODES}")
+        if persistent and mode != "stdin":
+            raise ValueError("set_parameter_passing() error: persistent workers read their parameters on stdin")
+        self.param_mode = mode
+        self.persistent = persistent
+        self.worker_arg = worker_arg
+        if self.workers is None:
+            self.workers = WorkerPool()
+
+    def parameter_arg(self, args: Path, parameters: str|None) -> Path|str:
+        return args if parameters is None else STDIN_ARG
+
+    def close_workers(self):
+        if self.workers is not None:
+            self.workers.close()
+
+    def set_grace_period(self, grace_period: float = 30.0):
+        """Time left to an executable between SIGTERM (to write its checkpoint) and SIGKILL."""
+        if grace_period < 0:
+            raise ValueError("set_grace_period() error: grace_period must be positive")
+        self.grace_period = grace_period
+
+    def set_time_budget(self, time_budget: float|None = None):
+        """Runs still going time_budget seconds from now get SIGTERM (then SIGKILL after the grace period), later runs are not started.
+        Also clears a previous interrupt()."""
+        self.deadline    = None if time_budget is None else time.monotonic() + time_budget
+        self.interrupted = False
+
+    def time_left(self) -> float|None:
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def may_start(self) -> bool:
+        time_left = self.time_left()
+        return not self.interrupted and (time_left is None or time_left > 0)
+
+    def interrupt(self) -> int:
+        """Terminates the running executables (SIGTERM, then SIGKILL after the grace period) and prevents new runs
+        until set_time_budget() is called. Persistent workers running a job are terminated too. Returns the number of terminated processes."""
+        self.interrupted = True
+        with self.running_lock:
+            running = list((self.running or dict()).items())
+        threads = [threading.Thread(target=terminate_gracefully, args=(pid, finished, self.grace_period)) for pid, finished in running]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return len(threads)
+
+    def _track(self, pid: int) -> tuple[threading.Event, threading.Timer|None]:
+        finished = threading.Event()
+        with self.running_lock:
+            if self.running is None:
+                self.running = dict()
+            self.running[pid] = finished
+        timer     = None
+        time_left = self.time_left()
+        if time_left is not None:
+            timer = threading.Timer(max(time_left, 0.0), terminate_gracefully, args=(pid, finished, self.grace_period))
+            timer.daemon = True
+            timer.start()
+        return finished, timer
+
+    def _untrack(self, pid: int, finished: threading.Event, timer: threading.Timer|None):
+        finished.set()
+        if timer is not None:
+            timer.cancel()
+        with self.running_lock:
+            if self.running is not None:
+                self.running.pop(pid, None)
+
+    def _child_env(self, my_env: None | dict, parameters: str|None) -> None | dict:
+        if parameters is None or self.param_mode != "env":
+            return my_env
+        child_env = dict(os.environ if my_env is None else my_env)
+        child_env[PARAMETERS_ENV_VAR] = parameters
+        return child_env
+
+    def log_command(self, command: list[str], args: Path, verbose_log: bool):
+        """One "command" event per run: debug level, info with verbose_log (with the full command line)."""
+        if verbose_log:
+            self.events.info("command", f"Command: \"{subprocess.list2cmdline(command)}\"", command=command)
+        elif self.events.wants("debug"):
+            self.events.debug("command", f"Command: Executing \"{Path(command[0]).name}\" with \"{args.name}\"", command=command)
+
+    def _execute(self, command: list[str], cwd: Path, my_env: None | dict = None, parameters: str|None = None, sink: OutputSink|None = None) -> RunRecord:
+        """Runs the argv list command, the output going to sink (default: stdout with the language prefix).
+        Sinks with a file descriptor (DiscardSink, FileSink) get the output directly from the child, otherwise it is read in chunks."""
+        sink = StdoutSink(self.output_prefix) if sink is None else sink
+        if not self.may_start():
+            self.events.debug("not_started", ">> Not started: interrupted or time budget expired")
+            return RunRecord(None, None, 0.0)
+        if parameters is not None and self.persistent:
+            return self._submit_to_worker(cwd, my_env, parameters, sink)
+        stdin = subprocess.PIPE if parameters is not None and self.param_mode == "stdin" else None
+        
+        start        = time.perf_counter()
+        output_bytes = 0
+        sink.open()
+        try:
+            direct = sink.fileno()
+            stdout = direct if direct is not None else subprocess.PIPE
+            with subprocess.Popen(command, stdin=stdin, stdout=stdout, stderr=subprocess.STDOUT, cwd=cwd, env=self._child_env(my_env, parameters)) as stream:
+                finished, timer = self._track(stream.pid)
+                sampler = RssSampler.start(stream.pid)
+                writer  = None
+                if stream.stdin is not None and parameters is not None:
+                    writer = threading.Thread(target=_write_and_close, args=(stream.stdin, parameters.encode()), daemon=True)
+                    writer.start()
+                if stream.stdout is not None:
+                    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+                    while chunk := stream.stdout.read1(DEFAULT_CHUNK_SIZE):
+                        output_bytes += len(chunk)
+                        sink.write(decoder.decode(chunk))
+                    sink.write(decoder.decode(b"", final=True))
+                if writer is not None:
+                    writer.join()
+                try:
+                    usage = wait_with_usage(stream, sampler)
+                finally:
+                    self._untrack(stream.pid, finished, timer)
+        finally:
+            sink.close()
+        if direct is not None:
+            output_bytes = sink.output_bytes()
+        return RunRecord(None, stream.returncode, time.perf_counter() - start, output_bytes=output_bytes, **usage)
+
+    def _submit_to_worker(self, cwd: Path, my_env: None | dict, parameters: str, sink: OutputSink) -> RunRecord:
+        """Runs one parameter block on an idle persistent worker. The worker is tracked like a child during the job, so that
+        interrupt() and the time budget terminate it (it is then not reused)."""
+        assert self.workers is not None
+        worker          = self.workers.acquire(self.command_args(self.worker_arg), cwd, my_env)
+        finished, timer = self._track(worker.process.pid)
+        try:
+            return worker.submit(parameters, sink)
+        finally:
+            self._untrack(worker.process.pid, finished, timer)
+            self.workers.release(worker)
+
+    def command_args(self, args: Path|str) -> list[str]:
+        raise NotImplementedError()
+
+    def fingerprint(self) -> str:
+        """Identifies the executable and its sources, used to invalidate cached runs."""
+        return ""
+
+    def prepare(self, cwd: Path, verbose_log: bool = False) -> None:
+        """Called once before a batch of runs (for ex: to compile the executable). The runs of the batch
+        then skip their own checks (see prepared)."""
+        pass
+
+    def config(self) -> dict[str, Any]:
+        """Arguments of the constructor as json values, saved in the manifest of the experiment (see from_config)."""
+        raise NotImplementedError()
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any]) -> IRunner:
+        raise NotImplementedError()
+
+    def settings(self) -> dict[str, Any]:
+        return {"param_mode": self.param_mode, "persistent": self.persistent, "worker_arg": self.worker_arg, "grace_period": self.grace_period}
+
+    def apply_settings(self, settings: dict[str, Any]):
+        if settings.get("param_mode", "file") != "file" or settings.get("persistent", False):
+            self.set_parameter_passing(settings["param_mode"], settings["persistent"], settings.get("worker_arg", WORKER_ARG))
+        self.set_grace_period(settings.get("grace_period", self.grace_period))
+
+    async def arun(self, cwd: Path, args: Path, verbose_log: bool = False, my_env: None | dict = None, log_file: Path|None = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                   parameters: str|None = None, sink: OutputSink|None = None) -> RunRecord:
+        """Async counterpart of run(): the output goes to sink (log_file is a shortcut for FileSink(log_file)),
+        read in chunks of at most chunk_size bytes unless the sink has a file descriptor.
+        The child is reaped by asyncio, so the record contains no CPU time nor peak memory. Persistent workers are run in a thread."""
+        command = self.command_args(self.parameter_arg(args, parameters))
+        self.log_command(command, args, verbose_log)
+        if sink is None:
+            sink = FileSink(log_file) if log_file is not None else StdoutSink(self.output_prefix)
+        if parameters is not None and self.persistent:
+            return await asyncio.to_thread(self._execute, command, cwd, my_env, parameters, sink)
+        if not self.may_start():
+            self.events.debug("not_started", ">> Not started: interrupted or time budget expired")
+            return RunRecord(None, None, 0.0)
+        stdin = asyncio.subprocess.PIPE if parameters is not None and self.param_mode == "stdin" else None
+
+        start        = time.perf_counter()
+        output_bytes = 0
+        sink.open()
+        try:
+            direct  = sink.fileno()
+            stdout  = direct if direct is not None else asyncio.subprocess.PIPE
+            process = await asyncio.create_subprocess_exec(*command, stdin=stdin, stdout=stdout, stderr=asyncio.subprocess.STDOUT, cwd=cwd,
+                                                           env=self._child_env(my_env, parameters))
+            finished, timer = self._track(process.pid)
+            writer = None
+            try:
+                if process.stdin is not None and parameters is not None:
+                    writer = asyncio.create_task(_awrite_and_close(process.stdin, parameters.encode()))
+                if process.stdout is not None:
+                    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+                    while chunk := await process.stdout.read(chunk_size):
+                        output_bytes += len(chunk)
+                        sink.write(decoder.decode(chunk))
+                    sink.write(decoder.decode(b"", final=True))
+                if writer is not None:
+                    await writer
+                exit_code = await process.wait()
+            except asyncio.CancelledError:
+                if process.returncode is None:
+                    process.terminate()
+                    try:
+                        await asyncio.wait_for(process.wait(), self.grace_period)
+                    except TimeoutError as _:
+                        process.kill()
+                raise
+            finally:
+                if writer is not None and not writer.done():
+                    writer.cancel()
+                self._untrack(process.pid, finished, timer)
+        finally:
+            sink.close()
+        if direct is not None:
+            output_bytes = sink.output_bytes()
+        return RunRecord(None, exit_code, time.perf_counter() - start, output_bytes=output_bytes)
+
+
+class RunRecord:
+    """Outcome of one run: exit code, wall time, CPU time (user/sys, in s), peak memory (max_rss, in bytes)
+    and number of bytes written to stdout & stderr (merged). Unavailable values are None."""
+    FIELDS = ["scale", "exit_code", "wall_time", "user_time", "sys_time", "max_rss", "output_bytes", "cached", "timestamp"]
+
+    def __init__(self, scale: Any, exit_code: int|None, wall_time: float, cached: bool = False, user_time: float|None = None,
+                 sys_time: float|None = None, max_rss: int|None = None, output_bytes: int|None = None, timestamp: float|None = None):
+        self.scale        = scale
+        self.exit_code    = exit_code
+        self.wall_time    = wall_time
+        self.cached       = cached
+        self.user_time    = user_time
+        self.sys_time     = sys_time
+        self.max_rss      = max_rss
+        self.output_bytes = output_bytes
+        self.timestamp    = time.time() if timestamp is None else timestamp
+
+    def is_success(self) -> bool:
+        return self.exit_code == 0
+
+    def cpu_time(self) -> float|None:
+        if self.user_time is None or self.sys_time is None:
+            return None
+        return self.user_time + self.sys_time
+
+    def to_dict(self) -> dict[str, Any]:
+        return {field: getattr(self, field) for field in RunRecord.FIELDS}
+
+    @staticmethod
+    def from_dict(data: dict[str, Any]) -> RunRecord:
+        return RunRecord(**{field: data.get(field) for field in RunRecord.FIELDS if field in data})
+
+    def __repr__(self) -> str:
+        return f"RunRecord(scale={self.scale}, exit_code={self.exit_code}, wall_time={self.wall_time:.3f}s, cpu_time={self.cpu_time()}, max_rss={self.max_rss}, cached={self.cached})"
 
 
 if __name__ == "__main__":
@@ -2,43 +2,121 @@ from .experiment_data import BaseExperimentData
 from .abstract_experiment import AbstractExperiment
 from .abstract_experiment_builder import AbstractExperimentBuilder
 from .experiment_output import ExperimentOutput
-from .runnner import IRunner
+from .output_sink import OutputSink
+from .runnner import IRunner, RunRecord, file_fingerprint
 from .path_logger import PathLogger
 from pathlib import Path
-from typing import override, TypeVar
+from typing import Any, override, TypeVar
+import json
 import subprocess
+import threading
+import time
 
 OutType = TypeVar("OutType", bound = ExperimentOutput) 
 
 
 
 class CargoRunner(IRunner):
+    output_prefix = "Rust: "
+
     def __init__(self, cargo_toml_path: Path):
-        self.cargo_toml_path = cargo_toml_path
+        super().__init__()
+        self.cargo_toml_path             = cargo_toml_path
+        self.binary: Path|None           = None
+        self.built_fingerprint: str|None = None
+        self.build_time: float|None      = None
+        self.build_lock                  = threading.Lock()
+
+    @override
+    def command_args(self, args: Path|str) -> list[str]:
+        if self.binary is None:
+            return ["cargo", "run", "--manifest-path", str(self.cargo_toml_path), "--release", "--", str(args)]
+        return [str(self.binary), str(args)]
+
+    @override
+    def fingerprint(self) -> str:
+        src_dir = self.cargo_toml_path.parent.joinpath("src")
+        sources = [self.cargo_toml_path] + sorted(src_dir.rglob("*.rs"))
+        return ";".join([file_fingerprint(source) for source in sources])
+
+    @override
+    def config(self) -> dict[str, Any]:
+        """Also the last built binary, reused by a reopened experiment as long as the sources are unchanged."""
+        return {"cargo_toml_path": str(self.cargo_toml_path), "binary": None if self.binary is None else str(self.binary),
+                "built_fingerprint": self.built_fingerprint}
 
-        
     @override
-    def run(self, cwd: Path, args: Path,  verbose_log: bool = False, my_env: None | dict = None):
-        cargo_toml_path = self.cargo_toml_path 
-        command = f"cargo run --manifest-path {cargo_toml_path} --release -- {args}"
+    @classmethod
+    def from_config(cls, config: dict[str, Any]) -> IRunner:
+        runner = cls(Path(config["cargo_toml_path"]))
+        if config.get("binary") is not None:
+            runner.binary            = Path(config["binary"])
+            runner.built_fingerprint = config.get("built_fingerprint")
+        return runner
 
+    def needs_build(self) -> bool:
+        return self.binary is None or not self.binary.exists() or self.built_fingerprint != self.fingerprint()
+
+    def build(self, cwd: Path, verbose_log: bool = False) -> Path:
+        """Runs "cargo build --release" once and reads the path of the produced binary from cargo's json messages."""
+        command = ["cargo", "build", "--manifest-path", str(self.cargo_toml_path), "--release", "--message-format=json-render-diagnostics"]
         if verbose_log:
-            print(f"Command: \"{command}\"")   
+            self.events.info("build_command", f"Command: \"{' '.join(command)}\"")
         else:
-            print(f"Running cargo --release with from rust dir \"{cargo_toml_path.parent.relative_to(cwd)}\" and args=\"{args.name}\"")   
+            self.events.info("build_start", f">> Building rust project \"{self.cargo_toml_path.parent.name}\" [cargo build --release]", name=self.cargo_toml_path.parent.name)
 
+        fingerprint = self.fingerprint()
+        start       = time.perf_counter()
+        completed   = subprocess.run(command, capture_output=True, text=True, cwd=cwd)
+        build_time  = time.perf_counter() - start
         
-        with subprocess.Popen(command, stdout=subprocess.PIPE, bufsize=1, text=True, stderr=subprocess.STDOUT, cwd=cwd, env=my_env) as stream:
-            if stream.stdout is not None:
-                for lines in stream.stdout:
-                    print("Rust: ", lines, end='')
+        level = "warning" if completed.returncode == 0 else "error"
+        for line in completed.stderr.splitlines():
+            self.events.emit(level, "build_output", f"Rust:  {line}")
+        if completed.returncode != 0:
+            raise RuntimeError(f"cargo build error: exit code {completed.returncode}")
+
+        binary: Path|None = None
+        for line in completed.stdout.splitlines():
+            try:
+                message = json.loads(line)
+            except json.JSONDecodeError as _:
+                continue
+            if message.get("reason") == "compiler-artifact" and message.get("executable"):
+                binary = Path(message["executable"])
+        if binary is None:
+            raise RuntimeError("cargo build error: no executable produced")
+
+        self.binary            = binary
+        self.built_fingerprint = fingerprint
+        self.build_time        = build_time
+        self.events.info("build_end", f">> Built \"{binary.name}\" in {build_time:.2f}s", binary=str(binary), elapsed=build_time)
+        return binary
+
+    def ensure_built(self, cwd: Path, verbose_log: bool = False) -> Path:
+        with self.build_lock:
+            if self.needs_build():
+                self.build(cwd, verbose_log)
+            assert self.binary is not None
+            return self.binary
+
+    @override
+    def prepare(self, cwd: Path, verbose_log: bool = False) -> None:
+        self.ensure_built(cwd, verbose_log)
+
+    @override
+    def run(self, cwd: Path, args: Path, verbose_log: bool = False, my_env: None | dict = None, parameters: str|None = None, sink: OutputSink|None = None) -> RunRecord:
+        binary  = self.binary if self.prepared and self.binary is not None else self.ensure_built(cwd, verbose_log)
+        command = [str(binary), str(self.parameter_arg(args, parameters))]
+        self.log_command(command, args, verbose_log)
+        return self._execute(command, cwd, my_env, parameters, sink)
 
 class RustExperiment(AbstractExperiment):
     def __init__(self, exp_data: BaseExperimentData):
         super().__init__(exp_data)
 
     @override
-    def run(self, scale: int | float, env_var: dict | None = None, verbose_log=False) -> None:
+    def run(self, scale: int | float, env_var: dict | None = None, verbose_log=False) -> RunRecord|None:
         if self.runner is None:
             raise TypeError("run_cargo() error: Runner not set [use: set_executable]")        
         
@@ -47,12 +125,12 @@ class RustExperiment(AbstractExperiment):
         try:
             param_path = self.get_parameter_path(scale)
         except KeyError as _:
-            print(">> run_cargo: cannot find parameter")            
-            return
+            self.events.error("run_error", f">> run_cargo: cannot find parameter of {scale}", key=scale)
+            return None
               
         cwd  = self.paths_data.proj_dir
         args = param_path
-        self.runner.run(cwd, args, verbose_log, env_var)
+        return self.runner.run(cwd, args, verbose_log, env_var, self.render_parameters(scale), self.make_sink(scale))
         
         
 class RustExperimentBuilder(AbstractExperimentBuilder[OutType]):
@@ -64,7 +142,7 @@ class RustExperimentBuilder(AbstractExperimentBuilder[OutType]):
         if not cargo_toml_path.exists():
             raise FileNotFoundError(f"set_cargo_toml_path(): Cannot find {cargo_toml_path}")
         self.runner = CargoRunner(cargo_toml_path)
-        print(f">> Cargo toml path set to \"{self.log_path(cargo_toml_path)}\" [Current mode: Cargo mode]")
+        self.paths_data.events.info("settings", f">> Cargo toml path set to \"{self.log_path(cargo_toml_path)}\" [Current mode: Cargo mode]", path=cargo_toml_path)
 
     @override
     def build(self, load_only = False) -> RustExperiment:
@@ -72,7 +150,11 @@ class RustExperimentBuilder(AbstractExperimentBuilder[OutType]):
         experiment.runner = self.runner
         if experiment.runner is None and not load_only:
             raise TypeError("Cargo toml not set!")
-        return RustExperiment(experiment)
+        if self.runner is not None and not load_only:
+            self.runner.ensure_built(self.paths_data.proj_dir, self.paths_data.path_logger.is_verbose())
+        rust_experiment = RustExperiment(experiment)
+        rust_experiment.save_manifest()
+        return rust_experiment
 
 if __name__ == "__main__":
     pass
\ No newline at end of file
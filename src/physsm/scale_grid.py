@@ -0,0 +1,99 @@
+from __future__ import annotations
+from typing import Any, Callable, Iterator
+from itertools import product
+import numpy as np
+
+def _as_values(values) -> list:
+    if isinstance(values, np.ndarray):
+        return values.tolist()
+    if isinstance(values, (list, tuple, range)):
+        return list(values)
+    return [values]
+
+class ScaleGrid:
+    """Cartesian product of named scale axes, for ex {"Lx": [4, 8], "Ly": [4, 8], "seed": range(16)}.
+
+    The scale variables of a grid are tuples ordered like the axes, for ex (4, 8, 0).
+    """
+    def __init__(self, axes: dict[str, Any]):
+        if len(axes) == 0:
+            raise ValueError("ScaleGrid error: no axes")
+        self.axes: dict[str, list]  = {name: _as_values(values) for name, values in axes.items()}
+        self.index: dict[str, int]  = {name: i for i, name in enumerate(self.axes)}
+
+    def get_names(self) -> list[str]:
+        return list(self.axes.keys())
+
+    def __len__(self) -> int:
+        return int(np.prod([len(values) for values in self.axes.values()]))
+
+    def __iter__(self) -> Iterator[tuple]:
+        return product(*self.axes.values())
+
+    def __contains__(self, point) -> bool:
+        return isinstance(point, tuple) and len(point) == len(self.axes) and all(v in values for v, values in zip(point, self.axes.values()))
+
+    def __repr__(self) -> str:
+        return f"ScaleGrid({self.axes})"
+
+    def points(self) -> list[tuple]:
+        return list(iter(self))
+
+    def select(self, **selection) -> ScaleGrid:
+        """Sub-grid where the given axes are restricted to a value or a list of values, for ex select(Lx=8, seed=[0, 1])."""
+        axes = dict(self.axes)
+        for name, values in selection.items():
+            if name not in axes:
+                raise KeyError(f"ScaleGrid error: no axis \"{name}\"")
+            values  = _as_values(values)
+            missing = [v for v in values if v not in axes[name]]
+            if len(missing) > 0:
+                raise ValueError(f"ScaleGrid error: {missing} not in axis \"{name}\"")
+            axes[name] = values
+        return ScaleGrid(axes)
+
+    def extend(self, name: str, values) -> ScaleGrid:
+        """Grid with new values added to an axis, kept sorted, for ex extend("T", [2.25, 2.3])."""
+        if name not in self.axes:
+            raise KeyError(f"ScaleGrid error: no axis \"{name}\"")
+        axes       = dict(self.axes)
+        axes[name] = sorted(set(axes[name]) | set(_as_values(values)))
+        return ScaleGrid(axes)
+
+    def project(self, point: tuple, names: list[str]) -> Any:
+        """Components of point along the given axes: a single value for one axis, a tuple otherwise."""
+        if len(names) == 1:
+            return point[self.index[names[0]]]
+        return tuple(point[self.index[name]] for name in names)
+
+    def as_dict(self, point: tuple) -> dict[str, Any]:
+        return dict(zip(self.axes.keys(), point))
+
+class GridParameter:
+    """Parameter depending on a subset of the grid axes, given either as a dictionnary
+    (keyed by the axis value for one axis, by a tuple otherwise) or as a function of the axis values."""
+    def __init__(self, axes: list[str], values: dict|Callable[..., Any]):
+        self.axes   = axes
+        self.values = values
+
+    def validate(self, grid: ScaleGrid, name: str):
+        for axis in self.axes:
+            if axis not in grid.index:
+                raise ValueError(f"\"{name}\" depends on unknown axis \"{axis}\"")
+        if callable(self.values):
+            return
+        sub_grid = ScaleGrid({axis: grid.axes[axis] for axis in self.axes})
+        for point in sub_grid:
+            key = point[0] if len(self.axes) == 1 else point
+            if key not in self.values:
+                raise ValueError(f"\"{name}\" has no value for {dict(zip(self.axes, point))}")
+
+    def value(self, grid: ScaleGrid, point: tuple) -> Any:
+        key = grid.project(point, self.axes)
+        if callable(self.values):
+            args = key if len(self.axes) > 1 else (key,)
+            return self.values(**dict(zip(self.axes, args)))
+        return self.values[key]
+
+if __name__ == "__main__":
+    pass
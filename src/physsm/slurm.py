@@ -0,0 +1,214 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any
+import json
+import os
+import shlex
+import subprocess
+import time
+
+from .job_queue import PENDING, RUNNING, DONE, FAILED, CANCELLED, JOB_STATES
+from .events import EventLog
+
+SLURM_JOBS_FILE = "slurm_jobs.json"
+SLURM_DIR       = "slurm"
+UNKNOWN         = "unknown"
+
+SLURM_STATES = {
+    "PENDING": PENDING, "CONFIGURING": PENDING, "REQUEUED": PENDING, "REQUEUE_HOLD": PENDING, "REQUEUE_FED": PENDING,
+    "SUSPENDED": PENDING, "RESIZING": RUNNING, "RUNNING": RUNNING, "COMPLETING": RUNNING, "STAGE_OUT": RUNNING, "SIGNALING": RUNNING,
+    "COMPLETED": DONE, "CANCELLED": CANCELLED, "FAILED": FAILED, "TIMEOUT": FAILED, "NODE_FAIL": FAILED, "OUT_OF_MEMORY": FAILED,
+    "BOOT_FAIL": FAILED, "DEADLINE": FAILED, "PREEMPTED": FAILED, "REVOKED": FAILED, "SPECIAL_EXIT": FAILED,
+}
+
+def slurm_state(state: str) -> str:
+    """physsm state of a Slurm state, for ex "CANCELLED by 1234" -> "cancelled"."""
+    name = state.strip().split(" ")[0].rstrip("+")
+    return SLURM_STATES.get(name, UNKNOWN)
+
+def expand_array_ids(job_id: str) -> tuple[str, list[int]]:
+    """"1234_5" -> ("1234", [5]), "1234_[0-3,7%2]" -> ("1234", [0, 1, 2, 3, 7]), "1234" -> ("1234", [])."""
+    base, _, tasks = job_id.partition("_")
+    if tasks == "":
+        return base, []
+    tasks   = tasks.strip("[]").split("%")[0]
+    indices = []
+    for part in tasks.split(","):
+        first, _, last = part.partition("-")
+        if first.isdigit():
+            indices.extend(range(int(first), int(last or first) + 1))
+    return base, indices
+
+def env_exports(env: dict|None) -> dict[str, str]:
+    """Variables of env which differ from the current environment (Slurm propagates the rest)."""
+    if env is None:
+        return dict()
+    return {k: v for k, v in sorted(env.items()) if os.environ.get(k) != v}
+
+class SlurmCommands:
+    """Command lines of the Slurm tools, replaceable by a local stand-in (for ex ["python", "fake_slurm.py", "sbatch"])."""
+    def __init__(self, sbatch: list[str]|None = None, squeue: list[str]|None = None, sacct: list[str]|None = None, scancel: list[str]|None = None):
+        self.sbatch  = ["sbatch"] if sbatch is None else sbatch
+        self.squeue  = ["squeue"] if squeue is None else squeue
+        self.sacct   = ["sacct"] if sacct is None else sacct
+        self.scancel = ["scancel"] if scancel is None else scancel
+
+class SlurmBackend:
+    """Runs the scale variables of an experiment as one Slurm job array: the task $SLURM_ARRAY_TASK_ID runs one scale variable,
+    with the command of the experiment's runner. The submitted arrays (job id, task -> scale variable, cache key) are kept in
+    "slurm_jobs.json" in the experiment directory, so that the jobs can be followed after the notebook was closed.
+    """
+    def __init__(self, target_dir: Path, commands: SlurmCommands|None = None, options: dict[str, Any]|None = None, events: EventLog|None = None):
+        self.target_dir = target_dir
+        self.events     = EventLog() if events is None else events
+        self.slurm_dir  = target_dir.joinpath(SLURM_DIR)
+        self.jobs_path  = target_dir.joinpath(SLURM_JOBS_FILE)
+        self.commands   = SlurmCommands() if commands is None else commands
+        self.options    = dict() if options is None else dict(options)
+        self.arrays: list[dict[str, Any]] = self.load()
+
+    def load(self) -> list[dict[str, Any]]:
+        if not self.jobs_path.exists():
+            return []
+        try:
+            return json.loads(self.jobs_path.read_text())
+        except (json.JSONDecodeError, OSError) as e:
+            self.events.warning("slurm", f">> slurm: cannot read \"{self.jobs_path.name}\" ({e}), starting empty")
+            return []
+
+    def save(self):
+        tmp_path = self.jobs_path.with_name(f".{self.jobs_path.name}.tmp")
+        tmp_path.write_text(json.dumps(self.arrays, indent=1))
+        os.replace(tmp_path, self.jobs_path)
+
+    def _call(self, command: list[str], check = True) -> str|None:
+        """stdout of command. A non-zero exit code raises RuntimeError, or returns None if not check."""
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            if not check:
+                return None
+            raise RuntimeError(f"{command[0]} error: exit code {completed.returncode}: {completed.stderr.strip()}")
+        return completed.stdout
+
+    def render_script(self, name: str, tasks: list[dict[str, Any]], cwd: Path, env: dict|None = None, max_parallel: int|None = None,
+                      cores_per_job: int|None = None, signal_grace: float|None = None, options: dict[str, Any]|None = None) -> str:
+        """Job array script: tasks are dicts with the command (argv list) and log path of one scale variable.
+        options are written as "#SBATCH --<key>=<value>" (value None: "#SBATCH --<key>"), after the experiment-wide options."""
+        array = f"0-{len(tasks) - 1}" + (f"%{max_parallel}" if max_parallel is not None else "")
+        lines = ["#!/bin/bash", f"#SBATCH --job-name={name}", f"#SBATCH --array={array}", f"#SBATCH --output={self.slurm_dir.joinpath('%A_%a.out')}"]
+        if cores_per_job is not None:
+            lines.append(f"#SBATCH --cpus-per-task={cores_per_job}")
+        if signal_grace is not None:
+            lines.append(f"#SBATCH --signal=B:TERM@{max(1, round(signal_grace))}") # the simulation replaces the batch shell (exec)
+        for key, value in {**self.options, **(options or dict())}.items():
+            lines.append(f"#SBATCH --{key}" if value is None else f"#SBATCH --{key}={value}")
+        lines.append("")
+        lines.append(f"cd {shlex.quote(str(cwd))}")
+        for key, value in env_exports(env).items():
+            lines.append(f"export {key}={shlex.quote(value)}")
+        lines.append("case \"$SLURM_ARRAY_TASK_ID\" in")
+        for index, task in enumerate(tasks):
+            lines.append(f"    {index}) exec {shlex.join(task['command'])} > {shlex.quote(str(task['log_path']))} 2>&1 ;;")
+        lines.append("    *) echo \"unknown array task $SLURM_ARRAY_TASK_ID\" >&2; exit 1 ;;")
+        lines.append("esac")
+        return "\n".join(lines) + "\n"
+
+    def submit(self, name: str, tasks: list[dict[str, Any]], cwd: Path, env: dict|None = None, max_parallel: int|None = None,
+               cores_per_job: int|None = None, signal_grace: float|None = None, options: dict[str, Any]|None = None) -> str:
+        """Writes the script of the tasks (dicts with key, command, log_path, cache_key) & submits it with sbatch, returns the job id."""
+        if len(tasks) == 0:
+            raise ValueError("SlurmBackend.submit() error: no task")
+        self.slurm_dir.mkdir(parents=True, exist_ok=True)
+        script_path = self.slurm_dir.joinpath(f"{name}_{len(self.arrays)}.sh")
+        script_path.write_text(self.render_script(name, tasks, cwd, env, max_parallel, cores_per_job, signal_grace, options))
+
+        output = (self._call(self.commands.sbatch + ["--parsable", str(script_path)]) or "").strip()
+        job_id = output.splitlines()[-1].split(";")[0] if output else ""
+        if not job_id.isdigit():
+            raise RuntimeError(f"sbatch error: cannot read the job id from \"{output}\"")
+        self.arrays.append({"job_id": job_id, "script": str(script_path), "submitted": time.time(),
+                            "tasks": [{"key": task["key"], "cache_key": task["cache_key"], "collected": False} for task in tasks]})
+        self.save()
+        return job_id
+
+    def query(self, job_id: str) -> dict[int, dict[str, Any]]:
+        """State & exit code of every known task of an array: squeue for the active tasks, sacct for the finished ones.
+        squeue fails ("Invalid job id specified") once the array has left the queue: none of its tasks is active then."""
+        tasks: dict[int, dict[str, Any]] = dict()
+        accounting = self._call(self.commands.sacct + ["-n", "-P", "-X", "-j", job_id, "--format=JobID,State,ExitCode,ElapsedRaw"]) or ""
+        for line in accounting.splitlines():
+            fields = line.strip().split("|")
+            if len(fields) < 3:
+                continue
+            base, indices = expand_array_ids(fields[0])
+            exit_code     = fields[2].split(":")[0]
+            elapsed       = fields[3] if len(fields) > 3 else ""
+            info = {"state": slurm_state(fields[1]), "exit_code": int(exit_code) if exit_code.isdigit() else None,
+                    "elapsed": float(elapsed) if elapsed.isdigit() else None}
+            for index in indices:
+                if base != job_id:
+                    continue
+                if "[" in fields[0]:
+                    tasks.setdefault(index, info) # pending tasks are listed as a range next to the others
+                else:
+                    tasks[index] = info
+        queue = self._call(self.commands.squeue + ["-h", "-r", "-j", job_id, "-o", "%i|%T"], check=False)
+        if queue is None:
+            self.events.debug("slurm", f"-- slurm: job {job_id} is not in the queue anymore", job_id=job_id)
+        for line in (queue or "").splitlines():
+            fields = line.strip().split("|")
+            if len(fields) < 2:
+                continue
+            base, indices = expand_array_ids(fields[0])
+            for index in indices:
+                if base == job_id:
+                    tasks[index] = {"state": slurm_state(fields[1]), "exit_code": None, "elapsed": None}
+        return tasks
+
+    def latest_tasks(self) -> dict[str, tuple[dict[str, Any], int, dict[str, Any]]]:
+        """(array, task index, task) of the last submission of every key."""
+        latest = dict()
+        for array in self.arrays:
+            for index, task in enumerate(array["tasks"]):
+                latest[task["key"]] = (array, index, task)
+        return latest
+
+    def states(self) -> dict[str, dict[str, Any]]:
+        """State, exit code & elapsed time of the last submission of every key, one squeue & sacct call per array.
+        Tasks unknown to Slurm are "unknown" (for ex purged from the accounting)."""
+        latest  = self.latest_tasks()
+        queried = {array["job_id"]: self.query(array["job_id"]) for array in {id(a): a for a, _, _ in latest.values()}.values()}
+        states  = dict()
+        for key, (array, index, task) in latest.items():
+            info = queried[array["job_id"]].get(index, {"state": UNKNOWN, "exit_code": None, "elapsed": None})
+            states[key] = {**info, "job_id": f"{array['job_id']}_{index}", "collected": task["collected"], "cache_key": task["cache_key"]}
+        return states
+
+    def count(self, states: dict[str, dict[str, Any]]|None = None) -> dict[str, int]:
+        states = self.states() if states is None else states
+        counts = {state: 0 for state in JOB_STATES + [UNKNOWN]}
+        for info in states.values():
+            counts[info["state"]] += 1
+        return counts
+
+    def mark_collected(self, keys: list[str]):
+        keys = set(keys)
+        for key, (_, _, task) in self.latest_tasks().items():
+            if key in keys:
+                task["collected"] = True
+        self.save()
+
+    def cancel(self, keys: list[str]|None = None) -> int:
+        """Cancels the pending & running tasks (of keys, or all), returns their number."""
+        states  = self.states()
+        by_job: dict[str, list[str]] = dict()
+        for key, info in states.items():
+            if info["state"] in [PENDING, RUNNING] and (keys is None or key in keys):
+                job_id, _, index = info["job_id"].partition("_")
+                by_job.setdefault(job_id, []).append(index)
+        for job_id, indices in by_job.items():
+            self._call(self.commands.scancel + [f"{job_id}_[{','.join(indices)}]"])
+        return sum(len(indices) for indices in by_job.values())
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,73 @@
+from __future__ import annotations
+from typing import Any
+import time
+
+from .runnner import RunRecord
+from .job_queue import PENDING, RUNNING, DONE, FAILED
+
+class Sweep:
+    """One batch of runs, scheduled the same way by every backend (run_all, arun_all, submit_all, submit_slurm): the selected
+    scale variables, the environment & number of parallel jobs, the jobs to run (largest scale first) with their run cache keys,
+    and the records of the scale variables up to date in the run cache."""
+    def __init__(self, scale_variables: list, job_env: dict|None, workers: int, jobs: list, keys: dict[Any, str|None], cached: dict[Any, RunRecord]):
+        self.scale_variables = scale_variables
+        self.job_env         = job_env
+        self.workers         = workers
+        self.jobs            = jobs
+        self.keys            = keys
+        self.cached          = cached
+        self.start           = time.perf_counter()
+
+    def results(self, finished: dict[Any, RunRecord]) -> dict[Any, RunRecord]:
+        """Record of every scale variable, in the order of the selection: cached, or finished by the backend."""
+        return {L: self.cached[L] if L in self.cached else finished[L] for L in self.scale_variables}
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+class JobStates:
+    """Jobs of a queue (job queue, Slurm) at one poll. active counts every pending or running job, and the jobs of known
+    scale variables are sorted into pending, running (with their elapsed time, None if unknown) & finished records."""
+    def __init__(self):
+        self.active = 0
+        self.pending: list                  = []
+        self.running: dict[Any, float|None] = dict()
+        self.finished: list[RunRecord]      = []
+
+    def add(self, L, state: str, elapsed: float|None = None, exit_code: int|None = None):
+        """L is None for a job of a scale variable unknown to the experiment (only counted)."""
+        if state in [PENDING, RUNNING]:
+            self.active += 1
+        if L is None:
+            return
+        if state == PENDING:
+            self.pending.append(L)
+        elif state == RUNNING:
+            self.running[L] = elapsed
+        else:
+            self.finished.append(RunRecord(L, exit_code if state in [DONE, FAILED] else None, elapsed or 0.0))
+
+    def scale_variables(self) -> list:
+        return self.pending + list(self.running) + [record.scale for record in self.finished]
+
+def queue_states(rows: list, job_keys: dict[str, Any]) -> JobStates:
+    """States of the jobs of the job queue, rows being JobQueue.get_jobs()."""
+    states = JobStates()
+    now    = time.time()
+    for row in rows:
+        started  = row["started"]
+        finished = row["finished"] if row["status"] != RUNNING else now
+        elapsed  = finished - started if started is not None and finished is not None else None
+        states.add(job_keys.get(row["key"]), row["status"], elapsed, row["exit_code"])
+    return states
+
+def slurm_states(tasks: dict[str, dict[str, Any]], job_keys: dict[str, Any]) -> JobStates:
+    """States of the Slurm tasks, tasks being SlurmBackend.states(): squeue gives no start time, the running tasks count from now."""
+    states = JobStates()
+    for key, info in tasks.items():
+        elapsed = info["elapsed"] if info["state"] != RUNNING else None
+        states.add(job_keys.get(key), info["state"], elapsed, info["exit_code"])
+    return states
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,95 @@
+from __future__ import annotations
+from pathlib import Path
+import codecs
+import ctypes
+import ctypes.util
+import os
+import select
+import sys
+import time
+
+class TailState:
+    """Position of an output file already parsed: byte offset, number of complete lines & trailing partial line.
+    The bytes are decoded incrementally, so that a character split between two reads is kept for the next one
+    (invalid UTF-8 is replaced by U+FFFD)."""
+    def __init__(self):
+        self.offset      = 0
+        self.line_number = 0
+        self.partial     = ""
+        self.decoder     = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.names: list[str]|None = None
+
+def read_new_lines(path: Path, state: TailState) -> list[str]|None:
+    """Complete lines appended since the last call (a line without "\\n" yet is kept for the next call).
+    Returns None if the file shrank, i.e. was rewritten, and must be read again from the start."""
+    size = path.stat().st_size
+    if size < state.offset:
+        return None
+    if size == state.offset:
+        return []
+    with path.open("rb") as file:
+        file.seek(state.offset)
+        data = file.read(size - state.offset)
+    state.offset += len(data)
+
+    chunks        = (state.partial + state.decoder.decode(data)).split("\n")
+    state.partial = chunks.pop()
+    lines         = [chunk.removesuffix("\r") + "\n" for chunk in chunks]
+    return lines
+
+IN_MODIFY      = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_CREATE      = 0x100
+IN_NONBLOCK    = 0o4000
+
+def _load_inotify():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        return libc if hasattr(libc, "inotify_init1") else None
+    except OSError as _:
+        return None
+
+class DirectoryWatcher:
+    """Waits for a file of the directory to be written: with inotify on Linux, otherwise by polling
+    with an interval doubling (up to max_interval) as long as nothing changes."""
+    def __init__(self, directory: Path, min_interval: float = 0.1, max_interval: float = 2.0):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval     = min_interval
+        self.fd: int|None = None
+        libc = _load_inotify()
+        if libc is not None:
+            fd = libc.inotify_init1(IN_NONBLOCK)
+            if fd >= 0 and libc.inotify_add_watch(fd, str(directory).encode(), IN_MODIFY | IN_CLOSE_WRITE | IN_CREATE) >= 0:
+                self.fd = fd
+            elif fd >= 0:
+                os.close(fd)
+
+    def uses_inotify(self) -> bool:
+        return self.fd is not None
+
+    def wait(self, changed: bool):
+        """Returns after a write in the directory (or max_interval) with inotify; otherwise after the current polling interval,
+        reset to min_interval if the last read found new data."""
+        if self.fd is not None:
+            ready, _, _ = select.select([self.fd], [], [], self.max_interval)
+            if ready:
+                time.sleep(self.min_interval) # lets writes accumulate
+                try:
+                    while os.read(self.fd, 65536):
+                        pass
+                except BlockingIOError as _:
+                    pass
+            return
+        self.interval = self.min_interval if changed else min(2*self.interval, self.max_interval)
+        time.sleep(self.interval)
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+if __name__ == "__main__":
+    pass
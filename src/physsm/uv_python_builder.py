@@ -1,31 +1,44 @@
 from .experiment_data import BaseExperimentData
 from .abstract_experiment import AbstractExperiment
 from .abstract_experiment_builder import AbstractExperimentBuilder
-from .runnner import IRunner
+from .output_sink import OutputSink
+from .runnner import IRunner, RunRecord, file_fingerprint
 from .path_logger import PathLogger
 from pathlib import Path
-from typing import override
-import subprocess
+from typing import Any, override
 
 
 class UvRunner(IRunner):
+    output_prefix = "uv: "
+
     def __init__(self, py_file: Path):
+        super().__init__()
         self.main_py = py_file
+
+    @override
+    def command_args(self, args: Path|str) -> list[str]:
+        return ["uv", "run", str(self.main_py), str(args)]
+
+    @override
+    def fingerprint(self) -> str:
+        sources = sorted(self.main_py.parent.glob("*.py"))
+        return ";".join([file_fingerprint(source) for source in sources])
+
+    @override
+    def config(self) -> dict[str, Any]:
+        return {"py_file": str(self.main_py)}
+
+    @override
+    @classmethod
+    def from_config(cls, config: dict[str, Any]) -> IRunner:
+        return cls(Path(config["py_file"]))
         
     
     @override
-    def run(self, cwd: Path, args: Path, verbose_log: bool = False, my_env: None | dict = None):
-        command = f"uv run {self.main_py} {args}"
-        if verbose_log:
-            print(f"Command: \"{command}\"")   
-        else:
-            print(f"Command: Executing \"{self.main_py.name}\" with \"{args.name}\"")   
-
-        with subprocess.Popen(command, stdout=subprocess.PIPE, bufsize=1, text=True, stderr=subprocess.STDOUT, cwd=cwd, env=my_env) as stream:
-            if stream.stdout is not None:
-                for lines in stream.stdout:
-                    print("uv: ", lines, end='')
-        print("")
+    def run(self, cwd: Path, args: Path, verbose_log: bool = False, my_env: None | dict = None, parameters: str|None = None, sink: OutputSink|None = None) -> RunRecord:
+        command = self.command_args(self.parameter_arg(args, parameters))
+        self.log_command(command, args, verbose_log)
+        return self._execute(command, cwd, my_env, parameters, sink)
 
 
 class PythonExperiment(AbstractExperiment):
@@ -33,7 +46,7 @@ class PythonExperiment(AbstractExperiment):
         super().__init__(exp_data)
 
     @override
-    def run(self, scale: int | float, env_var: dict | None = None, verbose_log=False) -> None:
+    def run(self, scale: int | float, env_var: dict | None = None, verbose_log=False) -> RunRecord|None:
         if self.runner is None:
             raise TypeError("run_executable() error: Runner not set [use: set_executable]")
         
@@ -42,12 +55,12 @@ class PythonExperiment(AbstractExperiment):
         try:
             param_path = self.get_parameter_path(scale)
         except KeyError as _:
-            print(">> run_cargo: cannot find parameter")            
-            return
+            self.events.error("run_error", f">> run_executable: cannot find parameter of {scale}", key=scale)
+            return None
 
         cwd  = self.paths_data.proj_dir
         args = param_path
-        self.runner.run(cwd, args, verbose_log, env_var)        
+        return self.runner.run(cwd, args, verbose_log, env_var, self.render_parameters(scale), self.make_sink(scale))        
 
 class PythonExperimentBuilder(AbstractExperimentBuilder):
     def __init__(self, proj_dir: Path, results_dir: str, exp_name: str, verbose_log: bool = False):
@@ -58,7 +71,7 @@ class PythonExperimentBuilder(AbstractExperimentBuilder):
         if not binary_path.exists():
             raise FileNotFoundError(f"set_executable(): Cannot find {binary_path}")
         self.runner = UvRunner(binary_path)
-        print(f">> Python file path set to \"{self.log_path(binary_path)}\" [Current mode: uv Python mode]")
+        self.paths_data.events.info("settings", f">> Python file path set to \"{self.log_path(binary_path)}\" [Current mode: uv Python mode]", path=binary_path)
     
     @override
     def build(self, load_only = False) -> PythonExperiment:
@@ -66,8 +79,9 @@ class PythonExperimentBuilder(AbstractExperimentBuilder):
         experiment.runner = self.runner
         if experiment.runner is None and not load_only:
             raise TypeError("Python UvRunner not set!")
-        
-        return PythonExperiment(experiment)
+        python_experiment = PythonExperiment(experiment)
+        python_experiment.save_manifest()
+        return python_experiment
     
 if __name__ == "__main__":
     pass
\ No newline at end of file
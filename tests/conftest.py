@@ -0,0 +1,58 @@
+from pathlib import Path
+import contextlib
+import io
+import sys
+import pytest
+
+from physsm.cpp_builder import CppExperiment, CppExperimentBuilder
+from physsm.experiment_output import ExperimentOutput
+
+SIMULATION = """#!/usr/bin/env python3
+import sys
+params = dict(line.split(":", 1) for line in open(sys.argv[1]).read().splitlines() if ":" in line)
+params = {key.strip(): value.strip() for key, value in params.items()}
+open(params["outputfile"], "w").write(f"{params['L']}, {params['steps']}\\n")
+"""
+
+class PairOutput(ExperimentOutput):
+    def __init__(self, file: Path):
+        super().__init__(file)
+        self.L: list[float] = []
+        self.v: list[float] = []
+
+    def parse_output(self, line_number: int, line: str):
+        L, v = line.split(",")
+        self.L.append(float(L))
+        self.v.append(float(v))
+
+@pytest.fixture
+def quiet():
+    with contextlib.redirect_stdout(io.StringIO()) as stdout:
+        yield stdout
+
+@pytest.fixture
+def simulation(tmp_path: Path) -> Path:
+    path = tmp_path.joinpath("sim.py")
+    path.write_text(SIMULATION.replace("/usr/bin/env python3", sys.executable))
+    path.chmod(0o755)
+    return path
+
+@pytest.fixture
+def make_builder(tmp_path: Path, simulation: Path, quiet):
+    """Builder of an experiment running sim.py, which writes "L, steps" to its output file."""
+    def make(name: str = "exp", steps: dict|None = None) -> CppExperimentBuilder:
+        builder = CppExperimentBuilder(tmp_path, "results", name)
+        builder.add_scaling_parameter("steps", steps or {2: 20, 4: 40, 8: 80})
+        builder.set_output_type(PairOutput)
+        builder.set_executable(simulation)
+        return builder
+    return make
+
+@pytest.fixture
+def make_experiment(make_builder):
+    """Built experiment (see make_builder) with its parameter files written."""
+    def make(name: str = "exp", steps: dict|None = None) -> CppExperiment:
+        experiment = make_builder(name, steps).build()
+        experiment.write_parameter_files()
+        return experiment
+    return make
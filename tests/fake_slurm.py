@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Local stand-in of sbatch / squeue / sacct / scancel for the tests, with the jobs kept in a json file:
+
+    fake_slurm.py <state.json> sbatch|squeue|sacct|scancel <arguments of the Slurm tool>
+    fake_slurm.py <state.json> run     runs the pending tasks (the "scheduler")
+    fake_slurm.py <state.json> purge   forgets every job, as after the accounting was purged
+
+Like Slurm, squeue fails with "Invalid job id specified" once no task of the array is pending or running."""
+from pathlib import Path
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+ACTIVE = ["PENDING", "RUNNING"]
+
+def slurm_commands(state_path: Path):
+    from physsm.slurm import SlurmCommands
+    base = [sys.executable, __file__, str(state_path)]
+    return SlurmCommands(sbatch=base + ["sbatch"], squeue=base + ["squeue"], sacct=base + ["sacct"], scancel=base + ["scancel"])
+
+def option(args: list[str], name: str) -> str:
+    return args[args.index(name) + 1]
+
+def sbatch(jobs: dict, args: list[str]):
+    script = args[-1]
+    array  = re.search(r"^#SBATCH --array=(\d+)-(\d+)", Path(script).read_text(), re.MULTILINE)
+    if array is None:
+        sys.exit("sbatch: error: no --array")
+    job_id = str(1000 + len(jobs))
+    jobs[job_id] = {"script": script, "tasks": {str(i): {"state": "PENDING", "exit_code": 0, "elapsed": 0}
+                                                for i in range(int(array[1]), int(array[2]) + 1)}}
+    print(job_id)
+
+def squeue(jobs: dict, args: list[str]):
+    job_id = option(args, "-j")
+    active = {i: task for i, task in jobs.get(job_id, {"tasks": {}})["tasks"].items() if task["state"] in ACTIVE}
+    if len(active) == 0:
+        sys.exit("slurm_load_jobs error: Invalid job id specified")
+    for i, task in active.items():
+        print(f"{job_id}_{i}|{task['state']}")
+
+def sacct(jobs: dict, args: list[str]):
+    job_id = option(args, "-j")
+    for i, task in jobs.get(job_id, {"tasks": {}})["tasks"].items():
+        print(f"{job_id}_{i}|{task['state']}|{task['exit_code']}:0|{task['elapsed']}")
+
+def scancel(jobs: dict, args: list[str]):
+    job_id, _, indices = args[-1].partition("_")
+    for i in indices.strip("[]").split(","):
+        task = jobs[job_id]["tasks"][i]
+        if task["state"] in ACTIVE:
+            task["state"] = "CANCELLED"
+
+def run(jobs: dict, args: list[str]):
+    for job in jobs.values():
+        for i, task in job["tasks"].items():
+            if task["state"] != "PENDING":
+                continue
+            start     = time.perf_counter()
+            completed = subprocess.run(["bash", job["script"]], env={**os.environ, "SLURM_ARRAY_TASK_ID": i})
+            task.update({"state": "COMPLETED" if completed.returncode == 0 else "FAILED", "exit_code": completed.returncode,
+                         "elapsed": round(time.perf_counter() - start)})
+
+def purge(jobs: dict, args: list[str]):
+    jobs.clear()
+
+def main():
+    state_path, command, args = Path(sys.argv[1]), sys.argv[2], sys.argv[3:]
+    jobs = json.loads(state_path.read_text()) if state_path.exists() else dict()
+    {"sbatch": sbatch, "squeue": squeue, "sacct": sacct, "scancel": scancel, "run": run, "purge": purge}[command](jobs, args)
+    state_path.write_text(json.dumps(jobs))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+from pathlib import Path
+import sys
+
+import numpy as np
+from conftest import PairOutput
+from physsm.adaptive import curvature_loss
+from physsm.cpp_builder import CppExperimentBuilder
+
+STEP_SIMULATION = """#!{python}
+import math, sys
+params = dict(line.split(":", 1) for line in open(sys.argv[1]).read().splitlines() if ":" in line)
+params = {{key.strip(): value.strip() for key, value in params.items()}}
+open(params["outputfile"], "w").write(f"{{params['T']}}, {{math.tanh(20*(float(params['T']) - 1.3))}}\\n")
+"""
+
+def step_experiment(tmp_path: Path, simulation: Path):
+    simulation.write_text(STEP_SIMULATION.format(python=sys.executable))
+    builder = CppExperimentBuilder(tmp_path, "results", "adaptive")
+    builder.set_scale_grid({"L": [8], "T": np.linspace(0.0, 2.0, 3)})
+    builder.set_output_type(PairOutput)
+    builder.set_executable(simulation)
+    return builder.build()
+
+def test_loss_is_largest_at_the_step():
+    x = np.linspace(0.0, 2.0, 9)
+    loss = curvature_loss(x, np.tanh(20*(x - 1.3)))
+    assert int(np.argmax(loss)) == 5 # [1.25, 1.5]
+    assert np.allclose(curvature_loss(x, 2*x), curvature_loss(x, x)) # straight lines only cost their length
+
+def test_stops_at_the_budget(tmp_path: Path, simulation: Path, quiet):
+    experiment = step_experiment(tmp_path, simulation)
+    sweep      = experiment.adaptive_sweep("T", lambda output: output.v[0], budget=5, batch=2)
+    assert [len(values) for values in sweep.history] == [2, 2, 1]
+    temperatures = experiment.get_scale_grid().axes["T"]
+    assert len(temperatures) == 3 + 5
+    assert all(experiment.has_output((8, T)) for T in temperatures)
+    assert all(1.0 < T < 1.5 for T in sweep.history[-1]) # the last point goes to the step
+
+def test_stops_at_min_step(tmp_path: Path, simulation: Path, quiet):
+    experiment = step_experiment(tmp_path, simulation)
+    sweep      = experiment.adaptive_sweep("T", lambda output: output.v[0], budget=100, batch=4, min_step=0.25)
+    temperatures = experiment.get_scale_grid().axes["T"]
+    assert sum(len(values) for values in sweep.history) == len(temperatures) - 3 < 100
+    assert np.min(np.diff(temperatures)) >= 0.25
+    assert sweep.propose(4) == []
@@ -0,0 +1,68 @@
+from pathlib import Path
+import shutil
+import pytest
+
+from physsm.cpp_builder import CppExperimentBuilder, SourceRunner
+
+pytestmark = pytest.mark.skipif(shutil.which("cc") is None, reason="needs a C compiler")
+
+MAIN = r"""
+#include <stdio.h>
+int scale(int L);
+int main(int argc, char **argv) {
+    FILE *params = fopen(argv[1], "r");
+    char line[4096], out[4096] = "";
+    int L = 0;
+    while (fgets(line, sizeof line, params)) {
+        sscanf(line, "L: %d", &L);
+        sscanf(line, "outputfile: %4095s", out);
+    }
+    FILE *file = fopen(out, "w");
+    fprintf(file, "%d, %d\n", L, scale(L));
+    return 0;
+}
+"""
+
+def make_sources(tmp_path: Path) -> list[Path]:
+    src = tmp_path.joinpath("src")
+    src.mkdir()
+    src.joinpath("main.c").write_text(MAIN)
+    src.joinpath("scale.c").write_text("int scale(int L) { int s = 0; for (int i = 0; i < L; i++) s += i; return s; }\n")
+    return [src.joinpath("main.c"), src.joinpath("scale.c")]
+
+def build(tmp_path: Path, sources: list[Path], pgo: bool):
+    builder = CppExperimentBuilder(tmp_path, "results", "exp")
+    builder.add_scaling_parameter("steps", {2: 20, 4: 40, 8: 80})
+    builder.set_sources(sources, name="sim", profile="portable", pgo=pgo)
+    experiment = builder.build()
+    experiment.set_progress(None)
+    return experiment
+
+def test_pgo_stages_keep_their_objects(tmp_path: Path, quiet):
+    sources    = make_sources(tmp_path)
+    experiment = build(tmp_path, sources, pgo=True)
+    runner     = experiment.runner
+    assert isinstance(runner, SourceRunner)
+    generated = runner.stage_object_path(sources[0], "generate")
+    used      = runner.stage_object_path(sources[0], "use")
+    assert generated.exists() and used.exists()
+    mtime = generated.stat().st_mtime_ns
+
+    sources[1].write_text(sources[1].read_text() + "// changed\n")
+    build(tmp_path, sources, pgo=True)
+    assert generated.stat().st_mtime_ns == mtime # main.c is not instrumented again
+    assert runner.stage_object_path(sources[1], "generate").stat().st_mtime_ns > mtime
+
+def test_sources_are_checked_once_per_sweep(tmp_path: Path, quiet, monkeypatch):
+    experiment = build(tmp_path, make_sources(tmp_path), pgo=False)
+    experiment.write_parameter_files()
+    runner = experiment.runner
+    assert isinstance(runner, SourceRunner)
+    checks = []
+    needs_build = runner.needs_build
+    monkeypatch.setattr(runner, "needs_build", lambda: checks.append(1) or needs_build())
+    results = experiment.run_all(max_workers=2, use_cache=False)
+    assert all(record.is_success() for record in results.values())
+    assert len(checks) == 1
+    experiment.run(2) # outside of a sweep: checked again
+    assert len(checks) == 2
@@ -0,0 +1,61 @@
+from pathlib import Path
+import sys
+
+import numpy as np
+import pytest
+from conftest import PairOutput
+from physsm.ensemble import Replica, WelfordAccumulator
+from physsm.lazy_results import load_output
+
+SEEDED_SIMULATION = """#!{python}
+import random, sys
+params = dict(line.split(":", 1) for line in open(sys.argv[1]).read().splitlines() if ":" in line)
+params = {{key.strip(): value.strip() for key, value in params.items()}}
+rng    = random.Random(int(params["seed"]))
+open(params["outputfile"], "w").write("".join(f"{{params['L']}}, {{rng.gauss(1.0, 0.5)}}\\n" for _ in range(3)))
+"""
+
+def pair_output(tmp_path: Path, name: str, rows: np.ndarray) -> PairOutput:
+    path = tmp_path.joinpath(name)
+    path.write_text("".join(f"{L}, {float(v)!r}\n" for L, v in rows))
+    return load_output(PairOutput, path)
+
+def test_welford_matches_numpy(tmp_path: Path):
+    rng         = np.random.default_rng(3)
+    values      = 1e6 + rng.normal(0.0, 1e-3, size=(50, 4)) # large mean, small spread
+    accumulator = WelfordAccumulator()
+    for i, row in enumerate(values):
+        accumulator.add(pair_output(tmp_path, f"out_{i}.txt", np.column_stack([np.arange(4), row])))
+    stats = accumulator.get_statistics()
+    assert stats.count == 50
+    assert np.allclose(stats.mean["v"], values.mean(axis=0), rtol=0, atol=1e-9)
+    assert np.allclose(stats.variance["v"], values.var(axis=0, ddof=1), rtol=1e-6)
+    assert np.allclose(stats.std_error["v"], values.std(axis=0, ddof=1)/np.sqrt(50), rtol=1e-6)
+    assert np.array_equal(stats.variance["L"], np.zeros(4))
+
+def test_welford_single_replica_and_shape_mismatch(tmp_path: Path):
+    accumulator = WelfordAccumulator()
+    with pytest.raises(ValueError):
+        accumulator.get_statistics()
+    accumulator.add(pair_output(tmp_path, "one.txt", np.array([[0, 1.0], [1, 2.0]])))
+    assert np.isnan(accumulator.get_statistics().variance["v"]).all()
+    with pytest.raises(ValueError):
+        accumulator.add(pair_output(tmp_path, "two.txt", np.array([[0, 1.0]])))
+
+def test_replica_seeds(make_experiment, simulation: Path):
+    simulation.write_text(SEEDED_SIMULATION.format(python=sys.executable))
+    experiment = make_experiment()
+    replicas   = experiment.get_replicas(8, 4, first_seed=10)
+    assert replicas == [Replica(8, seed) for seed in range(10, 14)]
+    assert experiment.get_parameter_path(replicas[1]).name.endswith(",seed=11.txt")
+
+    stats = experiment.run_replicas(8, 4, first_seed=10)
+    assert "seed: 12" in experiment.get_parameter_path(replicas[2]).read_text()
+    outputs = [load_output(PairOutput, experiment.get_output(replica)).v for replica in replicas]
+    assert len({tuple(v) for v in outputs}) == 4 # every replica got its own seed
+    assert stats.count == 4
+    assert np.allclose(stats.mean["v"], np.mean(outputs, axis=0))
+    assert np.allclose(stats.variance["v"], np.var(outputs, axis=0, ddof=1))
+
+    experiment.get_output(replicas[0]).unlink()
+    assert experiment.aggregate_replicas(8, 4, first_seed=10).count == 3
@@ -0,0 +1,33 @@
+from physsm.cpp_builder import CppExperimentBuilder
+from physsm.events import Event
+
+def test_levels_and_callbacks(make_experiment, quiet):
+    experiment = make_experiment()
+    experiment.set_log_level("warning")
+    events: list[Event] = []
+    experiment.add_event_callback(events.append, level="info")
+    quiet.truncate(0)
+    quiet.seek(0)
+
+    experiment.run_all(max_workers=2)
+    experiment.status()
+    experiment.consolidate()
+
+    assert quiet.getvalue() == ""
+    kinds = {event.kind for event in events}
+    assert {"run_start", "summary", "status"} <= kinds
+    assert all(event.level != "debug" for event in events)
+
+def test_quiet_builder(tmp_path, simulation, quiet):
+    builder = CppExperimentBuilder(tmp_path, "results", "exp")
+    builder.set_log_level("warning")
+    quiet.truncate(0)
+    quiet.seek(0)
+
+    builder.add_scaling_parameter("steps", {2: 20, 4: 40})
+    builder.add_static_parameter("T", 2.0)
+    builder.set_static_parameter("T", 2.5)
+    builder.set_executable(simulation)
+    experiment = builder.build()
+    experiment.parameters.set_scaling_parameter("steps", {2: 10, 4: 20})
+    assert quiet.getvalue() == ""
@@ -0,0 +1,86 @@
+from pathlib import Path
+import json
+import numpy as np
+import pytest
+
+from physsm.experiment_output import BinaryOutput, ColumnarOutput, header_path, write_binary_header
+
+class EnergyOutput(ColumnarOutput):
+    columns      = {"step": np.int64, "energy": np.float64, "phase": "U8"}
+    delimiter    = ","
+    header_lines = 1
+
+def test_columnar_header_and_dtypes(tmp_path: Path):
+    path = tmp_path.joinpath("out.txt")
+    path.write_text("step, energy, phase\n# comment line\n0, -1.5,ordered\n1, -0.25,disordered\n")
+    output = EnergyOutput(path)
+    output.grab_files()
+    assert output.step.dtype == np.int64 and output.energy.dtype == np.float64 and output.phase.dtype == np.dtype("U8")
+    assert list(output.step) == [0, 1]
+    assert np.array_equal(output.energy, [-1.5, -0.25])
+    assert list(output.phase) == ["ordered", "disorder"] # truncated to the declared width
+    assert output.energy.flags["C_CONTIGUOUS"]
+
+def test_columnar_single_row(tmp_path: Path):
+    path = tmp_path.joinpath("out.txt")
+    path.write_text("step, energy, phase\n3, 2.0, x\n")
+    output = EnergyOutput(path)
+    output.grab_files()
+    assert output.step.shape == (1,) and output.energy[0] == 2.0
+
+def test_columnar_follow_skips_the_header(tmp_path: Path):
+    path   = tmp_path.joinpath("out.txt")
+    output = EnergyOutput(path)
+    path.write_text("step, energy, phase\n0, -1.5")
+    assert output.follow() == 1 # the header only, the row is not complete yet
+    with path.open("a") as file:
+        file.write(",a\n1, -2.5,b\n")
+    assert output.follow() == 2
+    assert list(output.step) == [0, 1] and np.array_equal(output.energy, [-1.5, -2.5])
+    assert output.step.dtype == np.int64 and list(output.phase) == ["a", "b"]
+
+def test_columnar_needs_columns(tmp_path: Path):
+    path = tmp_path.joinpath("out.txt")
+    path.write_text("1, 2\n")
+    with pytest.raises(ValueError):
+        ColumnarOutput(path).grab_files()
+
+class SpinOutput(BinaryOutput):
+    npy_name = "spins"
+
+def test_binary_raw_is_memory_mapped(tmp_path: Path):
+    path   = tmp_path.joinpath("out.bin")
+    energy = np.linspace(0.0, 1.0, 10)
+    spins  = np.arange(40, dtype=np.int8).reshape(10, 2, 2)
+    path.write_bytes(energy.tobytes() + spins.tobytes())
+    write_binary_header(path, [("energy", energy.dtype, energy.shape), ("spins", spins.dtype, spins.shape), ("empty", "<f4", (0,))])
+    output = BinaryOutput(path)
+    output.grab_files()
+    assert isinstance(output.energy, np.memmap) and isinstance(output.spins, np.memmap)
+    assert np.array_equal(output.energy, energy) and np.array_equal(output.spins, spins)
+    assert output.empty.shape == (0,) and output.empty.dtype == np.float32
+
+def test_binary_header_offsets(tmp_path: Path):
+    path   = tmp_path.joinpath("out.bin")
+    energy = np.arange(4, dtype="<f8")
+    count  = np.array([7, 9], dtype="<i4")
+    path.write_bytes(b"PREAMBLE" + energy.tobytes() + b"\0"*8 + count.tobytes())
+    header_path(path).write_text(json.dumps({"arrays": [{"name": "energy", "dtype": "<f8", "shape": [4], "offset": 8},
+                                                        {"name": "count",  "dtype": "<i4", "shape": [2], "offset": 48}]}))
+    output = BinaryOutput(path)
+    output.grab_files()
+    assert np.array_equal(output.energy, energy) and list(output.count) == [7, 9]
+    assert output.energy.offset == 8 and output.count.offset == 48
+
+def test_binary_npy_and_missing_header(tmp_path: Path):
+    spins = np.ones((3, 4), dtype=np.int8)
+    np.save(tmp_path.joinpath("out.npy"), spins)
+    output = SpinOutput(tmp_path.joinpath("out.npy"))
+    output.grab_files()
+    assert isinstance(output.spins, np.memmap) and np.array_equal(output.spins, spins)
+
+    tmp_path.joinpath("other.bin").write_bytes(b"\0"*8)
+    with pytest.raises(ValueError):
+        BinaryOutput(tmp_path.joinpath("other.bin")).grab_files()
+    with pytest.raises(NotImplementedError):
+        output.follow()
@@ -0,0 +1,123 @@
+from pathlib import Path
+import os
+import subprocess
+import sys
+import numpy as np
+import pytest
+
+from physsm.experiment_store import ExperimentStore, STORE_FILE
+from physsm.lazy_results import load_output
+from conftest import PairOutput
+
+def make_output(path: Path, L: int) -> PairOutput:
+    path.write_text(f"{L}, {L*10}\n")
+    return load_output(PairOutput, path)
+
+def test_put_and_get(tmp_path: Path):
+    store = ExperimentStore(tmp_path.joinpath(STORE_FILE))
+    assert store.put([(make_output(tmp_path.joinpath("out_L=2.txt"), 2), "L: 2\n")], {"static": {"a": np.arange(3)}}) == 1
+    assert store.put([(make_output(tmp_path.joinpath("out_L=4.txt"), 4), None)]) == 1
+
+    reopened = ExperimentStore(tmp_path.joinpath(STORE_FILE))
+    assert sorted(reopened.keys()) == ["out_L=2.txt", "out_L=4.txt"]
+    output = reopened.get("out_L=4.txt", PairOutput, tmp_path.joinpath("out_L=4.txt"))
+    assert list(output.v) == [40.0]
+    assert reopened.get_parameter_text("out_L=2.txt") == "L: 2\n"
+    assert reopened.get_parameters() == {"static": {"a": [0, 1, 2]}}
+
+def test_shadowed_outputs_are_compacted(tmp_path: Path):
+    store = ExperimentStore(tmp_path.joinpath(STORE_FILE))
+    out   = tmp_path.joinpath("out_L=2.txt")
+    store.put([(make_output(out, 2), None)])
+    store.put([(make_output(out, 3), None)])
+    assert store.n_stale > 0
+    assert store.compact() > 0
+    assert store.n_stale == 0
+    assert list(store.get(out.name, PairOutput, out).v) == [30.0]
+
+def test_interrupted_put_keeps_the_store(tmp_path: Path, monkeypatch):
+    path  = tmp_path.joinpath(STORE_FILE)
+    store = ExperimentStore(path)
+    store.put([(make_output(tmp_path.joinpath("out_L=2.txt"), 2), None)])
+    before = path.read_bytes()
+
+    def crash(*args, **kwargs):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(np.lib.format, "write_array", crash)
+    with pytest.raises(KeyboardInterrupt):
+        store.put([(make_output(tmp_path.joinpath("out_L=4.txt"), 4), None)])
+
+    assert path.read_bytes() == before
+    assert list(tmp_path.glob(f".{STORE_FILE}*")) == []
+    assert ExperimentStore(path).keys() == ["out_L=2.txt"]
+
+def test_corrupt_store(make_experiment):
+    experiment = make_experiment()
+    experiment.run_all(max_workers=2)
+    experiment.consolidate()
+    store_path = experiment.paths_data.target_dir.joinpath(STORE_FILE)
+    store_path.write_bytes(store_path.read_bytes()[:100])
+
+    experiment = make_experiment() # the store is read on first use
+    with pytest.raises(ValueError, match="corrupt"):
+        experiment.get_results()
+    with pytest.raises(ValueError, match="corrupt"):
+        experiment.consolidate()
+    assert store_path.stat().st_size == 100
+
+def test_consolidate_runs(make_experiment):
+    experiment = make_experiment(steps={L: L for L in range(1, 41)})
+    experiment.set_consolidate_runs(remove_outputs=True)
+    experiment.run_all(max_workers=4)
+    assert len(experiment.get_store()) == 40
+    assert list(experiment.paths_data.target_dir.glob("out_*")) == []
+    results = experiment.get_results()
+    assert sorted(float(results[L].v[0]) for L in results) == [float(L) for L in range(1, 41)]
+
+def test_put_appends_in_place(tmp_path: Path):
+    path  = tmp_path.joinpath(STORE_FILE)
+    store = ExperimentStore(path)
+    store.put([(make_output(tmp_path.joinpath("out_L=2.txt"), 2), None)])
+    inode = path.stat().st_ino
+    store.put([(make_output(tmp_path.joinpath("out_L=4.txt"), 4), None)])
+    assert path.stat().st_ino == inode
+    assert sorted(ExperimentStore(path).keys()) == ["out_L=2.txt", "out_L=4.txt"]
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_crashed_append_is_rolled_back(tmp_path: Path):
+    path  = tmp_path.joinpath(STORE_FILE)
+    store = ExperimentStore(path)
+    store.put([(make_output(tmp_path.joinpath("out_L=2.txt"), 2), None)])
+    before = path.read_bytes()
+
+    def crash(archive):
+        archive.writestr("out_L=4.txt/partial.npy", b"x"*1000)
+        archive.fp.flush()
+        os._exit(1) # no cleanup: the central directory is overwritten and never rewritten
+    child = os.fork()
+    if child == 0:
+        ExperimentStore(path)._append(crash)
+    os.waitpid(child, 0)
+    assert path.read_bytes() != before
+
+    assert ExperimentStore(path).keys() == ["out_L=2.txt"]
+    assert path.read_bytes() == before
+
+def test_concurrent_writers(tmp_path: Path):
+    script = """
+import sys
+from pathlib import Path
+from physsm.experiment_store import ExperimentStore
+from physsm.lazy_results import load_output
+from conftest import PairOutput
+store = ExperimentStore(Path(sys.argv[1]))
+for i in range(10):
+    out = Path(sys.argv[1]).with_name(f"out_{sys.argv[2]}_{i}.txt")
+    out.write_text("1, 2\\n")
+    store.put([(load_output(PairOutput, out), None)])
+"""
+    path    = tmp_path.joinpath(STORE_FILE)
+    env     = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    writers = [subprocess.Popen([sys.executable, "-c", script, str(path), name], env=env) for name in ["a", "b", "c"]]
+    assert [writer.wait() for writer in writers] == [0, 0, 0]
+    assert len(ExperimentStore(path)) == 30
@@ -0,0 +1,86 @@
+from pathlib import Path
+import os
+import subprocess
+import sys
+import pytest
+
+from physsm.job_queue import JobQueue, JOB_QUEUE_FILE, PENDING, RUNNING, DONE, CANCELLED, is_same_process, process_start
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+def submit(queue: JobQueue, tmp_path: Path, keys: list[str]):
+    queue.submit([{"key": key, "command": [sys.executable, "-c", "pass"], "cwd": tmp_path, "env": None,
+                   "log_path": tmp_path.joinpath(f"{key}.log"), "cache_key": None} for key in keys])
+
+def test_recover_jobs_of_dead_workers(tmp_path: Path):
+    queue = JobQueue(tmp_path.joinpath(JOB_QUEUE_FILE))
+    submit(queue, tmp_path, ["2", "4"])
+    job = queue.claim_next(dead_pid())
+    assert job is not None and queue.count()[RUNNING] == 1
+    assert queue.recover() == 1
+    assert queue.count()[PENDING] == 2
+
+def test_cancel_claimed_job_without_process(tmp_path: Path):
+    queue = JobQueue(tmp_path.joinpath(JOB_QUEUE_FILE))
+    submit(queue, tmp_path, ["2"])
+    job = queue.claim_next(dead_pid())
+    assert queue.cancel(["2"]) == 1
+    assert not queue.set_pid(job["key"], 12345)
+    assert queue.count()[CANCELLED] == 1
+
+def test_wait_recovers_running_job_of_dead_worker(make_experiment):
+    experiment = make_experiment()
+    experiment.set_progress(None)
+    experiment.submit_all(max_workers=2)
+    assert experiment.wait(timeout=30, poll_interval=0.1)
+    for output in experiment.paths_data.target_dir.glob("out_*"):
+        output.unlink()
+    experiment.invalidate_cache()
+
+    queue = experiment.get_job_queue() # nothing pending, one job "running" on a dead worker:
+    with queue.connect() as connection:
+        connection.execute("UPDATE jobs SET status = ?, worker_pid = ?, exit_code = NULL", (DONE, None))
+        connection.execute("UPDATE jobs SET status = ?, worker_pid = ? WHERE key = ?", (RUNNING, dead_pid(), "8"))
+    assert experiment.wait(timeout=30, poll_interval=0.1)
+    assert queue.count()[DONE] == 3
+    assert experiment.get_output(8).exists()
+
+def test_finished_jobs_are_recorded(make_experiment):
+    experiment = make_experiment()
+    experiment.set_progress(None)
+    experiment.submit_all(max_workers=2)
+    assert experiment.wait(timeout=30, poll_interval=0.1)
+    records = experiment.get_run_records()
+    assert sorted(record.scale for record in records) == sorted(experiment.paths_data.param_paths)
+    assert all(record.is_success() and record.wall_time > 0 for record in records)
+    assert experiment.submit_all(max_workers=2) == 0
+
+def test_submit_without_parameter_files(make_builder):
+    experiment = make_builder().build()
+    with pytest.raises(ValueError, match="write_parameter_files"):
+        experiment.submit_all()
+
+def test_recover_terminates_simulation_of_dead_worker(tmp_path: Path):
+    queue = JobQueue(tmp_path.joinpath(JOB_QUEUE_FILE))
+    submit(queue, tmp_path, ["2"])
+    job = queue.claim_next(dead_pid())
+    simulation = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    assert queue.set_pid(job["key"], simulation.pid, process_start(simulation.pid))
+    assert queue.recover() == 0 # still running: terminated, not requeued
+    assert queue.count()[RUNNING] == 1
+    assert simulation.wait(timeout=10) != 0
+    assert queue.recover() == 1
+    assert queue.count()[PENDING] == 1
+
+def test_reused_pids_are_not_trusted(tmp_path: Path):
+    queue = JobQueue(tmp_path.joinpath(JOB_QUEUE_FILE))
+    submit(queue, tmp_path, ["2", "4"])
+    queue.claim_next(os.getpid(), "not the start time of this process")
+    assert queue.recover() == 1
+    job = queue.claim_next(dead_pid())
+    assert queue.set_pid(job["key"], os.getpid(), "not the start time of this process")
+    assert queue.cancel() == 2 # does not send SIGTERM to this process
+    assert is_same_process(os.getpid(), process_start(os.getpid()))
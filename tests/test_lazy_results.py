@@ -0,0 +1,35 @@
+import pytest
+
+from physsm.lazy_results import LazyResults
+
+def test_loads_on_access_only():
+    calls: list = []
+    results = LazyResults([2, 4, 8], lambda L: calls.append(L) or f"output {L}")
+    assert len(results) == 3 and list(results) == [2, 4, 8] and 4 in results
+    assert calls == []
+    assert results[4] == "output 4" and results[4] == "output 4"
+    assert calls == [4] and results.is_loaded(4) and not results.is_loaded(8)
+    with pytest.raises(KeyError):
+        results[16]
+    results.unload(4)
+    assert results[4] == "output 4" and calls == [4, 4]
+
+def test_get_results_serial_is_lazy(make_experiment, monkeypatch):
+    experiment = make_experiment()
+    experiment.run_all(max_workers=2)
+    loaded: list = []
+    load_output = experiment._load_output
+    monkeypatch.setattr(experiment, "_load_output", lambda L, use_cache=True: loaded.append(L) or load_output(L, use_cache))
+    results = experiment.get_results(use_cache=False)
+    assert sorted(results) == [2, 4, 8] and loaded == []
+    assert list(results[8].v) == [80.0]
+    assert loaded == [8] and not results.is_loaded(2)
+
+def test_get_results_parallel(make_experiment):
+    experiment = make_experiment()
+    experiment.run_all(max_workers=2)
+    experiment.get_output(2).unlink()
+    results = experiment.get_results(parallel=True, max_workers=2, use_cache=False)
+    assert sorted(results) == [4, 8]
+    assert all(results.is_loaded(L) for L in results)
+    assert {L: list(results[L].v) for L in results} == {4: [40.0], 8: [80.0]}
@@ -0,0 +1,55 @@
+from pathlib import Path
+import numpy as np
+import pytest
+
+from conftest import PairOutput
+from physsm.abstract_experiment import AbstractExperiment
+from physsm.cpp_builder import BinaryRunner, CppExperiment, CppExperimentBuilder
+from physsm.rust_builder import RustExperiment
+
+def assert_same_experiment(loaded: AbstractExperiment, experiment: AbstractExperiment):
+    assert type(loaded) is type(experiment) and loaded.out_type is experiment.out_type
+    assert isinstance(loaded.runner, BinaryRunner) and isinstance(experiment.runner, BinaryRunner)
+    assert loaded.runner.binary == experiment.runner.binary
+    assert list(loaded.get_scale_variables()) == list(experiment.get_scale_variables())
+    for L in experiment.get_scale_variables():
+        assert loaded.get_parameter_path(L) == experiment.get_parameter_path(L)
+        assert loaded.get_output(L) == experiment.get_output(L)
+        assert loaded.render_parameters_for(L, loaded.get_output(L)) == experiment.render_parameters_for(L, experiment.get_output(L))
+
+def test_round_trip(make_builder):
+    builder = make_builder(steps={2: 20, 4: 40, 8: 80})
+    builder.add_static_parameter("temperatures", np.linspace(0.5, 2.0, 4))
+    builder.add_static_parameter("model", "ising")
+    experiment = builder.build()
+    loaded     = AbstractExperiment.load_experiment(experiment.paths_data.target_dir)
+    assert_same_experiment(loaded, experiment)
+    assert np.array_equal(loaded.parameters.static_params["temperatures"], np.linspace(0.5, 2.0, 4))
+    assert loaded.parameters.scaling_params["steps"] == {2: 20, 4: 40, 8: 80}
+
+    loaded.write_parameter_files()
+    records = loaded.run_all(max_workers=2)
+    assert all(record.is_success() for record in records.values())
+    assert list(loaded.get_results()[8].v) == [80.0]
+
+def test_round_trip_of_a_grid(tmp_path: Path, simulation: Path, quiet):
+    builder = CppExperimentBuilder(tmp_path, "results", "grid")
+    builder.set_scale_grid({"L": [4, 8], "T": np.linspace(1.0, 2.0, 3)})
+    builder.add_grid_parameter("steps", lambda L, T: int(10*L*T), axes=["L", "T"])
+    builder.add_grid_parameter("field", {4: np.zeros(3), 8: np.ones(3)}, axes=["L"])
+    builder.set_output_type(PairOutput)
+    builder.set_executable(simulation)
+    experiment = builder.build()
+    experiment.get_replicas((8, 1.5), 2)
+    loaded = CppExperiment.load_experiment(tmp_path.joinpath("results", "grid"))
+    assert_same_experiment(loaded, experiment)
+    assert loaded.get_scale_grid().axes == experiment.get_scale_grid().axes
+    assert loaded.get_parameter_path((8, 2.0)).name == "parameter_L=8,T=2.0.txt"
+    assert "steps: 160" in loaded.render_parameters_for((8, 2.0), loaded.get_output((8, 2.0)))
+
+def test_load_errors(make_experiment, tmp_path: Path):
+    experiment = make_experiment()
+    with pytest.raises(TypeError):
+        RustExperiment.load_experiment(experiment.paths_data.target_dir)
+    with pytest.raises(ValueError):
+        AbstractExperiment.load_experiment(tmp_path.joinpath("nothing here"))
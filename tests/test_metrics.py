@@ -0,0 +1,49 @@
+from pathlib import Path
+import numpy as np
+import pytest
+
+from physsm.abstract_experiment import AbstractExperiment
+from physsm.ensemble import Replica
+from physsm.metrics import MetricsLog, parse_scale, fit_power_law
+from physsm.runnner import RunRecord
+
+@pytest.mark.parametrize("scale", [4, 2.25, (4, np.float64(2.25), 0), Replica(4, 2), Replica((8, np.float64(2.5)), 1, "rng")])
+def test_parse_scale(scale):
+    assert parse_scale(repr(scale)) == scale
+
+def test_load_records(tmp_path: Path):
+    metrics = MetricsLog(tmp_path)
+    for L, wall_time in [(2, 1.0), (4, 4.0), (Replica(8, 0), 16.0), (Replica(8, 1), 16.0)]:
+        metrics.append(RunRecord(L, 0, wall_time))
+    metrics.append(RunRecord(16, 1, 1.0))
+
+    records = metrics.load()
+    assert [record.scale for record in records] == [2, 4, Replica(8, 0), Replica(8, 1), 16]
+    model = fit_power_law(records)
+    assert model.exponent == pytest.approx(2.0)
+    assert model(32) == pytest.approx(256.0)
+
+def test_unknown_scales_are_skipped(tmp_path: Path):
+    metrics = MetricsLog(tmp_path)
+    metrics.path.write_text('{"scale": "<object>", "exit_code": 0, "wall_time": 3.0}\n')
+    for L, wall_time in [(2, 1.0), (4, 2.0)]:
+        metrics.append(RunRecord(L, 0, wall_time))
+    records = metrics.load()
+    assert records[0].scale == "<object>"
+    assert fit_power_law(records).exponent == pytest.approx(1.0)
+
+def test_runtime_scaling_after_replicas(make_experiment):
+    experiment = make_experiment()
+    experiment.run_all(max_workers=2)
+    experiment.run_replicas(4, 2, max_workers=2)
+
+    reopened = AbstractExperiment.load_experiment(experiment.paths_data.target_dir)
+    records  = reopened.get_run_records()
+    assert Replica(4, 1) in [record.scale for record in records]
+    assert reopened.fit_runtime_scaling().n_points == len(records)
+
+def test_power_law_of_zero_size():
+    records = [RunRecord((8, T), 0, 0.1/(1 + T)) for T in [0.0, 1.0, 2.0]] # negative exponent
+    model   = fit_power_law(records)
+    assert model.n_points == 2 # (8, 0.0) has size 0 and is left out
+    assert model((8, 0.0)) == 0.0 and model((8, 1.0)) > 0
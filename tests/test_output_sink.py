@@ -0,0 +1,40 @@
+from pathlib import Path
+import sys
+
+from physsm.cpp_builder import BinaryRunner
+from physsm.output_sink import CallbackSink, DiscardSink, FileSink, StdoutSink
+
+ECHO_ARGS = """import sys
+print("argv:", sys.argv[1])
+sys.stdout.write("no newline at the end")
+"""
+
+def echo_runner(tmp_path: Path) -> BinaryRunner:
+    path = tmp_path.joinpath("echo.py")
+    path.write_text(f"#!{sys.executable}\n{ECHO_ARGS}")
+    path.chmod(0o755)
+    return BinaryRunner(path)
+
+def test_argv_is_passed_without_a_shell(tmp_path: Path):
+    lines: list[str] = []
+    args   = tmp_path.joinpath("parameter $(touch pwned); L=8 'x'.txt")
+    record = echo_runner(tmp_path).run(tmp_path, args, sink=CallbackSink(lines.append))
+    assert record.is_success()
+    assert lines == [f"argv: {args}", "no newline at the end"]
+    assert not tmp_path.joinpath("pwned").exists()
+
+def test_stdout_sink(tmp_path: Path, capsys):
+    record = echo_runner(tmp_path).run(tmp_path, Path("p.txt"), sink=StdoutSink("C/C++:"))
+    assert capsys.readouterr().out == "C/C++: argv: p.txt\nC/C++: no newline at the end\n"
+    assert record.output_bytes == len("argv: p.txt\nno newline at the end")
+
+def test_file_sink(tmp_path: Path):
+    log_path = tmp_path.joinpath("out.log")
+    record   = echo_runner(tmp_path).run(tmp_path, Path("p.txt"), sink=FileSink(log_path))
+    assert log_path.read_text() == "argv: p.txt\nno newline at the end"
+    assert record.output_bytes == log_path.stat().st_size
+
+def test_discard_sink(tmp_path: Path, capfd):
+    record = echo_runner(tmp_path).run(tmp_path, Path("p.txt"), sink=DiscardSink())
+    assert record.is_success() and record.output_bytes is None
+    assert capfd.readouterr().out == ""
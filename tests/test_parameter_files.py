@@ -0,0 +1,69 @@
+from pathlib import Path
+import numpy as np
+import pytest
+
+from physsm.cpp_builder import CppExperimentBuilder
+from conftest import PairOutput
+
+def read_parameters(path: Path) -> dict[str, str]:
+    return {key.strip(): value.strip() for key, _, value in (line.partition(":") for line in path.read_text().splitlines())}
+
+@pytest.mark.parametrize("sidecar_format, extension", [("npy", ".npy"), ("raw", ".bin")])
+def test_sidecar_names_with_float_scales(tmp_path: Path, simulation: Path, quiet, sidecar_format: str, extension: str):
+    builder = CppExperimentBuilder(tmp_path, "results", "grid")
+    builder.set_scale_grid({"L": [4], "T": [2.0, 2.25, 2.5]})
+    builder.add_grid_parameter("field", lambda L, T: np.full(20, T), axes=["L", "T"])
+    builder.set_output_type(PairOutput)
+    builder.set_executable(simulation)
+    experiment = builder.build()
+    experiment.write_parameter_files(sidecar_size=10, sidecar_format=sidecar_format)
+
+    sidecars = dict()
+    for L in experiment.get_scale_variables():
+        sidecar = Path(read_parameters(experiment.get_parameter_path(L))["field"])
+        assert sidecar.name.endswith(extension)
+        values  = np.load(sidecar) if sidecar_format == "npy" else np.fromfile(sidecar, dtype="<f8")
+        assert np.all(values == L[1])
+        sidecars[L] = sidecar
+    assert len(set(sidecars.values())) == 3
+
+def test_training_parameters_with_replicas(tmp_path: Path, make_experiment):
+    experiment = make_experiment()
+    experiment.get_replicas(4, 2)
+    path = experiment.write_training_parameters(tmp_path.joinpath("pgo"))
+    assert path is not None
+    parameters = read_parameters(path)
+    assert parameters["L"] == "2"
+    assert Path(parameters["outputfile"]).parent == tmp_path.joinpath("pgo")
+
+def test_changed_sidecar_invalidates_run_cache(make_builder):
+    builder = make_builder()
+    builder.add_static_parameter("field", np.zeros(20))
+    experiment = builder.build()
+    experiment.set_progress(None)
+    assert experiment.write_parameter_files(sidecar_size=10)["written"] == 3
+    assert not any(record.cached for record in experiment.run_all(max_workers=2).values())
+    assert all(record.cached for record in experiment.run_all(max_workers=2).values())
+
+    experiment.parameters.static_params["field"] = np.ones(20)
+    counts = experiment.write_parameter_files(sidecar_size=10)
+    assert counts["written"] == 3 and counts["unchanged"] == 0
+    assert not any(record.cached for record in experiment.run_all(max_workers=2).values())
+
+def test_unchanged_files_are_not_rewritten(make_builder):
+    builder = make_builder()
+    builder.add_static_parameter("field", np.zeros(20))
+    experiment = builder.build()
+    assert experiment.write_parameter_files(sidecar_size=10, io_workers=4) == {"written": 3, "unchanged": 0, "failed": 0}
+    paths = [experiment.get_parameter_path(L) for L in experiment.get_scale_variables()]
+    paths.append(Path(read_parameters(paths[0])["field"]))
+    before = {path: (path.stat().st_ino, path.stat().st_mtime_ns) for path in paths}
+
+    assert experiment.write_parameter_files(sidecar_size=10) == {"written": 0, "unchanged": 3, "failed": 0}
+    assert {path: (path.stat().st_ino, path.stat().st_mtime_ns) for path in paths} == before
+
+    experiment.parameters.scaling_params["steps"][4] = 41
+    assert experiment.write_parameter_files(sidecar_size=10) == {"written": 1, "unchanged": 2, "failed": 0}
+    changed = experiment.get_parameter_path(4)
+    assert read_parameters(changed)["steps"] == "41" and changed.stat().st_ino != before[changed][0]
+    assert list(changed.parent.glob(".*.tmp")) == []
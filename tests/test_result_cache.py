@@ -0,0 +1,58 @@
+from pathlib import Path
+import os
+
+import numpy as np
+from conftest import PairOutput
+from physsm.experiment_output import BinaryOutput, write_binary_header
+from physsm.lazy_results import load_output
+from physsm.result_cache import ResultCache
+
+def cached_output(tmp_path: Path) -> tuple[ResultCache, Path]:
+    out_path = tmp_path.joinpath("out.txt")
+    out_path.write_text("8, 80\n16, 160\n")
+    cache = ResultCache(tmp_path)
+    assert cache.load(PairOutput, out_path) is None
+    assert cache.store(load_output(PairOutput, out_path))
+    return cache, out_path
+
+def test_hit(tmp_path: Path):
+    cache, out_path = cached_output(tmp_path)
+    output = cache.load(PairOutput, out_path)
+    assert isinstance(output, PairOutput) and output.file == out_path
+    assert np.array_equal(output.L, [8.0, 16.0]) and np.array_equal(output.v, [80.0, 160.0])
+    assert cache.stats() == {"hits": 1, "misses": 1}
+
+def test_invalidated_by_mtime(tmp_path: Path):
+    cache, out_path = cached_output(tmp_path)
+    stat = out_path.stat()
+    os.utime(out_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000)) # same size, same content
+    assert cache.load(PairOutput, out_path) is None
+
+def test_invalidated_by_size(tmp_path: Path):
+    cache, out_path = cached_output(tmp_path)
+    stat = out_path.stat()
+    out_path.write_text("8, 80\n16, 160\n32, 320\n")
+    os.utime(out_path, ns=(stat.st_atime_ns, stat.st_mtime_ns)) # same mtime
+    assert cache.load(PairOutput, out_path) is None
+    assert cache.stats() == {"hits": 0, "misses": 2}
+
+def test_invalidated_by_output_class(tmp_path: Path):
+    cache, out_path = cached_output(tmp_path)
+    class OtherOutput(PairOutput):
+        def parse_output(self, line_number: int, line: str):
+            super().parse_output(line_number, line.replace("0", "1"))
+    assert cache.load(OtherOutput, out_path) is None
+
+def test_memory_mapped_outputs_are_not_cached(tmp_path: Path):
+    out_path = tmp_path.joinpath("out.bin")
+    out_path.write_bytes(np.arange(4.0).tobytes())
+    write_binary_header(out_path, [("energy", "<f8", (4,))])
+    assert not ResultCache(tmp_path).store(load_output(BinaryOutput, out_path))
+
+def test_get_results_uses_the_cache(make_experiment):
+    experiment = make_experiment()
+    experiment.run_all(max_workers=2)
+    assert list(experiment.get_results()[8].v) == [80.0]
+    experiment.result_cache.reset_stats()
+    assert list(experiment.get_results()[8].v) == [80.0]
+    assert experiment.result_cache.stats() == {"hits": 1, "misses": 0}
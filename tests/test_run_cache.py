@@ -0,0 +1,69 @@
+from pathlib import Path
+import json
+import os
+import numpy as np
+
+from physsm.ensemble import Replica
+from physsm.run_cache import RunCache, RUN_CACHE_FILE, env_fingerprint
+from physsm.runnner import scale_key
+
+SCALES = [8, 2.5, (4, np.float64(2.25), 0), Replica(8, 3), Replica((4, np.float64(2.25)), 1, "rng")]
+
+def test_store_and_reload(tmp_path: Path):
+    cache = RunCache(tmp_path)
+    for n, L in enumerate(SCALES):
+        cache.store(L, f"key{n}")
+    cache.flush()
+    assert json.loads(tmp_path.joinpath(RUN_CACHE_FILE).read_text()) == {scale_key(L): f"key{n}" for n, L in enumerate(SCALES)}
+
+    reloaded = RunCache(tmp_path)
+    assert all(reloaded.is_valid(L, f"key{n}", has_output=True) for n, L in enumerate(SCALES))
+    assert not reloaded.is_valid(8, "key1", has_output=True)
+    assert not reloaded.is_valid(8, "key0", has_output=False)
+
+def test_saves_in_batches(tmp_path: Path):
+    cache = RunCache(tmp_path)
+    for L in range(100):
+        cache.store(L, "key")
+    assert not tmp_path.joinpath(RUN_CACHE_FILE).exists()
+    cache.flush()
+    assert len(RunCache(tmp_path).entries) == 100
+    assert list(tmp_path.glob(".*.tmp")) == []
+
+def test_invalidate(tmp_path: Path):
+    cache = RunCache(tmp_path)
+    cache.store(Replica(8, 3), "key")
+    cache.invalidate(Replica(8, 3))
+    assert RunCache(tmp_path).entries == dict()
+
+def test_legacy_keys(tmp_path: Path):
+    tmp_path.joinpath(RUN_CACHE_FILE).write_text(json.dumps({str(Replica(8, 3)): "key"}))
+    assert RunCache(tmp_path).is_valid(Replica(8, 3), "key", has_output=True)
+
+def test_run_all_uses_the_cache(make_experiment):
+    experiment = make_experiment()
+    first      = experiment.run_all(max_workers=2)
+    assert not any(record.cached for record in first.values())
+
+    reopened = make_experiment()
+    second   = reopened.run_all(max_workers=2)
+    assert all(record.cached for record in second.values())
+    reopened.invalidate_cache(4)
+    third = reopened.run_all(max_workers=2)
+    assert [L for L, record in third.items() if not record.cached] == [4]
+
+def test_thread_counts_are_hashed(monkeypatch):
+    monkeypatch.setenv("OMP_NUM_THREADS", "4")
+    inherited = env_fingerprint(None)
+    assert env_fingerprint(dict(os.environ)) == inherited
+    monkeypatch.setenv("OMP_NUM_THREADS", "8")
+    assert env_fingerprint(None) != inherited
+    assert env_fingerprint({**os.environ, "OMP_NUM_THREADS": "4"}) == inherited
+    monkeypatch.setenv("TERM_SESSION_ID", "unrelated")
+    assert env_fingerprint(None) == env_fingerprint(dict(os.environ))
+
+def test_cores_per_job_changes_the_key(make_experiment):
+    experiment = make_experiment()
+    experiment.run_all(max_workers=2, cores_per_job=1)
+    assert all(record.cached for record in experiment.run_all(max_workers=2, cores_per_job=1).values())
+    assert not any(record.cached for record in experiment.run_all(max_workers=2, cores_per_job=2).values())
@@ -0,0 +1,118 @@
+from pathlib import Path
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from physsm.cpp_builder import BinaryRunner
+from physsm.output_sink import RingBufferSink
+from physsm.runnner import RssSampler, wait_with_usage
+
+def test_runners_do_not_share_state(make_experiment):
+    first, second = make_experiment("first"), make_experiment("second")
+    assert first.runner is not second.runner
+    assert first.runner.running_lock is not second.runner.running_lock
+    assert first.runner.events is first.events
+    assert second.runner.events is second.events
+    assert first.events is not second.events
+
+ALLOCATE = "import time; b = bytearray({} << 20); b[::4096] = b'x'*len(b[::4096]); time.sleep({})"
+
+def child_max_rss(mebibytes: int, sleep: float = 0.0) -> int:
+    process = subprocess.Popen([sys.executable, "-c", ALLOCATE.format(mebibytes, sleep)])
+    usage   = wait_with_usage(process, RssSampler.start(process.pid))
+    assert process.returncode == 0
+    return usage["max_rss"]
+
+@pytest.mark.skipif(not hasattr(os, "wait4"), reason="no os.wait4")
+def test_max_rss_of_child():
+    assert 200 << 20 <= child_max_rss(200) < 300 << 20
+
+@pytest.mark.skipif(sys.platform != "linux", reason="VmHWM is read from /proc")
+def test_max_rss_is_not_inherited():
+    parent = bytearray(400 << 20)
+    parent[::4096] = b"x"*len(parent[::4096])
+    assert 50 << 20 <= child_max_rss(50, sleep=0.3) < 150 << 20
+
+ECHO = """import sys
+for line in sys.stdin:
+    sys.stdout.write(line*4)
+"""
+
+WORKER = """import sys, time
+block = []
+for line in sys.stdin:
+    if line.strip():
+        block.append(line)
+        continue
+    time.sleep(float(block[0]))
+    print("@physsm:done 0", flush=True)
+    block = []
+"""
+
+def script_runner(tmp_path: Path, source: str) -> BinaryRunner:
+    path = tmp_path.joinpath("script.py")
+    path.write_text(f"#!{sys.executable}\n{source}")
+    path.chmod(0o755)
+    return BinaryRunner(path)
+
+def test_arun_writes_stdin_while_reading(tmp_path: Path):
+    runner = script_runner(tmp_path, ECHO)
+    runner.set_parameter_passing("stdin")
+    sink       = RingBufferSink(max_lines=1)
+    parameters = "".join(f"line {i:06d} of the parameters\n" for i in range(20000)) # more than the pipe buffers in both directions
+    record     = asyncio.run(asyncio.wait_for(runner.arun(tmp_path, Path("-"), parameters=parameters, sink=sink), timeout=20))
+    assert record.is_success()
+    assert record.output_bytes == 4*len(parameters)
+
+def test_interrupt_persistent_worker(tmp_path: Path):
+    runner = script_runner(tmp_path, WORKER)
+    runner.set_parameter_passing("stdin", persistent=True)
+    runner.set_grace_period(1.0)
+    assert runner.run(tmp_path, Path("-"), parameters="0", sink=RingBufferSink()).is_success()
+
+    records = []
+    thread  = threading.Thread(target=lambda: records.append(runner.run(tmp_path, Path("-"), parameters="60", sink=RingBufferSink())))
+    thread.start()
+    time.sleep(0.5)
+    assert runner.interrupt() == 1
+    thread.join(timeout=10)
+    assert not thread.is_alive() and not records[0].is_success()
+    assert runner.run(tmp_path, Path("-"), parameters="0", sink=RingBufferSink()).exit_code is None # not started
+    assert runner.workers is not None and runner.workers.started == 1
+    runner.close_workers()
+
+def test_time_budget_of_persistent_worker(tmp_path: Path):
+    runner = script_runner(tmp_path, WORKER)
+    runner.set_parameter_passing("stdin", persistent=True)
+    runner.set_grace_period(1.0)
+    runner.set_time_budget(0.5)
+    start  = time.monotonic()
+    record = runner.run(tmp_path, Path("-"), parameters="60", sink=RingBufferSink())
+    assert not record.is_success() and time.monotonic() - start < 10
+    runner.close_workers()
+
+def test_arun_cancellation_terminates_the_child(tmp_path: Path):
+    runner = script_runner(tmp_path, "import time\ntime.sleep(60)\n")
+    runner.set_grace_period(1.0)
+
+    async def cancel_run() -> int:
+        task = asyncio.create_task(runner.arun(tmp_path, Path("-"), sink=RingBufferSink()))
+        while not runner.running:
+            await asyncio.sleep(0.01)
+        pid = next(iter(runner.running))
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return pid
+
+    start = time.monotonic()
+    pid   = asyncio.run(cancel_run())
+    assert time.monotonic() - start < 10
+    with pytest.raises(ProcessLookupError):
+        os.kill(pid, 0)
+    assert runner.running == dict()
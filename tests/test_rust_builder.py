@@ -0,0 +1,31 @@
+from pathlib import Path
+
+from physsm.rust_builder import RustExperimentBuilder
+from conftest import PairOutput
+
+def test_sources_are_checked_once_per_sweep(tmp_path: Path, simulation: Path, quiet, monkeypatch):
+    cargo_toml = tmp_path.joinpath("Cargo.toml")
+    cargo_toml.write_text("[package]\nname = \"sim\"\n")
+    tmp_path.joinpath("src").mkdir()
+    tmp_path.joinpath("src", "main.rs").write_text("fn main() {}\n")
+
+    builder = RustExperimentBuilder(tmp_path, "results", "exp")
+    builder.add_scaling_parameter("steps", {2: 20, 4: 40, 8: 80})
+    builder.set_output_type(PairOutput)
+    builder.set_cargo_toml_path(cargo_toml)
+    runner = builder.runner
+    assert runner is not None
+    runner.binary            = simulation # built before: the stand-in simulation
+    runner.built_fingerprint = runner.fingerprint()
+    experiment = builder.build()
+    experiment.set_progress(None)
+    experiment.write_parameter_files()
+
+    checks = []
+    needs_build = runner.needs_build
+    monkeypatch.setattr(runner, "needs_build", lambda: checks.append(1) or needs_build())
+    results = experiment.run_all(max_workers=2, use_cache=False)
+    assert all(record.is_success() for record in results.values())
+    assert len(checks) == 1
+    experiment.run(2)
+    assert len(checks) == 2
@@ -0,0 +1,45 @@
+from pathlib import Path
+import numpy as np
+import pytest
+
+from conftest import PairOutput
+from physsm.cpp_builder import CppExperimentBuilder
+from physsm.scale_grid import ScaleGrid
+
+TEMPERATURES = np.linspace(0.5, 1.5, 3) # 0.5, 1.0, 1.5 as np.float64
+
+def test_grid_points_and_selection():
+    grid = ScaleGrid({"L": [4, 8], "T": TEMPERATURES, "seed": range(2)})
+    assert len(grid) == 12 and grid.get_names() == ["L", "T", "seed"]
+    assert grid.points()[:2] == [(4, 0.5, 0), (4, 0.5, 1)]
+    assert (8, 1.0, 1) in grid and (8, 1.25, 1) not in grid and (8, 1.0) not in grid
+
+    sub_grid = grid.select(L=8, T=[0.5, 1.5])
+    assert sub_grid.points() == [(8, 0.5, 0), (8, 0.5, 1), (8, 1.5, 0), (8, 1.5, 1)]
+    assert grid.project((8, 1.5, 1), ["T"]) == 1.5 and grid.project((8, 1.5, 1), ["L", "seed"]) == (8, 1)
+    with pytest.raises(ValueError):
+        grid.select(T=1.25)
+    with pytest.raises(KeyError):
+        grid.select(h=0.0)
+    assert grid.extend("T", [1.25, 0.5]).axes["T"] == [0.5, 1.0, 1.25, 1.5]
+
+def test_grid_experiment_with_float_axis(tmp_path: Path, simulation: Path, quiet):
+    builder = CppExperimentBuilder(tmp_path, "results", "grid")
+    builder.set_scale_grid({"L": [4, 8], "T": TEMPERATURES})
+    builder.add_grid_parameter("steps", lambda L, T: int(10*L*T), axes=["L", "T"])
+    builder.set_output_type(PairOutput)
+    builder.set_executable(simulation)
+    experiment = builder.build()
+    assert experiment.get_parameter_path((8, 1.5)).name == "parameter_L=8,T=1.5.txt"
+
+    points = experiment.select_scale_variables(T=[1.0, 1.5])
+    experiment.write_parameter_files(scale_variables=points)
+    records = experiment.run_all(scale_variables=points)
+    assert sorted(records) == sorted(points) and all(record.is_success() for record in records.values())
+    assert not experiment.has_output((4, 0.5))
+
+    results = experiment.get_results(scale_variables=points)
+    assert {point: (list(results[point].L), list(results[point].v)) for point in points} == \
+           {(4, 1.0): ([4.0], [40.0]), (4, 1.5): ([4.0], [60.0]), (8, 1.0): ([8.0], [80.0]), (8, 1.5): ([8.0], [120.0])}
+    with pytest.raises(KeyError):
+        experiment.run_all(scale_variables=[(8, 1.25)])
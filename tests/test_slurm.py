@@ -0,0 +1,48 @@
+from pathlib import Path
+import subprocess
+import sys
+
+import fake_slurm
+from physsm.job_queue import PENDING, DONE, CANCELLED
+from physsm.slurm import UNKNOWN
+
+def scheduler(state_path: Path, command: str):
+    subprocess.run([sys.executable, fake_slurm.__file__, str(state_path), command], check=True)
+
+def slurm_experiment(make_experiment, tmp_path: Path):
+    state_path = tmp_path.joinpath("slurm_state.json")
+    experiment = make_experiment()
+    experiment.set_progress(None)
+    experiment.set_slurm(commands=fake_slurm.slurm_commands(state_path))
+    return experiment, state_path
+
+def test_submit_query_collect(make_experiment, tmp_path: Path):
+    experiment, state_path = slurm_experiment(make_experiment, tmp_path)
+    job_id = experiment.submit_slurm()
+    assert job_id is not None
+    assert experiment.slurm_status()[PENDING] == 3
+
+    scheduler(state_path, "run") # the array left the queue: squeue fails, sacct has the results
+    assert all(task["state"] == DONE for task in experiment.get_slurm().query(job_id).values())
+    assert experiment.slurm_wait(timeout=10, poll_interval=0.1)
+    assert experiment.get_output(8).exists()
+    assert experiment.collect_slurm() == dict()
+    assert experiment.submit_slurm() is None # all up to date in the run cache
+
+def test_cancel(make_experiment, tmp_path: Path):
+    experiment, state_path = slurm_experiment(make_experiment, tmp_path)
+    experiment.submit_slurm()
+    assert experiment.slurm_cancel([2, 4]) == 2
+    counts = experiment.slurm_status()
+    assert counts[CANCELLED] == 2 and counts[PENDING] == 1
+    assert experiment.slurm_cancel() == 1
+    collected = experiment.collect_slurm()
+    assert sorted(collected) == [8] and not collected[8].is_success()
+
+def test_purged_job(make_experiment, tmp_path: Path):
+    experiment, state_path = slurm_experiment(make_experiment, tmp_path)
+    experiment.submit_slurm()
+    scheduler(state_path, "purge")
+    assert experiment.slurm_status()[UNKNOWN] == 3
+    assert experiment.slurm_wait(timeout=10, poll_interval=0.1)
+    assert experiment.slurm_cancel() == 0
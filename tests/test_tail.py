@@ -0,0 +1,28 @@
+from pathlib import Path
+import time
+
+import physsm.abstract_experiment as abstract_experiment
+from physsm.tail import TailState, read_new_lines
+
+def test_decodes_characters_split_between_reads(tmp_path: Path):
+    path  = tmp_path.joinpath("out.txt")
+    data  = "énergie, 1.5\nλ, 2\n".encode()
+    state = TailState()
+    path.write_bytes(data[:1]) # first byte of "é"
+    assert read_new_lines(path, state) == []
+    with path.open("ab") as file:
+        file.write(data[1:17]) # up to the middle of "λ"
+    assert read_new_lines(path, state) == ["énergie, 1.5\n"]
+    with path.open("ab") as file:
+        file.write(data[17:] + b"\xff, 3\n")
+    assert read_new_lines(path, state) == ["λ, 2\n", "�, 3\n"]
+
+def test_watch_stops_without_job_queue(make_experiment, monkeypatch):
+    experiment = make_experiment()
+    experiment.run_all(max_workers=2)
+    monkeypatch.setattr(abstract_experiment, "WATCH_IDLE_TIMEOUT", 0.3)
+    start   = time.perf_counter()
+    yielded = list(experiment.watch(min_interval=0.01, max_interval=0.05))
+    assert time.perf_counter() - start < 10
+    assert len(yielded) == 1 and sorted(yielded[0]) == [2, 4, 8]
+    assert list(yielded[0][8].v) == [80.0]